@@ -0,0 +1,161 @@
+import importlib
+import json
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from app.config import settings
+
+# In-process caches. Each worker keeps its own copy, so entries are also
+# capped by a short TTL to pick up writes made through other workers.
+
+class TTLCache:
+    """Bounded LRU cache where every entry carries its own expiry time"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, expires_at: float):
+        if expires_at <= time.time():
+            return
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+# Authenticated users keyed by (user type, token subject)
+principal_cache = TTLCache(settings.principal_cache_size)
+
+def cache_principal(user_type: str, subject: str, user, token_exp: float):
+    """Cache a loaded user until its token expires (capped by principal_cache_ttl)"""
+    if not settings.principal_cache_enabled:
+        return
+    expires_at = min(token_exp, time.time() + settings.principal_cache_ttl)
+    principal_cache.set((user_type, subject), user, expires_at)
+
+def get_cached_principal(user_type: str, subject: str):
+    """Return the cached user for a token subject, if any"""
+    if not settings.principal_cache_enabled:
+        return None
+    return principal_cache.get((user_type, subject))
+
+def invalidate_principal(user_type: str, subject: str):
+    """Drop a user from the cache after it was written"""
+    principal_cache.delete((user_type, subject))
+
+# Doctor directory: pre-serialised pages of GET /api/doctors. Keys embed a
+# version counter, so an invalidation (bumping the counter) makes every cached
+# page unreachable at once and a fill that raced with a write lands under the
+# old version where nobody reads it.
+
+class LocalBackend:
+    """In-process stand-in for a shared cache (same interface as a Redis adapter)"""
+
+    def __init__(self, maxsize: int = 1024):
+        self._pages = TTLCache(maxsize)
+        self._counters = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._pages.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._pages.set(key, value, time.time() + ttl)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+def _load_backend(spec: str):
+    """Backend named by settings: "local" or "package.module:factory" (LocalBackend's methods)"""
+    if spec == "local":
+        return LocalBackend()
+    module_name, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module_name), factory)()
+
+class DirectoryPage(NamedTuple):
+    body: bytes  # JSON array, ready to send
+    etag: str
+    next_cursor: Optional[str]
+
+    def pack(self) -> bytes:
+        header = json.dumps({"etag": self.etag, "next_cursor": self.next_cursor}).encode("utf-8")
+        return header + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, value: bytes) -> "DirectoryPage":
+        header, _, body = value.partition(b"\n")
+        meta = json.loads(header)
+        return cls(body=body, etag=meta["etag"], next_cursor=meta["next_cursor"])
+
+class DirectoryCache:
+    """Versioned cache of serialised doctor directory pages"""
+
+    VERSION_KEY = "doctors:version"
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def page_key(self, *params) -> str:
+        """Cache key for a page; read the version before loading from the DB"""
+        version = await self.backend.counter(self.VERSION_KEY)
+        return f"doctors:{version}:" + ":".join(str(param) for param in params)
+
+    async def get(self, key: str) -> Optional[DirectoryPage]:
+        if not settings.directory_cache_enabled:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return DirectoryPage.unpack(value)
+
+    async def set(self, key: str, page: DirectoryPage):
+        if settings.directory_cache_enabled:
+            await self.backend.set(key, page.pack(), settings.directory_cache_ttl)
+
+    async def invalidate(self):
+        self.invalidations += 1
+        await self.backend.incr(self.VERSION_KEY)
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.directory_cache_backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+directory_cache = DirectoryCache(_load_backend(settings.directory_cache_backend))
@@ -1,105 +1,680 @@
-from sqlalchemy.orm import Session, joinedload
-from app.models import Appointment
-from app.schemas import AppointmentCreate, AppointmentUpdate
+from sqlalchemy import case, cast, exists, func, insert, literal_column, select, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload, noload
+from app.config import settings
+from app.crud.schedules import InvalidSlot, resolve_slot
+from app.events import publish_appointment_event
+from app.logging_config import log_event
+from app.models import SEARCH_CONFIG, Appointment, AppointmentCode, AppointmentSlot, ArchivedAppointment, Doctor, Patient
+from app.pagination import decode_cursor
+from app.scheduling import availability_index
+from app.search import AppointmentText, TextHit, appointment_search_index
+from app.triage import normalize_severity, triage_key
+from app.schemas import (
+    AppointmentCreate,
+    AppointmentBatchResult,
+    AppointmentFilter,
+    AppointmentImport,
+    AppointmentImportError,
+    AppointmentListItem,
+    AppointmentUpdate,
+    DoctorSummary,
+    PatientSummary,
+    Principal
+)
+from datetime import datetime, timezone
+from typing import Collection, Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
-import random
+import logging
+import secrets
 import string
 
+logger = logging.getLogger(__name__)
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8  # 36^8 ~ 2.8e12 codes, so a collision is rare but possible
+CODE_ATTEMPTS = 5
+
 def generate_appointment_code():
-    """Generate a unique appointment code"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-
-def create_appointment(db: Session, appointment: AppointmentCreate, patient_id: UUID):
-    """Create a new appointment for a patient"""
-    # Generate unique appointment code
-    appointment_code = generate_appointment_code()
-    while db.query(Appointment).filter(Appointment.appointment_code == appointment_code).first():
-        appointment_code = generate_appointment_code()
-    
-    db_appointment = Appointment(
-        appointment_code=appointment_code,
+    """Generate a random appointment code (uniqueness is enforced on insert)"""
+    return ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+
+# Live and archived appointments as one, mapped like Appointment. Lists,
+# code lookups and exports read through it, so history survives archiving
+# (see app/partitions.py); queues and status changes only touch live rows.
+_history_rows = union_all(
+    select(*Appointment.__table__.columns),
+    select(*ArchivedAppointment.__table__.columns)
+).subquery("appointment_history")
+AppointmentHistory = aliased(Appointment, _history_rows, name="appointment_history")
+
+# The same with the (unmapped, Postgres only) search_vector column for text search
+def _with_search_vector(table):
+    return select(*table.columns, literal_column(f"{table.name}.search_vector", TSVECTOR).label("search_vector"))
+
+_search_rows = union_all(
+    _with_search_vector(Appointment.__table__),
+    _with_search_vector(ArchivedAppointment.__table__)
+).subquery("appointment_search")
+AppointmentSearch = aliased(Appointment, _search_rows, name="appointment_search")
+
+def _appointment_query(expand: Collection[str] = ("patient", "doctor"), entity=Appointment):
+    """Base select for appointments with the requested relationships loaded"""
+    return select(entity).options(
+        joinedload(entity.patient) if "patient" in expand else noload(entity.patient),
+        joinedload(entity.doctor) if "doctor" in expand else noload(entity.doctor)
+    )
+
+def _appointment_list_query(entity=Appointment):
+    """Compact list projection: appointment columns plus patient/doctor names"""
+    return select(
+        entity.id,
+        entity.appointment_code,
+        entity.patient_id,
+        entity.doctor_id,
+        entity.problem,
+        entity.severity,
+        entity.duration,
+        entity.medical_history,
+        entity.status,
+        entity.cancellation_reason,
+        entity.slot_start,
+        entity.slot_end,
+        entity.created_at,
+        entity.updated_at,
+        Patient.name.label("patient_name"),
+        Doctor.name.label("doctor_name"),
+        Doctor.specialization.label("doctor_specialization")
+    ).join(entity.patient).outerjoin(entity.doctor)
+
+def _list_item(row) -> AppointmentListItem:
+    """Build a compact list row from the projection"""
+    return AppointmentListItem(
+        id=row.id,
+        appointment_code=row.appointment_code,
+        patient_id=row.patient_id,
+        doctor_id=row.doctor_id,
+        problem=row.problem,
+        severity=row.severity,
+        duration=row.duration,
+        medical_history=row.medical_history,
+        status=row.status,
+        cancellation_reason=row.cancellation_reason,
+        slot_start=row.slot_start,
+        slot_end=row.slot_end,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+        patient=PatientSummary(id=row.patient_id, name=row.patient_name),
+        doctor=DoctorSummary(
+            id=row.doctor_id,
+            name=row.doctor_name,
+            specialization=row.doctor_specialization
+        ) if row.doctor_name is not None else None
+    )
+
+def _apply_filters(query, filters: Optional[AppointmentFilter], entity=Appointment):
+    """Restrict a list query by status, severity and created_at range"""
+    if filters is None:
+        return query
+    if filters.status:
+        query = query.where(entity.status.in_(filters.status))
+    if filters.severity:
+        query = query.where(entity.severity.in_(filters.severity))
+    if filters.date_from is not None:
+        query = query.where(entity.created_at >= filters.date_from)
+    if filters.date_to is not None:
+        query = query.where(entity.created_at < filters.date_to)
+    return query
+
+def _paginate(query, skip: int, limit: int, cursor: Optional[str], filters: Optional[AppointmentFilter] = None,
+              entity=Appointment):
+    """Filter, order by (created_at, id) and apply a keyset cursor or, without one, offset"""
+    query = _apply_filters(query, filters, entity)
+    key = tuple_(entity.created_at, entity.id)
+    descending = filters is not None and filters.sort == "-created_at"
+    if descending:
+        query = query.order_by(entity.created_at.desc(), entity.id.desc())
+    else:
+        query = query.order_by(entity.created_at, entity.id)
+    if cursor:
+        position = decode_cursor(cursor)
+        query = query.where(key < position if descending else key > position)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+class SlotUnavailable(Exception):
+    """Another live appointment already holds (or overlaps) the requested slot"""
+
+async def _slot_taken(db: AsyncSession, doctor_id: UUID, start, end) -> bool:
+    result = await db.execute(select(exists().where(
+        AppointmentSlot.doctor_id == doctor_id,
+        AppointmentSlot.slot_start < end,
+        AppointmentSlot.slot_end > start
+    )))
+    return bool(result.scalar())
+
+async def create_appointment(db: AsyncSession, appointment: AppointmentCreate, patient_id: UUID):
+    """Create a new appointment for a patient, reserving its time slot if one is given
+
+    The code and the slot are claimed by the INSERT itself: a trigger
+    registers them in appointment_codes and appointment_slots (unique across
+    partitions and the archive, no overlapping slots) and skips the row when
+    either is taken, so concurrent bookings of one slot insert exactly one
+    row. When nothing was inserted, a check tells a taken slot
+    (SlotUnavailable) from a code collision (retry with a fresh code). No
+    pre-check query, and safe across workers. Raises InvalidSlot for a slot
+    not on the schedule.
+    """
+    if appointment.slot_start is None and settings.appointment_slot_required:
+        raise InvalidSlot("slot_start is required")
+    severity = normalize_severity(appointment.severity)
+    values = dict(
         patient_id=patient_id,
         doctor_id=appointment.doctor_id,
         problem=appointment.problem,
-        severity=appointment.severity,
+        severity=severity,
         duration=appointment.duration,
         medical_history=appointment.medical_history,
-        status='pending'
+        status='pending',
+        triage_key=triage_key(datetime.now(timezone.utc), severity)
     )
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
+    slot = None
+    if appointment.slot_start is not None:
+        slot = await resolve_slot(db, appointment.doctor_id, appointment.slot_start)
+        values.update(slot_start=slot[0], slot_end=slot[1])
+
+    appointment_id = None
+    for _ in range(CODE_ATTEMPTS):
+        statement = insert(Appointment).values(id=uuid4(), appointment_code=generate_appointment_code(), **values)
+        result = await db.execute(statement.returning(Appointment.id))
+        appointment_id = result.scalar()
+        if appointment_id is not None:
+            break
+        if slot is not None and await _slot_taken(db, appointment.doctor_id, *slot):
+            await db.rollback()
+            availability_index.hold(appointment.doctor_id, *slot)
+            raise SlotUnavailable("That time slot has just been booked")
+    if appointment_id is None:
+        await db.rollback()
+        raise RuntimeError("Could not allocate a unique appointment code")
+
+    await db.commit()
+    if slot is not None:
+        availability_index.hold(appointment.doctor_id, *slot)
+    # Reload with relationships; lazy loading is not available on async sessions
+    db_appointment = await get_appointment_by_id(db, appointment_id, refresh=True)
+    appointment_search_index.add(db_appointment.doctor_id, AppointmentText(
+        db_appointment.id, db_appointment.created_at, db_appointment.problem, db_appointment.medical_history
+    ))
+    await publish_appointment_event("appointment.created", db_appointment)
     return db_appointment
 
-def get_appointment_by_code(db: Session, appointment_code: str):
-    """Get appointment by appointment code"""
-    return db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor)
-    ).filter(Appointment.appointment_code == appointment_code).first()
+async def bulk_insert_appointments(db: AsyncSession, rows: List[Tuple[int, AppointmentImport]]):
+    """Insert a batch of imported appointments with one multi-row INSERT
+
+    ``rows`` pairs each record with its line number in the upload. Rows that
+    reference unknown patients/doctors or reuse an existing appointment code are
+    skipped and reported instead of failing the batch. Rows without a code get
+    a generated one; if it collides, like create_appointment, they are
+    inserted again with a fresh code. Returns (imported count, errors).
+    """
+    errors = []
+    if not rows:
+        return 0, errors
+
+    # One lookup per batch instead of letting a foreign key error abort it
+    patient_ids = {item.patient_id for _, item in rows}
+    doctor_ids = {item.doctor_id for _, item in rows}
+    known_patients = set((await db.execute(
+        select(Patient.id).where(Patient.id.in_(patient_ids))
+    )).scalars())
+    known_doctors = set((await db.execute(
+        select(Doctor.id).where(Doctor.id.in_(doctor_ids))
+    )).scalars())
 
-def get_appointment_by_id(db: Session, appointment_id: UUID):
+    values = []
+    lines_by_code = {}
+    generated = set()  # codes picked here rather than by the uploader
+    for line, item in rows:
+        if item.patient_id not in known_patients:
+            errors.append(AppointmentImportError(line=line, error="Unknown patient_id"))
+            continue
+        if item.doctor_id not in known_doctors:
+            errors.append(AppointmentImportError(line=line, error="Unknown doctor_id"))
+            continue
+        code = item.appointment_code
+        if code is None:
+            code = generate_appointment_code()
+            generated.add(code)
+        if code in lines_by_code:
+            errors.append(AppointmentImportError(line=line, error="Duplicate appointment_code in upload"))
+            continue
+        lines_by_code[code] = line
+        # Imported history carries no slots; only bookings reserve them
+        row = item.dict(exclude={"appointment_code", "created_at", "slot_start"})
+        row["severity"] = normalize_severity(item.severity)
+        # Multi-row VALUES needs the same keys on every row
+        created_at = item.created_at if item.created_at is not None else func.now()
+        queued_at = item.created_at if item.created_at is not None else datetime.now(timezone.utc)
+        row.update(
+            id=uuid4(), appointment_code=code, created_at=created_at, updated_at=created_at,
+            triage_key=triage_key(queued_at, row["severity"])
+        )
+        values.append(row)
+
+    if not values:
+        return 0, errors
+
+    # Rows whose code is taken are skipped by the claim trigger, not failed
+    imported = 0
+    doctor_ids = set()
+    for attempt in range(1, CODE_ATTEMPTS + 1):
+        result = await db.execute(
+            insert(Appointment)
+            .values(values)
+            .returning(Appointment.appointment_code)
+        )
+        inserted = set(result.scalars())
+        imported += len(inserted)
+        retry = []
+        for row in values:
+            code = row["appointment_code"]
+            if code in inserted:
+                doctor_ids.add(row["doctor_id"])
+                continue
+            line = lines_by_code.pop(code)
+            if code not in generated:
+                errors.append(AppointmentImportError(line=line, error="appointment_code already exists"))
+            elif attempt == CODE_ATTEMPTS:
+                errors.append(AppointmentImportError(line=line, error="Could not allocate a unique appointment code"))
+            else:
+                # Only the rows whose generated code collided are inserted again
+                code = generate_appointment_code()
+                while code in lines_by_code:
+                    code = generate_appointment_code()
+                generated.add(code)
+                lines_by_code[code] = line
+                row["appointment_code"] = code
+                retry.append(row)
+        values = retry
+        if not values:
+            break
+    await db.commit()
+    appointment_search_index.invalidate(doctor_ids)
+    return imported, errors
+
+# Export format; triage_key is derived on insert (see app/triage.py), not part of it
+EXPORT_COLUMNS = [column.name for column in Appointment.__table__.columns if column.name != "triage_key"]
+
+def export_appointments_query(filters: Optional[AppointmentFilter] = None, doctor_id: Optional[UUID] = None):
+    """Plain select of EXPORT_COLUMNS (archive included), ordered by (created_at, id)"""
+    entity = AppointmentHistory
+    query = select(*(_history_rows.c[name] for name in EXPORT_COLUMNS))
+    if doctor_id is not None:
+        query = query.where(entity.doctor_id == doctor_id)
+    query = _apply_filters(query, filters, entity)
+    if filters is not None and filters.sort == "-created_at":
+        return query.order_by(entity.created_at.desc(), entity.id.desc())
+    return query.order_by(entity.created_at, entity.id)
+
+def _code_criteria(appointment_code: str):
+    """Match a code in live or archived appointments by the primary key the registry holds for it,
+    so only the partition it points to is read (the archive has no code index)"""
+    registered = AppointmentCode.appointment_code == appointment_code
+    return (
+        AppointmentHistory.id == select(AppointmentCode.appointment_id).where(registered).scalar_subquery(),
+        AppointmentHistory.created_at == select(AppointmentCode.created_at).where(registered).scalar_subquery(),
+        AppointmentHistory.appointment_code == appointment_code
+    )
+
+async def get_appointment_by_code(db: AsyncSession, appointment_code: str):
+    """Get appointment by appointment code (archived ones too)"""
+    result = await db.execute(
+        _appointment_query(entity=AppointmentHistory).where(*_code_criteria(appointment_code))
+    )
+    return result.scalars().first()
+
+async def get_appointment_by_id(db: AsyncSession, appointment_id: UUID, refresh: bool = False):
     """Get appointment by ID"""
-    return db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor)
-    ).filter(Appointment.id == appointment_id).first()
+    query = _appointment_query().where(Appointment.id == appointment_id)
+    if refresh:
+        query = query.execution_options(populate_existing=True)
+    result = await db.execute(query)
+    return result.scalars().first()
 
-def get_patient_appointments(db: Session, patient_id: UUID, skip: int = 0, limit: int = 100):
+async def get_appointment_version_by_code(db: AsyncSession, appointment_code: str):
+    """(appointment updated_at, doctor updated_at) for ETags, or None if no such code"""
+    result = await db.execute(
+        select(AppointmentHistory.updated_at, Doctor.updated_at.label("doctor_updated_at"))
+        .outerjoin(AppointmentHistory.doctor)
+        .where(*_code_criteria(appointment_code))
+    )
+    return result.first()
+
+async def get_appointments_version(db: AsyncSession, patient_id: Optional[UUID] = None, doctor_id: Optional[UUID] = None,
+                                   filters: Optional[AppointmentFilter] = None):
+    """Row count and newest updated_at of a filtered list (appointments and their doctors)
+
+    Any insert, update or removal within the filter changes one of them, so
+    together they version every page of the list without loading it.
+    """
+    entity = AppointmentHistory
+    query = select(
+        func.count(entity.id),
+        func.max(entity.updated_at),
+        func.max(Doctor.updated_at)
+    ).outerjoin(entity.doctor)
+    if patient_id is not None:
+        query = query.where(entity.patient_id == patient_id)
+    if doctor_id is not None:
+        query = query.where(entity.doctor_id == doctor_id)
+    result = await db.execute(_apply_filters(query, filters, entity))
+    return tuple(result.one())
+
+async def _list_appointments(db: AsyncSession, criteria, skip: int, limit: int, cursor: Optional[str],
+                             filters: Optional[AppointmentFilter], expand: Optional[Collection[str]]):
+    """Run a list query over live and archived appointments (``criteria`` on AppointmentHistory):
+    compact rows by default, full nested objects for ``expand``"""
+    entity = AppointmentHistory
+    if expand:
+        query = _appointment_query(expand, entity)
+        if criteria is not None:
+            query = query.where(criteria)
+        result = await db.execute(_paginate(query, skip, limit, cursor, filters, entity))
+        return result.scalars().all()
+
+    query = _appointment_list_query(entity)
+    if criteria is not None:
+        query = query.where(criteria)
+    result = await db.execute(_paginate(query, skip, limit, cursor, filters, entity))
+    return [_list_item(row) for row in result]
+
+async def get_patient_appointments(db: AsyncSession, patient_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                   filters: Optional[AppointmentFilter] = None, expand: Optional[Collection[str]] = None):
     """Get all appointments for a patient"""
-    return db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor)
-    ).filter(
-        Appointment.patient_id == patient_id
-    ).offset(skip).limit(limit).all()
-
-def get_doctor_appointments(db: Session, doctor_id: UUID, skip: int = 0, limit: int = 100):
+    return await _list_appointments(db, AppointmentHistory.patient_id == patient_id, skip, limit, cursor, filters, expand)
+
+async def get_doctor_appointments(db: AsyncSession, doctor_id: UUID, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                  filters: Optional[AppointmentFilter] = None, expand: Optional[Collection[str]] = None):
     """Get all appointments for a doctor"""
-    return db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor)
-    ).filter(
-        Appointment.doctor_id == doctor_id
-    ).offset(skip).limit(limit).all()
-
-def get_all_appointments(db: Session, skip: int = 0, limit: int = 100):
+    return await _list_appointments(db, AppointmentHistory.doctor_id == doctor_id, skip, limit, cursor, filters, expand)
+
+async def get_all_appointments(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                               filters: Optional[AppointmentFilter] = None, expand: Optional[Collection[str]] = None):
     """Get all appointments"""
-    return db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.doctor)
-    ).offset(skip).limit(limit).all()
+    return await _list_appointments(db, None, skip, limit, cursor, filters, expand)
 
-def update_appointment(db: Session, appointment_id: UUID, appointment: AppointmentUpdate):
-    """Update an appointment (doctor adds result and changes status)"""
-    db_appointment = get_appointment_by_id(db, appointment_id)
-    if not db_appointment:
-        return None
-    
-    print(f"[APPOINTMENT UPDATE] Before - Status: {db_appointment.status}")
-    
-    if appointment.status is not None:
-        db_appointment.status = appointment.status
-    if appointment.cancellation_reason is not None:
-        db_appointment.cancellation_reason = appointment.cancellation_reason
-    
-    print(f"[APPOINTMENT UPDATE] After - Status: {db_appointment.status}")
-    
-    db.commit()
-    db.refresh(db_appointment)
-    
-    print(f"[APPOINTMENT UPDATE] Committed - Status: {db_appointment.status}")
-    
+async def _search_appointments_sql(db: AsyncSession, doctor_id: UUID, query: str, limit: int, offset: int):
+    """tsvector search, GIN indexed on (doctor_id, search_vector) in every partition, ranked by ts_rank"""
+    entity = AppointmentSearch
+    tsquery = func.plainto_tsquery(cast(SEARCH_CONFIG, REGCONFIG), query)
+    criteria = (entity.doctor_id == doctor_id, _search_rows.c.search_vector.op("@@")(tsquery))
+    result = await db.execute(
+        _appointment_list_query(entity)
+        .add_columns(func.count().over().label("total"))
+        .where(*criteria)
+        .order_by(
+            func.ts_rank(_search_rows.c.search_vector, tsquery).desc(),
+            entity.created_at.desc(),
+            entity.id.desc()
+        )
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = result.all()
+    total = rows[0].total if rows else 0
+    if not rows and offset:
+        total = (await db.execute(select(func.count()).select_from(_search_rows).where(*criteria))).scalar()
+    return [_list_item(row) for row in rows], total
+
+async def _load_appointment_texts(db: AsyncSession, doctor_id: UUID):
+    result = await db.execute(
+        select(
+            AppointmentHistory.id,
+            AppointmentHistory.created_at,
+            AppointmentHistory.problem,
+            AppointmentHistory.medical_history
+        ).where(AppointmentHistory.doctor_id == doctor_id)
+    )
+    return [AppointmentText(*row) for row in result]
+
+async def search_doctor_appointments(db: AsyncSession, doctor_id: UUID, query: str, limit: int = 20, offset: int = 0):
+    """Full-text search over a doctor's appointments (archived ones too) by problem and medical history
+
+    Returns (page of list rows, best match first, total matches). Uses the
+    tsvector/GIN index on Postgres and the in-memory index from app.search
+    elsewhere.
+    """
+    backend = settings.appointment_search_backend
+    if backend == "auto":
+        backend = "postgres" if db.bind.dialect.name == "postgresql" else "memory"
+    if backend == "postgres":
+        return await _search_appointments_sql(db, doctor_id, query, limit, offset)
+
+    await appointment_search_index.ensure_fresh(doctor_id, lambda: _load_appointment_texts(db, doctor_id))
+    hit: TextHit = appointment_search_index.search(doctor_id, query, limit, offset)
+    if not hit.ids:
+        return [], hit.total
+    # By primary key: the ids come from this doctor's own index
+    result = await db.execute(_appointment_list_query(AppointmentHistory).where(AppointmentHistory.id.in_(hit.ids)))
+    by_id = {row.id: _list_item(row) for row in result}
+    return [by_id[appointment_id] for appointment_id in hit.ids if appointment_id in by_id], hit.total
+
+def _triage_order(query):
+    return query.order_by(Appointment.triage_key, Appointment.id)
+
+async def get_triage_queue(db: AsyncSession, doctor_id: Optional[UUID] = None, department: Optional[str] = None,
+                           limit: int = 20) -> List[AppointmentListItem]:
+    """The first ``limit`` pending appointments of a doctor or department in triage order
+
+    Read in (status, triage_key, id) index order, so the cost does not grow
+    with the length of the queue.
+    """
+    query = _appointment_list_query().where(Appointment.status == "pending")
+    if doctor_id is not None:
+        query = query.where(Appointment.doctor_id == doctor_id)
+    if department is not None:
+        query = query.where(Doctor.department == department)
+    result = await db.execute(_triage_order(query).limit(limit))
+    return [_list_item(row) for row in result]
+
+class AppointmentNotOwned(Exception):
+    """The appointment exists but belongs to another doctor or patient"""
+
+class TransitionConflict(Exception):
+    """The appointment's current status does not allow the requested change"""
+
+    def __init__(self, current: str, target: str):
+        super().__init__(f"Cannot change appointment from {current} to {target}")
+        self.current = current
+        self.target = target
+
+# Appointment state machine: target status -> statuses it may be reached from
+TRANSITIONS = {
+    "confirmed": ("pending",),
+    "cancelled": ("pending", "confirmed"),
+    "completed": ("confirmed",),
+}
+
+def _owner_criteria(actor: Principal):
+    """Doctors act on appointments assigned to them, patients on their own"""
+    if actor.type == "doctor":
+        return Appointment.doctor_id == actor.id
+    return Appointment.patient_id == actor.id
+
+async def transition_appointment(db: AsyncSession, appointment_id: UUID, actor: Principal,
+                                 target: Optional[str] = None, cancellation_reason: Optional[str] = None):
+    """Apply a status change as one conditional UPDATE ... RETURNING
+
+    The WHERE clause checks ownership and the allowed source statuses, so two
+    concurrent changes cannot both win. On Postgres the UPDATE runs in a CTE
+    joined to patient and doctor, returning the full appointment in one round
+    trip. Only when nothing matched is the row read again, to tell a missing
+    appointment (None) from AppointmentNotOwned or TransitionConflict.
+    """
+    if target is not None and target not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {target}")
+
+    criteria = [Appointment.id == appointment_id, _owner_criteria(actor)]
+    values = {}
+    if target is not None:
+        criteria.append(Appointment.status.in_(TRANSITIONS[target]))
+        values["status"] = target
+    if cancellation_reason is not None:
+        values["cancellation_reason"] = cancellation_reason
+    if not values:
+        raise ValueError("Nothing to update")
+    statement = update(Appointment).where(*criteria).values(**values)
+
+    if db.bind.dialect.name == "postgresql":
+        updated = statement.returning(*Appointment.__table__.columns).cte("updated")
+        row = aliased(Appointment, updated)
+        result = await db.execute(
+            select(row)
+            .options(joinedload(row.patient), joinedload(row.doctor))
+            .execution_options(populate_existing=True)
+        )
+        db_appointment = result.scalars().first()
+    else:
+        # No data-modifying CTEs elsewhere (SQLite): reload after the UPDATE
+        result = await db.execute(statement.returning(Appointment.id))
+        db_appointment = None
+        if result.scalar() is not None:
+            db_appointment = await get_appointment_by_id(db, appointment_id, refresh=True)
+
+    if db_appointment is None:
+        await db.rollback()
+        current = (await db.execute(
+            select(Appointment.status, Appointment.patient_id, Appointment.doctor_id)
+            .where(Appointment.id == appointment_id)
+        )).first()
+        if current is None:
+            return None
+        owner = current.doctor_id if actor.type == "doctor" else current.patient_id
+        if owner != actor.id:
+            raise AppointmentNotOwned()
+        raise TransitionConflict(current.status, target)
+
+    await db.commit()
+    if target == "cancelled" and db_appointment.slot_start is not None:
+        availability_index.release(db_appointment.doctor_id, db_appointment.slot_start)
+    log_event(
+        logger, "appointment.updated", sample_rate=settings.log_sample_rate,
+        appointment_id=str(appointment_id), new_status=db_appointment.status
+    )
+    await publish_appointment_event("appointment.updated", db_appointment)
     return db_appointment
 
-def cancel_appointment(db: Session, appointment_id: UUID):
-    """Cancel an appointment"""
-    db_appointment = get_appointment_by_id(db, appointment_id)
-    if not db_appointment:
+async def batch_transition_appointments(db: AsyncSession, actor: Principal, target: str,
+                                       reasons: Dict[UUID, Optional[str]]) -> List[AppointmentBatchResult]:
+    """Apply one status change to many appointments in a single transaction
+
+    ``reasons`` maps each appointment id to its cancellation reason (or None).
+    One set-based UPDATE covers every id the actor owns that is in an allowed
+    source status; the rest are looked up together to report not_found,
+    forbidden or conflict per id.
+    """
+    if target not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {target}")
+
+    values = {"status": target}
+    given = {appointment_id: reason for appointment_id, reason in reasons.items() if reason is not None}
+    if given:
+        values["cancellation_reason"] = case(given, value=Appointment.id, else_=Appointment.cancellation_reason)
+    result = await db.execute(
+        update(Appointment)
+        .where(
+            Appointment.id.in_(reasons),
+            _owner_criteria(actor),
+            Appointment.status.in_(TRANSITIONS[target])
+        )
+        .values(**values)
+        .returning(
+            Appointment.id, Appointment.appointment_code, Appointment.status,
+            Appointment.patient_id, Appointment.doctor_id, Appointment.slot_start
+        )
+    )
+    changed = result.all()
+    updated = {row.id for row in changed}
+
+    skipped = {}
+    missing = [appointment_id for appointment_id in reasons if appointment_id not in updated]
+    if missing:
+        rows = await db.execute(
+            select(Appointment.id, Appointment.status, Appointment.patient_id, Appointment.doctor_id)
+            .where(Appointment.id.in_(missing))
+        )
+        skipped = {row.id: row for row in rows}
+    await db.commit()
+    if target == "cancelled":
+        for row in changed:
+            if row.slot_start is not None:
+                availability_index.release(row.doctor_id, row.slot_start)
+
+    results = []
+    for appointment_id in reasons:
+        if appointment_id in updated:
+            results.append(AppointmentBatchResult(appointment_id=appointment_id, result="updated", status=target))
+            continue
+        row = skipped.get(appointment_id)
+        if row is None:
+            results.append(AppointmentBatchResult(appointment_id=appointment_id, result="not_found"))
+        elif (row.doctor_id if actor.type == "doctor" else row.patient_id) != actor.id:
+            results.append(AppointmentBatchResult(appointment_id=appointment_id, result="forbidden"))
+        else:
+            results.append(AppointmentBatchResult(appointment_id=appointment_id, result="conflict", status=row.status))
+
+    log_event(
+        logger, "appointment.batch_updated",
+        actor_id=str(actor.id), new_status=target, requested=len(reasons), updated=len(updated)
+    )
+    for row in changed:
+        await publish_appointment_event("appointment.updated", row)
+    return results
+
+async def pop_next_appointment(db: AsyncSession, actor: Principal):
+    """Confirm the doctor's highest priority pending appointment and return it (None if the queue is empty)
+
+    One UPDATE whose target is the head of the queue: an index lookup locked
+    with FOR UPDATE SKIP LOCKED on Postgres, so concurrent pops (several
+    tabs, several workers) each take a different appointment instead of
+    queueing behind one row lock. SQLite serialises writers, which makes the
+    statement atomic there as well.
+    """
+    head = _triage_order(
+        select(Appointment.id)
+        .where(Appointment.doctor_id == actor.id, Appointment.status == "pending")
+    ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    result = await db.execute(
+        update(Appointment)
+        .where(Appointment.id == head, Appointment.status == "pending")
+        .values(status="confirmed")
+        .returning(Appointment.id)
+    )
+    appointment_id = result.scalar()
+    if appointment_id is None:
+        await db.rollback()
         return None
-    
-    db_appointment.status = 'cancelled'
-    db.commit()
-    db.refresh(db_appointment)
+    await db.commit()
+
+    db_appointment = await get_appointment_by_id(db, appointment_id, refresh=True)
+    log_event(
+        logger, "appointment.updated", sample_rate=settings.log_sample_rate,
+        appointment_id=str(appointment_id), new_status=db_appointment.status
+    )
+    await publish_appointment_event("appointment.updated", db_appointment)
     return db_appointment
 
+async def update_appointment(db: AsyncSession, appointment_id: UUID, appointment: AppointmentUpdate, actor: Principal):
+    """Update an appointment (doctor adds result and changes status)"""
+    return await transition_appointment(
+        db, appointment_id, actor,
+        target=appointment.status,
+        cancellation_reason=appointment.cancellation_reason
+    )
+
+async def cancel_appointment(db: AsyncSession, appointment_id: UUID, actor: Principal):
+    """Cancel an appointment"""
+    return await transition_appointment(db, appointment_id, actor, target="cancelled")
@@ -0,0 +1,113 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AppointmentSlot, Doctor, DoctorSchedule
+from app.scheduling import Slot, Template, as_utc, availability_index, booking_window, clinic_tz, slot_end
+from app.schemas import DoctorScheduleEntry
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+class InvalidSlot(ValueError):
+    """The requested slot is not on the doctor's schedule or outside the booking window"""
+
+async def get_doctor_schedule(db: AsyncSession, doctor_id: UUID):
+    """A doctor's weekly templates, by weekday and start time"""
+    result = await db.execute(
+        select(DoctorSchedule)
+        .where(DoctorSchedule.doctor_id == doctor_id)
+        .order_by(DoctorSchedule.weekday, DoctorSchedule.start_time)
+    )
+    return result.scalars().all()
+
+def _check_entries(entries: Sequence[DoctorScheduleEntry]):
+    """Raise ValueError for empty or overlapping working hours on a day"""
+    by_day = sorted(entries, key=lambda entry: (entry.weekday, entry.start_time))
+    for entry in by_day:
+        if entry.end_time <= entry.start_time:
+            raise ValueError(f"{WEEKDAYS[entry.weekday]}: end_time must be after start_time")
+    for previous, entry in zip(by_day, by_day[1:]):
+        if previous.weekday == entry.weekday and entry.start_time < previous.end_time:
+            raise ValueError(f"{WEEKDAYS[entry.weekday]}: working hours overlap")
+
+async def replace_doctor_schedule(db: AsyncSession, doctor_id: UUID, entries: Sequence[DoctorScheduleEntry]):
+    """Replace a doctor's weekly templates in one transaction
+
+    Existing bookings are kept even if their slot is no longer on the schedule.
+    """
+    _check_entries(entries)
+    await db.execute(delete(DoctorSchedule).where(DoctorSchedule.doctor_id == doctor_id))
+    if entries:
+        await db.execute(insert(DoctorSchedule), [
+            {"doctor_id": doctor_id, **entry.dict()} for entry in entries
+        ])
+    await db.commit()
+    availability_index.invalidate()
+    return await get_doctor_schedule(db, doctor_id)
+
+async def _load_availability(db: AsyncSession):
+    """Every template with its doctor, and the slots held inside the booking window"""
+    schedules = await db.execute(
+        select(
+            DoctorSchedule.doctor_id,
+            Doctor.name,
+            Doctor.specialization,
+            Doctor.department,
+            DoctorSchedule.weekday,
+            DoctorSchedule.start_time,
+            DoctorSchedule.end_time,
+            DoctorSchedule.slot_minutes
+        ).join(Doctor, Doctor.id == DoctorSchedule.doctor_id)
+    )
+    start, end = booking_window()
+    held = await db.execute(
+        select(AppointmentSlot.doctor_id, AppointmentSlot.slot_start, AppointmentSlot.slot_end)
+        .where(AppointmentSlot.slot_start < end, AppointmentSlot.slot_end > start)
+    )
+    return schedules.all(), [tuple(row) for row in held]
+
+def _window(date_from: Optional[datetime], date_to: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Requested range clipped to the booking window"""
+    start, end = booking_window()
+    if date_from is not None:
+        start = max(start, as_utc(date_from))
+    if date_to is not None:
+        end = min(end, as_utc(date_to))
+    return start, end
+
+async def get_free_slots(db: AsyncSession, doctor_id: UUID, date_from: Optional[datetime] = None,
+                         date_to: Optional[datetime] = None, limit: int = 100) -> List[Slot]:
+    """A doctor's free slots in the range, earliest first"""
+    await availability_index.ensure_fresh(lambda: _load_availability(db))
+    start, end = _window(date_from, date_to)
+    return availability_index.free_slots(doctor_id, start, end, limit)
+
+async def find_next_free_slots(db: AsyncSession, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                               specializations: Optional[List[str]] = None, departments: Optional[List[str]] = None,
+                               limit: int = 10) -> List[Slot]:
+    """Earliest free slot of each matching doctor, the ``limit`` soonest first"""
+    await availability_index.ensure_fresh(lambda: _load_availability(db))
+    start, end = _window(date_from, date_to)
+    return availability_index.next_free(start, end, specializations, departments, limit)
+
+async def resolve_slot(db: AsyncSession, doctor_id: UUID, requested: datetime) -> Tuple[datetime, datetime]:
+    """(start, end) in UTC of the doctor's slot starting at ``requested``; raises InvalidSlot
+
+    Reads the templates from the database, not the index: bookings must not
+    act on a schedule another worker has already replaced.
+    """
+    start = as_utc(requested)
+    window_start, window_end = booking_window()
+    if not window_start <= start < window_end:
+        raise InvalidSlot("Slot is in the past or beyond the booking window")
+    tz = clinic_tz()
+    result = await db.execute(
+        select(DoctorSchedule.start_time, DoctorSchedule.end_time, DoctorSchedule.slot_minutes)
+        .where(DoctorSchedule.doctor_id == doctor_id, DoctorSchedule.weekday == start.astimezone(tz).weekday())
+        .order_by(DoctorSchedule.start_time)
+    )
+    end = slot_end([Template(*row) for row in result], start, tz)
+    if end is None:
+        raise InvalidSlot("The doctor has no slot starting at that time")
+    return start, end
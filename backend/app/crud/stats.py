@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import AppointmentDailyStats, AppointmentStatusTotals
+from app.schemas import AppointmentDayStats, AppointmentStats
+from uuid import UUID
+
+STATUSES = ("pending", "confirmed", "cancelled", "completed")
+
+async def get_appointment_stats(db: AsyncSession, doctor_id: UUID, days: int = 30) -> AppointmentStats:
+    """A doctor's appointment counts by status, overall and for each of the last ``days`` days (UTC)
+
+    Read from the trigger-maintained counters: primary key lookups whose cost
+    depends on the number of days asked for, not on the number of appointments.
+    """
+    totals = dict.fromkeys(STATUSES, 0)
+    result = await db.execute(
+        select(AppointmentStatusTotals.status, AppointmentStatusTotals.appointments)
+        .where(AppointmentStatusTotals.doctor_id == doctor_id)
+    )
+    for status, appointments in result:
+        if appointments:
+            totals[status] = appointments
+
+    today = datetime.now(timezone.utc).date()
+    first = today - timedelta(days=days - 1)
+    daily = {first + timedelta(days=offset): dict.fromkeys(STATUSES, 0) for offset in range(days)}
+    result = await db.execute(
+        select(AppointmentDailyStats.day, AppointmentDailyStats.status, AppointmentDailyStats.appointments)
+        .where(
+            AppointmentDailyStats.doctor_id == doctor_id,
+            AppointmentDailyStats.day >= first,
+            AppointmentDailyStats.day <= today
+        )
+    )
+    for day, status, appointments in result:
+        if appointments:
+            daily[day][status] = appointments
+    return AppointmentStats(
+        totals=totals,
+        daily=[AppointmentDayStats(day=day, counts=counts) for day, counts in daily.items()]
+    )
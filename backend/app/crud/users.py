@@ -1,36 +1,47 @@
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import directory_cache, invalidate_principal
 from app.models import Patient, Doctor
-from app.schemas import PatientCreate, DoctorCreate
-from app.utils import get_password_hash, verify_password
+from app.pagination import decode_cursor
+from app.schemas import PatientCreate, DoctorCreate, DoctorUpdate
+from app.config import settings
+from app.search import DoctorEntry, SearchHit, doctor_search_index
+from app.utils import get_password_hash_async, verify_password_async
+from typing import List, Optional
 from uuid import UUID
 
+# Auth lookups log at DEBUG only; enable per module with LOG_LEVELS='{"app.crud.users": "DEBUG"}'
+logger = logging.getLogger(__name__)
+
 # Patient CRUD operations
-def get_patient_by_contact(db: Session, contact: str):
+async def get_patient_by_contact(db: AsyncSession, contact: str):
     """Get patient by contact"""
-    return db.query(Patient).filter(Patient.contact == contact).first()
+    result = await db.execute(select(Patient).where(Patient.contact == contact))
+    return result.scalars().first()
 
-def get_patient_by_id(db: Session, patient_id: UUID):
+async def get_patient_by_id(db: AsyncSession, patient_id: UUID):
     """Get patient by ID"""
-    return db.query(Patient).filter(Patient.id == patient_id).first()
+    result = await db.execute(select(Patient).where(Patient.id == patient_id))
+    return result.scalars().first()
 
-def create_patient(db: Session, patient: PatientCreate):
+async def create_patient(db: AsyncSession, patient: PatientCreate):
     """Create a new patient"""
     db_patient = Patient(
         name=patient.name,
         contact=patient.contact,
-        password_hash=get_password_hash(patient.password)
+        password_hash=await get_password_hash_async(patient.password)
     )
     db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
+    await db.commit()
+    await db.refresh(db_patient)
+    invalidate_principal("patient", db_patient.contact)
     return db_patient
 
-def authenticate_patient(db: Session, contact: str, password: str):
+async def authenticate_patient(db: AsyncSession, contact: str, password: str):
     """Authenticate patient with contact and password"""
-    logger = logging.getLogger(__name__)
     logger.debug("Authenticating patient with contact=%s", contact)
-    patient = get_patient_by_contact(db, contact)
+    patient = await get_patient_by_contact(db, contact)
     if not patient:
         logger.debug("Patient not found: %s", contact)
         return False
@@ -40,42 +51,151 @@ def authenticate_patient(db: Session, contact: str, password: str):
         logger.debug("Patient has no password_hash set: %s", contact)
         return False
 
-    if not verify_password(password, patient.password_hash):
+    if not await verify_password_async(password, patient.password_hash):
         logger.debug("Password verification failed for patient: %s", contact)
         return False
     return patient
 
 # Doctor CRUD operations
-def get_doctor_by_email(db: Session, email: str):
+async def get_doctor_by_email(db: AsyncSession, email: str):
     """Get doctor by email"""
-    return db.query(Doctor).filter(Doctor.email == email).first()
+    result = await db.execute(select(Doctor).where(Doctor.email == email))
+    return result.scalars().first()
 
-def get_doctor_by_id(db: Session, doctor_id: UUID):
+async def get_doctor_by_id(db: AsyncSession, doctor_id: UUID):
     """Get doctor by ID"""
-    return db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    result = await db.execute(select(Doctor).where(Doctor.id == doctor_id))
+    return result.scalars().first()
+
+async def get_all_doctors(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    """Get all doctors, ordered by (created_at, id) with offset or keyset paging"""
+    query = select(Doctor).order_by(Doctor.created_at, Doctor.id)
+    if cursor:
+        created_at, doctor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Doctor.created_at, Doctor.id) > (created_at, doctor_id))
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+def _doctor_facet_filters(specializations: Optional[List[str]], departments: Optional[List[str]]):
+    """Exact-match facet conditions, keyed by facet so each can be left out of its own count"""
+    conditions = {}
+    if specializations:
+        conditions["specialization"] = Doctor.specialization.in_(specializations)
+    if departments:
+        conditions["department"] = Doctor.department.in_(departments)
+    return conditions
+
+async def _search_doctors_sql(db: AsyncSession, query: Optional[str], specializations, departments, limit: int, offset: int):
+    """pg_trgm search: word prefix or trigram similarity on lower(name), GIN indexed"""
+    name = func.lower(Doctor.name)
+    criteria = []
+    order = [Doctor.name, Doctor.id]
+    if query:
+        term = " ".join(query.lower().split())
+        prefix = or_(name.startswith(term, autoescape=True), name.contains(" " + term, autoescape=True))
+        criteria.append(or_(prefix, name.op("%")(term)))
+        order = [case((prefix, 0), else_=1), func.similarity(name, term).desc()] + order
+    facets = _doctor_facet_filters(specializations, departments)
+
+    result = await db.execute(
+        select(Doctor, func.count().over().label("total"))
+        .where(*criteria, *facets.values())
+        .order_by(*order)
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = result.all()
+    total = rows[0].total if rows else 0
+
+    counts = {}
+    for facet, column in (("specialization", Doctor.specialization), ("department", Doctor.department)):
+        others = [condition for key, condition in facets.items() if key != facet]
+        grouped = await db.execute(
+            select(column, func.count())
+            .where(*criteria, *others, column.isnot(None))
+            .group_by(column)
+            .order_by(func.count().desc())
+        )
+        counts[facet] = {value: count for value, count in grouped}
+    if not rows and offset:
+        total = (await db.execute(
+            select(func.count()).select_from(Doctor).where(*criteria, *facets.values())
+        )).scalar()
+    return [row.Doctor for row in rows], total, counts
+
+async def _load_doctor_entries(db: AsyncSession):
+    result = await db.execute(select(Doctor.id, Doctor.name, Doctor.specialization, Doctor.department))
+    return [DoctorEntry(*row) for row in result]
 
-def get_all_doctors(db: Session, skip: int = 0, limit: int = 100):
-    """Get all doctors"""
-    return db.query(Doctor).offset(skip).limit(limit).all()
+async def search_doctors(db: AsyncSession, query: Optional[str] = None, specializations: Optional[List[str]] = None,
+                         departments: Optional[List[str]] = None, limit: int = 20, offset: int = 0):
+    """Search doctors by name (prefix or fuzzy) with specialization/department facets
 
-def create_doctor(db: Session, doctor: DoctorCreate):
+    Returns (page of doctors, total matches, facet counts). Uses pg_trgm on
+    Postgres and the in-memory index from app.search elsewhere.
+    """
+    query = " ".join((query or "").split()) or None
+    backend = settings.doctor_search_backend
+    if backend == "auto":
+        backend = "postgres" if db.bind.dialect.name == "postgresql" else "memory"
+    if backend == "postgres":
+        return await _search_doctors_sql(db, query, specializations, departments, limit, offset)
+
+    await doctor_search_index.ensure_fresh(lambda: _load_doctor_entries(db))
+    hit: SearchHit = doctor_search_index.search(query, specializations, departments, limit, offset)
+    if not hit.ids:
+        return [], hit.total, hit.facets
+    result = await db.execute(select(Doctor).where(Doctor.id.in_(hit.ids)))
+    by_id = {doctor.id: doctor for doctor in result.scalars()}
+    return [by_id[doctor_id] for doctor_id in hit.ids if doctor_id in by_id], hit.total, hit.facets
+
+async def get_doctors_version(db: AsyncSession):
+    """Doctor count and newest updated_at, versioning the doctor directory"""
+    result = await db.execute(select(func.count(Doctor.id), func.max(Doctor.updated_at)))
+    return tuple(result.one())
+
+async def get_doctor_version(db: AsyncSession, doctor_id: UUID):
+    """A doctor's updated_at, or None if the doctor does not exist"""
+    result = await db.execute(select(Doctor.updated_at).where(Doctor.id == doctor_id))
+    return result.scalar()
+
+async def create_doctor(db: AsyncSession, doctor: DoctorCreate):
     """Create a new doctor (secret key already validated in frontend)"""
     db_doctor = Doctor(
         name=doctor.name,
         email=doctor.email,
-        password_hash=get_password_hash(doctor.password),
+        password_hash=await get_password_hash_async(doctor.password),
         qualification=doctor.qualification
     )
     db.add(db_doctor)
-    db.commit()
-    db.refresh(db_doctor)
+    await db.commit()
+    await db.refresh(db_doctor)
+    invalidate_principal("doctor", db_doctor.email)
+    await directory_cache.invalidate()
+    return db_doctor
+
+async def update_doctor(db: AsyncSession, doctor_id: UUID, doctor: DoctorUpdate):
+    """Update a doctor's profile (only provided fields)"""
+    db_doctor = await get_doctor_by_id(db, doctor_id)
+    if not db_doctor:
+        return None
+
+    update_data = doctor.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_doctor, field, value)
+
+    await db.commit()
+    await db.refresh(db_doctor)
+    invalidate_principal("doctor", db_doctor.email)
+    await directory_cache.invalidate()
     return db_doctor
 
-def authenticate_doctor(db: Session, email: str, password: str):
+async def authenticate_doctor(db: AsyncSession, email: str, password: str):
     """Authenticate doctor with email and password"""
-    logger = logging.getLogger(__name__)
     logger.debug("Authenticating doctor with email=%s", email)
-    doctor = get_doctor_by_email(db, email)
+    doctor = await get_doctor_by_email(db, email)
     if not doctor:
         logger.debug("Doctor not found: %s", email)
         return False
@@ -85,7 +205,7 @@ def authenticate_doctor(db: Session, email: str, password: str):
         logger.debug("Doctor has no password_hash set: %s", email)
         return False
 
-    if not verify_password(password, doctor.password_hash):
+    if not await verify_password_async(password, doctor.password_hash):
         logger.debug("Password verification failed for doctor: %s", email)
         return False
     return doctor
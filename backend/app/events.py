@@ -0,0 +1,204 @@
+import asyncio
+import itertools
+import json
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.logging_config import log_event
+
+# Appointment change events for push subscribers (see app/routers/events.py).
+# Every worker keeps an in-process broker keyed by channel name:
+#   doctor:<id>, patient:<id>, appointment:<code>
+# With EVENTS_BACKEND=postgres, events are sent through NOTIFY on
+# settings.events_channel and every worker (including the sender) LISTENs and
+# fans them out to its local subscribers, so a change made by one worker reaches
+# clients connected to any of them. If the LISTEN connection drops, it is
+# re-established with backoff; until then the broker is degraded: events only
+# reach this worker's subscribers, and NOTIFYs from other workers are missed.
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """Bounded queue of events for one connected client"""
+
+    def __init__(self, channels: Set[str], maxsize: int):
+        self.channels = channels
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event: dict):
+        # Slow clients lose the oldest events instead of growing memory
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class EventBroker:
+    """In-process pub/sub with an optional Postgres LISTEN/NOTIFY fan-out"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.sequence = itertools.count(1)
+        self.metrics = {
+            "published": 0, "delivered": 0, "dropped": 0, "subscribers": 0,
+            "disconnects": 0, "connect_failures": 0
+        }
+        self._connection = None  # asyncpg connection used for LISTEN and NOTIFY
+        self._lock = asyncio.Lock()
+        self._lost = asyncio.Event()  # set when the connection closes
+        self._task = None  # keeps the connection up (postgres backend)
+
+    @property
+    def degraded(self) -> bool:
+        """Fan-out configured but not connected: events stay in this worker"""
+        return self._task is not None and self._connection is None
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(set(channels), settings.events_queue_size)
+        for channel in subscription.channels:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        self.metrics["subscribers"] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for channel in subscription.channels:
+            listeners = self.subscribers.get(channel)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self.subscribers[channel]
+        self.metrics["subscribers"] -= 1
+        self.metrics["dropped"] += subscription.dropped
+
+    def deliver(self, channels: Iterable[str], event: dict):
+        """Hand an event to local subscribers of any of ``channels`` (once each)"""
+        targets = set()
+        for channel in channels:
+            targets.update(self.subscribers.get(channel, ()))
+        for subscription in targets:
+            subscription.put(event)
+        self.metrics["delivered"] += len(targets)
+
+    async def publish(self, channels: Iterable[str], event: dict):
+        channels = list(channels)
+        self.metrics["published"] += 1
+        if self._connection is None:
+            self.deliver(channels, {**event, "seq": next(self.sequence)})
+            return
+        payload = json.dumps({"channels": channels, "event": event}, default=str)
+        try:
+            async with self._lock:
+                await self._connection.execute("SELECT pg_notify($1, $2)", settings.events_channel, payload)
+        except Exception:
+            # Pushing is best effort; the change itself is already committed
+            logger.exception("Could not send appointment event through NOTIFY")
+            self.deliver(channels, {**event, "seq": next(self.sequence)})
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        self.deliver(message["channels"], {**message["event"], "seq": next(self.sequence)})
+
+    def _on_connection_lost(self, connection):
+        # asyncpg termination listener: runs on close, error or a dropped socket
+        if connection is self._connection:
+            self._connection = None
+            self._lost.set()
+
+    async def _connect(self):
+        import asyncpg
+
+        from app.database import DATABASE_URL
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = await asyncpg.connect(dsn)
+        connection.add_termination_listener(self._on_connection_lost)
+        await connection.add_listener(settings.events_channel, self._on_notify)
+        self._lost.clear()
+        self._connection = connection
+
+    async def _ping(self):
+        """Drop a connection that stopped answering (a dead peer may never reset the socket)"""
+        connection = self._connection
+        if connection is None:
+            return
+        try:
+            async with self._lock:
+                await asyncio.wait_for(connection.execute("SELECT 1"), settings.events_check_interval)
+        except Exception:
+            connection.terminate()  # runs _on_connection_lost
+
+    async def _supervise(self):
+        """Keep the LISTEN connection up, reconnecting with exponential backoff"""
+        delay = settings.events_reconnect_min
+        while True:
+            if self._connection is None:
+                try:
+                    await self._connect()
+                except Exception as e:
+                    self.metrics["connect_failures"] += 1
+                    log_event(
+                        logger, "events.connect_failed", level=logging.WARNING,
+                        error=str(e), retry_in=delay
+                    )
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, settings.events_reconnect_max)
+                    continue
+                delay = settings.events_reconnect_min
+                log_event(logger, "events.listening", channel=settings.events_channel)
+            try:
+                await asyncio.wait_for(self._lost.wait(), settings.events_check_interval)
+            except asyncio.TimeoutError:
+                await self._ping()
+                continue
+            self.metrics["disconnects"] += 1
+            log_event(logger, "events.connection_lost", level=logging.WARNING, channel=settings.events_channel)
+
+    async def start(self):
+        """Start the LISTEN/NOTIFY fan-out when configured (connects in the background)"""
+        if settings.events_backend == "postgres" and self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics, "channels": len(self.subscribers), "backend": settings.events_backend,
+            "degraded": self.degraded
+        }
+
+broker = EventBroker()
+
+def appointment_channels(appointment) -> list:
+    """Channels interested in a change to ``appointment`` (ORM object or row)"""
+    channels = [f"appointment:{appointment.appointment_code}", f"patient:{appointment.patient_id}"]
+    if appointment.doctor_id is not None:
+        channels.append(f"doctor:{appointment.doctor_id}")
+    return channels
+
+async def publish_appointment_event(event_type: str, appointment):
+    """Announce a committed appointment change to push subscribers"""
+    event = {
+        "type": event_type,
+        "appointment_id": str(appointment.id),
+        "appointment_code": appointment.appointment_code,
+        "status": appointment.status,
+        "doctor_id": str(appointment.doctor_id) if appointment.doctor_id else None,
+        "patient_id": str(appointment.patient_id),
+    }
+    await broker.publish(appointment_channels(appointment), event)
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Conditional GET support. Routes compute a cheap version (updated_at values,
+# row counts) before loading anything, derive a strong ETag from it plus the
+# query string, and answer If-None-Match hits with 304 and no body.
+
+# Clients may keep a copy but must revalidate before every use; private since
+# responses depend on the caller's token
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the version parts (None, datetimes and ids are fine)"""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already names ``etag``"""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and _matches(if_none_match, etag)
+
+def request_etag(request: Request, *version) -> str:
+    """ETag for this URL (path and query) at ``version``"""
+    return make_etag(request.url.path, request.url.query, *version)
+
+def check_etag(request: Request, response: Response, *version) -> Optional[Response]:
+    """Tag ``response`` with the ETag for ``version``; return a 304 if the client has it
+
+        not_modified = check_etag(request, response, row.updated_at)
+        if not_modified:
+            return not_modified
+    """
+    etag = request_etag(request, *version)
+    if is_fresh(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+    return None
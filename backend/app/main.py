@@ -1,9 +1,18 @@
-from fastapi import FastAPI, Depends
-import logging
+from fastapi import FastAPI, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
-from app.database import Base, SessionLocal, engine
-from app.routers import appointments, auth, patients
+from app.database import Base, SessionLocal, async_engine, engine, get_pool_metrics, replica_set
+from app.routers import appointments, auth, bulk, events, patients
+from app.cache import directory_cache, principal_cache
+from app.config import settings
+from app.events import broker
+from app.logging_config import RequestIdMiddleware, setup_logging, shutdown_logging
+from app.partitions import partition_maintainer
+from app.profiling import ProfilingMiddleware, install_query_hooks
+from app.replicas import ReplicaRoutingMiddleware
+from app.utils import HashingPoolBusy, get_hashing_metrics
 # Import all models so SQLAlchemy can create the tables
 from app import models
 
@@ -17,8 +26,21 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure basic logging for debugging auth issues
-logging.basicConfig(level=logging.DEBUG)
+# Structured, queue-based logging; levels come from settings (LOG_LEVEL, LOG_LEVELS)
+setup_logging()
+
+# Opt-in SQL profiling: statement count and DB time per request as Server-Timing
+if settings.profiling_enabled:
+    install_query_hooks(async_engine)
+    for replica in replica_set.replicas:
+        install_query_hooks(replica.engine)
+    app.add_middleware(ProfilingMiddleware)
+
+# GET requests read from replicas when REPLICA_URLS is set; writers are pinned to the primary
+app.add_middleware(ReplicaRoutingMiddleware, replicas=replica_set)
+
+# Tag every log record of a request with its id (X-Request-ID or generated)
+app.add_middleware(RequestIdMiddleware)
 
 # Configure CORS - must be before including routers
 app.add_middleware(
@@ -33,8 +55,42 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router)
 app.include_router(appointments.router)
+app.include_router(bulk.router)
+app.include_router(events.router)
 app.include_router(patients.router)
 
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    """Shed login/registration load while the hashing pool is saturated"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Every pooled connection stayed busy for pool_timeout seconds"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.on_event("startup")
+async def start_events():
+    await broker.start()
+    await replica_set.start()
+    await partition_maintainer.start()
+
+@app.on_event("shutdown")
+async def dispose_engine():
+    await broker.stop()
+    await replica_set.stop()
+    await partition_maintainer.stop()
+    await async_engine.dispose()
+    shutdown_logging()
+
 @app.get("/")
 async def root():
     return {"message": "Hospital Management System API", "version": "1.0.0"}
@@ -43,6 +99,19 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics for monitoring"""
+    return {
+        "pool": get_pool_metrics(),
+        "hashing": get_hashing_metrics(),
+        "principal_cache": principal_cache.stats(),
+        "directory_cache": directory_cache.stats(),
+        "events": broker.stats(),
+        "replicas": replica_set.stats(),
+        "partitions": partition_maintainer.metrics
+    }
+
 @app.get("/test-db")
 async def test_database():
     """Test database connection and check if tables exist"""
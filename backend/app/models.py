@@ -1,10 +1,25 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import DDL, CheckConstraint, Column, Date, Integer, String, Text, DateTime, ForeignKey, Index, SmallInteger, Time, UniqueConstraint, event, text
+from sqlalchemy.dialects.postgresql import UUID, ExcludeConstraint
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import now
+from app.config import settings
 from app.database import Base
 import uuid
 
+@compiles(UUID, "sqlite")
+def _uuid_sqlite(type_, compiler, **kw):
+    # SQLite stand-in (benchmarks, local tests) stores UUIDs as 32-char hex
+    return "CHAR(32)"
+
+@compiles(now, "sqlite")
+def _now_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP has whole seconds, but SQLAlchemy binds datetimes (keyset
+    # cursors included) as text with microseconds; the same format keeps
+    # server-set and bound timestamps comparable
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
 # Simplified models matching the new DDL schema
 
 class Config(Base):
@@ -39,26 +54,490 @@ class Doctor(Base):
     experience = Column(Text)
     bio = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     # Relationships
     appointments = relationship("Appointment", back_populates="doctor")
+    schedules = relationship("DoctorSchedule", back_populates="doctor", order_by="[DoctorSchedule.weekday, DoctorSchedule.start_time]")
+    
+    __table_args__ = (
+        # Keyset pagination order for the doctor directory
+        Index("doctors_created_id_idx", "created_at", "id"),
+        # max(updated_at) versions the directory for ETags
+        Index("doctors_updated_at_idx", "updated_at"),
+        # Doctor search: fuzzy/prefix name matching and exact-match facets
+        Index(
+            "doctors_name_trgm_idx", text("lower(name) gin_trgm_ops"), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        Index("doctors_specialization_idx", "specialization"),
+        Index("doctors_department_idx", "department"),
+    )
 
-class Appointment(Base):
-    __tablename__ = "appointments"
+# The trigram index needs pg_trgm before the doctors table is created
+event.listen(
+    Doctor.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+class DoctorSchedule(Base):
+    """Weekly working-hours template: on ``weekday`` the doctor takes slots of
+    ``slot_minutes`` from ``start_time`` to ``end_time`` (clinic local time)"""
+    __tablename__ = "doctor_schedules"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    appointment_code = Column(Text, unique=True, nullable=False, index=True)
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False, index=True)
-    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="SET NULL"), index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False)
+    weekday = Column(SmallInteger, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    slot_minutes = Column(Integer, nullable=False, default=30)
+    
+    # Relationships
+    doctor = relationship("Doctor", back_populates="schedules")
+    
+    __table_args__ = (
+        UniqueConstraint("doctor_id", "weekday", "start_time", name="doctor_schedules_doctor_weekday_start_key"),
+        CheckConstraint("weekday BETWEEN 0 AND 6", name="doctor_schedules_weekday_check"),
+        CheckConstraint("end_time > start_time", name="doctor_schedules_hours_check"),
+        CheckConstraint("slot_minutes > 0", name="doctor_schedules_slot_minutes_check"),
+    )
+
+# Appointments holding their slot: cancelling one releases it
+SLOT_HELD = "status <> 'cancelled' AND slot_start IS NOT NULL"
+# Terminal statuses; only these are ever archived
+CLOSED_STATUSES = ("completed", "cancelled")
+
+class AppointmentColumns:
+    """Columns shared by live appointments and the archive (same names and order)"""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    appointment_code = Column(Text, nullable=False)  # unique across both tables through appointment_codes
+    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="SET NULL"))
     problem = Column(Text, nullable=False)
     severity = Column(Text, nullable=True)  # mild, moderate, severe
     duration = Column(Text, nullable=True)  # e.g., "2 days", "1 week"
     medical_history = Column(Text, nullable=True)  # patient's previous diseases/conditions
     status = Column(Text, nullable=False, default='pending')  # pending, confirmed, cancelled, completed
     cancellation_reason = Column(Text, nullable=True)  # reason if cancelled by doctor
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    slot_start = Column(DateTime(timezone=True), nullable=True)  # reserved time slot, if booked with one
+    slot_end = Column(DateTime(timezone=True), nullable=True)
+    triage_key = Column(DateTime(timezone=True), nullable=True)  # created_at minus the severity head start (app/triage.py)
+    # Partition key, so part of the primary key (Postgres requires it in every unique index)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+# Appointments are range partitioned by month of created_at on Postgres (see
+# app/partitions.py), and closed ones move to appointments_archive after
+# archive_after_months. Unique indexes on a partitioned table must include
+# the partition key, so the two rules that span every partition (and the
+# archive) live in small registry tables instead: appointment_codes and
+# appointment_slots, claimed by a trigger on insert.
+class Appointment(AppointmentColumns, Base):
+    __tablename__ = "appointments"
     
     # Relationships
     patient = relationship("Patient", back_populates="appointments")
     doctor = relationship("Doctor", back_populates="appointments")
+    
+    __table_args__ = (
+        Index("appointments_patient_idx", "patient_id"),
+        Index("appointments_doctor_idx", "doctor_id"),
+        Index("appointments_code_idx", "appointment_code"),
+        # Keyset pagination: lists are ordered by (created_at, id)
+        Index("appointments_created_id_idx", "created_at", "id"),
+        Index("appointments_patient_created_idx", "patient_id", "created_at", "id"),
+        Index("appointments_doctor_created_idx", "doctor_id", "created_at", "id"),
+        # Status-filtered queues, e.g. a doctor's pending appointments oldest first
+        Index("appointments_doctor_status_created_idx", "doctor_id", "status", "created_at", "id"),
+        Index("appointments_patient_status_created_idx", "patient_id", "status", "created_at", "id"),
+        # Triage queues: a doctor's (or, joined to doctors, a department's) pending appointments by priority
+        Index("appointments_doctor_status_triage_idx", "doctor_id", "status", "triage_key", "id"),
+        Index("appointments_status_triage_idx", "status", "triage_key", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+class ArchivedAppointment(AppointmentColumns, Base):
+    """Closed appointments moved out of the live table by the archive job
+
+    Only the history indexes: the queue, triage and status indexes stay
+    small because these rows are no longer in them.
+    """
+    __tablename__ = "appointments_archive"
+    
+    __table_args__ = (
+        # Same definitions as on appointments, so a whole month moves over keeping them
+        Index("appointments_archive_patient_created_idx", "patient_id", "created_at", "id"),
+        Index("appointments_archive_doctor_created_idx", "doctor_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+class AppointmentCode(Base):
+    """Every appointment code in use, live or archived, and where its row is"""
+    __tablename__ = "appointment_codes"
+    
+    appointment_code = Column(Text, primary_key=True)
+    appointment_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)  # partition key of the appointment
+
+class AppointmentSlot(Base):
+    """Slots held by live appointments (SLOT_HELD): no two for one doctor may overlap"""
+    __tablename__ = "appointment_slots"
+    
+    doctor_id = Column(UUID(as_uuid=True), primary_key=True)
+    slot_start = Column(DateTime(timezone=True), primary_key=True)
+    slot_end = Column(DateTime(timezone=True), nullable=False)
+    appointment_id = Column(UUID(as_uuid=True), nullable=False)
+    
+    __table_args__ = (
+        Index("appointment_slots_appointment_idx", "appointment_id"),
+        Index("appointment_slots_end_idx", "slot_end"),
+        ExcludeConstraint(
+            ("doctor_id", "="), (text("tstzrange(slot_start, slot_end)"), "&&"),
+            using="gist", name="appointment_slots_doctor_excl"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# The exclusion constraint compares uuids with = inside a GiST index
+event.listen(
+    AppointmentSlot.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql")
+)
+
+# Monthly partitions <parent>_YYYY_MM, bounds in UTC, for ``months`` months from
+# first_month. A month whose rows already sit in the default partition is
+# skipped with a warning (creating it would fail).
+POSTGRES_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent regclass, first_month date, months integer) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    month date;
+    lower_bound timestamp with time zone;
+    upper_bound timestamp with time zone;
+    partition_name text;
+    occupied boolean;
+    created integer := 0;
+BEGIN
+    -- One caller at a time (several workers check on startup)
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_monthly_partitions'));
+    FOR i IN 0 .. months - 1 LOOP
+        month := (date_trunc('month', first_month) + make_interval(months => i))::date;
+        partition_name := format('%s_%s', parent::text, to_char(month, 'YYYY_MM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        lower_bound := month::timestamp AT TIME ZONE 'UTC';
+        upper_bound := (month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+        IF to_regclass(parent::text || '_default') IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE created_at >= %L AND created_at < %L)',
+                           parent::text || '_default', lower_bound, upper_bound)
+            INTO occupied;
+            IF occupied THEN
+                RAISE WARNING 'rows for % are in the default partition; not creating %', month, partition_name;
+                CONTINUE;
+            END IF;
+        END IF;
+        EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, parent, lower_bound, upper_bound);
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+POSTGRES_PARTITIONS = {
+    "appointments": [
+        POSTGRES_PARTITION_FUNCTION,
+        "CREATE TABLE IF NOT EXISTS appointments_default PARTITION OF appointments DEFAULT",
+        # The current month and partition_months_ahead more; app/partitions.py keeps extending them
+        f"SELECT ensure_monthly_partitions('appointments', current_date, {settings.partition_months_ahead + 1})",
+    ],
+    "appointments_archive": [
+        "CREATE TABLE IF NOT EXISTS appointments_archive_default PARTITION OF appointments_archive DEFAULT",
+    ],
+}
+for _statement in POSTGRES_PARTITIONS["appointments"]:
+    event.listen(Appointment.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in POSTGRES_PARTITIONS["appointments_archive"]:
+    event.listen(ArchivedAppointment.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+# Appointment text search on Postgres (app/crud/appointments.py): problem
+# (weight A) and medical history (B) as a stored generated tsvector, so every
+# insert and update keeps it current, GIN indexed with doctor_id (btree_gin)
+# because a search never leaves one doctor's appointments. Same definition on
+# both tables, so a month moved to the archive keeps its index. The column is
+# left unmapped (SQLite has no tsvector; it uses the index in app/search.py).
+SEARCH_CONFIG = "english"
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(problem, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(medical_history, '')), 'B')"
+)
+POSTGRES_SEARCH = {
+    table.name: [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED",
+        f"CREATE INDEX IF NOT EXISTS {table.name}_doctor_search_idx ON {table.name} USING gin (doctor_id, search_vector)",
+    ]
+    for table in (Appointment.__table__, ArchivedAppointment.__table__)
+}
+for _table in (Appointment.__table__, ArchivedAppointment.__table__):
+    for _statement in POSTGRES_SEARCH[_table.name]:
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+# Registry upkeep. An insert claims the slot, then the code, and is skipped
+# (like ON CONFLICT DO NOTHING, nothing returned) when either is taken, so a
+# booking race still inserts exactly one row. Status, slot or code changes
+# update the claims; a delete gives them back, except the code of a row
+# that has just been copied to the archive.
+_NEW_HOLDS = "NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL"
+_KEYS_CHANGED = (
+    "OLD.appointment_code IS DISTINCT FROM NEW.appointment_code OR OLD.doctor_id IS DISTINCT FROM NEW.doctor_id "
+    "OR OLD.slot_start IS DISTINCT FROM NEW.slot_start OR OLD.slot_end IS DISTINCT FROM NEW.slot_end "
+    "OR (OLD.status = 'cancelled') IS DISTINCT FROM (NEW.status = 'cancelled')"
+)
+_ARCHIVED_OLD = "SELECT 1 FROM appointments_archive WHERE id = OLD.id AND created_at = OLD.created_at"
+
+POSTGRES_KEYS_FUNCTIONS = [
+    f"""
+CREATE OR REPLACE FUNCTION appointment_claim_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF {_NEW_HOLDS} THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id)
+        ON CONFLICT DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    INSERT INTO appointment_codes (appointment_code, appointment_id, created_at)
+    VALUES (NEW.appointment_code, NEW.id, NEW.created_at)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        DELETE FROM appointment_slots WHERE appointment_id = NEW.id;
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END
+$$
+""",
+    f"""
+CREATE OR REPLACE FUNCTION appointment_sync_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_slots WHERE appointment_id = OLD.id;
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS ({_ARCHIVED_OLD}) THEN
+            DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF NEW.appointment_code <> OLD.appointment_code THEN
+        UPDATE appointment_codes SET appointment_code = NEW.appointment_code WHERE appointment_code = OLD.appointment_code;
+    END IF;
+    -- Fails the update (unique or exclusion violation) if the new slot is taken
+    IF {_NEW_HOLDS} THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id);
+    END IF;
+    RETURN NULL;
+END
+$$
+""",
+    """
+CREATE OR REPLACE FUNCTION appointment_archive_release_code() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+    RETURN NULL;
+END
+$$
+""",
+]
+
+POSTGRES_KEYS_TRIGGERS = [
+    "CREATE TRIGGER trg_appointments_claim_keys BEFORE INSERT ON appointments "
+    "FOR EACH ROW EXECUTE FUNCTION appointment_claim_keys()",
+    "CREATE TRIGGER trg_appointments_keys_update AFTER UPDATE ON appointments "
+    f"FOR EACH ROW WHEN ({_KEYS_CHANGED}) EXECUTE FUNCTION appointment_sync_keys()",
+    "CREATE TRIGGER trg_appointments_keys_delete AFTER DELETE ON appointments "
+    "FOR EACH ROW EXECUTE FUNCTION appointment_sync_keys()",
+    "CREATE TRIGGER trg_appointments_archive_release_code AFTER DELETE ON appointments_archive "
+    "FOR EACH ROW EXECUTE FUNCTION appointment_archive_release_code()",
+]
+
+# SQLite: one writer at a time, so check-then-insert inside a trigger is atomic
+_SQLITE_NEW_HOLDS = "NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL"
+_SQLITE_SLOT_TAKEN = (
+    "EXISTS (SELECT 1 FROM appointment_slots WHERE doctor_id = NEW.doctor_id "
+    "AND slot_start < NEW.slot_end AND slot_end > NEW.slot_start AND appointment_id IS NOT NEW.id)"
+)
+_SQLITE_HOLD = (
+    "INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id) "
+    f"SELECT NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id WHERE {_SQLITE_NEW_HOLDS};"
+)
+SQLITE_KEYS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_claim_keys BEFORE INSERT ON appointments BEGIN "
+    "SELECT RAISE(IGNORE) WHERE EXISTS (SELECT 1 FROM appointment_codes WHERE appointment_code = NEW.appointment_code) "
+    f"OR ({_SQLITE_NEW_HOLDS} AND {_SQLITE_SLOT_TAKEN}); "
+    "INSERT INTO appointment_codes (appointment_code, appointment_id, created_at) "
+    f"VALUES (NEW.appointment_code, NEW.id, NEW.created_at); {_SQLITE_HOLD} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_keys_update "
+    "AFTER UPDATE OF appointment_code, doctor_id, status, slot_start, slot_end ON appointments "
+    f"WHEN {_KEYS_CHANGED.replace('IS DISTINCT FROM', 'IS NOT')} BEGIN "
+    f"SELECT RAISE(ABORT, 'appointment slot is taken') WHERE {_SQLITE_NEW_HOLDS} AND {_SQLITE_SLOT_TAKEN}; "
+    "UPDATE appointment_codes SET appointment_code = NEW.appointment_code "
+    "WHERE appointment_code = OLD.appointment_code AND NEW.appointment_code IS NOT OLD.appointment_code; "
+    f"DELETE FROM appointment_slots WHERE appointment_id = OLD.id; {_SQLITE_HOLD} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_keys_delete AFTER DELETE ON appointments BEGIN "
+    "DELETE FROM appointment_slots WHERE appointment_id = OLD.id; "
+    f"DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code AND NOT EXISTS ({_ARCHIVED_OLD}); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_archive_release_code AFTER DELETE ON appointments_archive BEGIN "
+    "DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code; END",
+]
+
+# Registries for rows that already exist when they are created
+KEYS_BACKFILL = [
+    "INSERT INTO appointment_codes (appointment_code, appointment_id, created_at) "
+    "SELECT appointment_code, id, created_at FROM appointments "
+    "UNION ALL SELECT appointment_code, id, created_at FROM appointments_archive",
+    "INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id) "
+    f"SELECT doctor_id, slot_start, slot_end, id FROM appointments WHERE {SLOT_HELD} AND doctor_id IS NOT NULL",
+]
+
+# Triggers go in once appointments, the archive and both registries exist
+AppointmentSlot.__table__.add_is_dependent_on(Appointment.__table__)
+AppointmentSlot.__table__.add_is_dependent_on(ArchivedAppointment.__table__)
+AppointmentSlot.__table__.add_is_dependent_on(AppointmentCode.__table__)
+for _statement in [*POSTGRES_KEYS_FUNCTIONS, *POSTGRES_KEYS_TRIGGERS, *KEYS_BACKFILL]:
+    event.listen(AppointmentSlot.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in [*SQLITE_KEYS_TRIGGERS, *KEYS_BACKFILL]:
+    event.listen(AppointmentSlot.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+# Dashboard counters, maintained by triggers on appointments in the same
+# transaction as every insert, status change and delete, whichever code path
+# (or psql session) made it. Days are creation days in UTC; an appointment is
+# counted under its current status and doctor, archived ones included (the
+# archive job copies before it deletes, see _DELETED). No foreign key to
+# doctors: deleting a doctor sets its appointments' doctor_id to NULL, which
+# the triggers see as an update and count down to zero.
+class AppointmentDailyStats(Base):
+    """Appointments per doctor, creation day and status"""
+    __tablename__ = "appointment_daily_stats"
+    
+    doctor_id = Column(UUID(as_uuid=True), primary_key=True)
+    day = Column(Date, primary_key=True)
+    status = Column(Text, primary_key=True)
+    appointments = Column(Integer, nullable=False, default=0)
+
+class AppointmentStatusTotals(Base):
+    """Appointments per doctor and status, all days together"""
+    __tablename__ = "appointment_status_totals"
+    
+    doctor_id = Column(UUID(as_uuid=True), primary_key=True)
+    status = Column(Text, primary_key=True)
+    appointments = Column(Integer, nullable=False, default=0)
+
+# Postgres: one statement-level trigger per operation. The transition tables
+# hold every row the statement touched, so a bulk import or batch update
+# applies one aggregated upsert per counter instead of one per row, and
+# updates that leave doctor, day and status alone change nothing.
+_POSTGRES_STATS_APPLY = """
+        WITH changes AS ({changes}),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;"""
+_ADDED = "SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows"
+_REMOVED = "SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows"
+# Rows deleted because the archive job copied them to appointments_archive are still counted
+_DELETED = (
+    f"{_REMOVED} WHERE NOT EXISTS (SELECT 1 FROM appointments_archive AS archived "
+    "WHERE archived.id = old_rows.id AND archived.created_at = old_rows.created_at)"
+)
+# Counter upserts are sorted so concurrent statements lock counter rows in the same order
+POSTGRES_STATS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION appointment_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_POSTGRES_STATS_APPLY.format(changes=_ADDED)}
+    ELSIF TG_OP = 'DELETE' THEN{_POSTGRES_STATS_APPLY.format(changes=_DELETED)}
+    ELSE{_POSTGRES_STATS_APPLY.format(changes=f"{_ADDED} UNION ALL {_REMOVED}")}
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+POSTGRES_STATS_TRIGGERS = [
+    "CREATE TRIGGER trg_appointments_stats_insert AFTER INSERT ON appointments "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply()",
+    "CREATE TRIGGER trg_appointments_stats_update AFTER UPDATE ON appointments "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply()",
+    "CREATE TRIGGER trg_appointments_stats_delete AFTER DELETE ON appointments "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply()",
+]
+
+# SQLite (local stand-in) has only row triggers
+_SQLITE_STATS_ADD = """
+    INSERT INTO appointment_daily_stats (doctor_id, day, status, appointments)
+    SELECT NEW.doctor_id, date(NEW.created_at), NEW.status, 1 WHERE NEW.doctor_id IS NOT NULL
+    ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = appointments + 1;
+    INSERT INTO appointment_status_totals (doctor_id, status, appointments)
+    SELECT NEW.doctor_id, NEW.status, 1 WHERE NEW.doctor_id IS NOT NULL
+    ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = appointments + 1;
+"""
+_SQLITE_STATS_REMOVE = """
+    UPDATE appointment_daily_stats SET appointments = appointments - 1
+    WHERE doctor_id = OLD.doctor_id AND day = date(OLD.created_at) AND status = OLD.status;
+    UPDATE appointment_status_totals SET appointments = appointments - 1
+    WHERE doctor_id = OLD.doctor_id AND status = OLD.status;
+"""
+SQLITE_STATS_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_insert AFTER INSERT ON appointments BEGIN {_SQLITE_STATS_ADD} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_update AFTER UPDATE OF doctor_id, status, created_at ON appointments "
+    "WHEN OLD.doctor_id IS NOT NEW.doctor_id OR OLD.status IS NOT NEW.status OR OLD.created_at IS NOT NEW.created_at "
+    f"BEGIN {_SQLITE_STATS_REMOVE} {_SQLITE_STATS_ADD} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_delete AFTER DELETE ON appointments "
+    f"WHEN NOT EXISTS ({_ARCHIVED_OLD}) BEGIN {_SQLITE_STATS_REMOVE} END",
+]
+
+# Counters for appointments that already exist when the tables are created
+_ALL_APPOINTMENTS = (
+    "(SELECT doctor_id, status, created_at FROM appointments "
+    "UNION ALL SELECT doctor_id, status, created_at FROM appointments_archive) AS counted"
+)
+STATS_BACKFILL = {
+    "postgresql": [
+        "INSERT INTO appointment_daily_stats (doctor_id, day, status, appointments) "
+        f"SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date, status, count(*) FROM {_ALL_APPOINTMENTS} "
+        "WHERE doctor_id IS NOT NULL GROUP BY 1, 2, 3",
+        "INSERT INTO appointment_status_totals (doctor_id, status, appointments) "
+        f"SELECT doctor_id, status, count(*) FROM {_ALL_APPOINTMENTS} WHERE doctor_id IS NOT NULL GROUP BY 1, 2",
+    ],
+    "sqlite": [
+        "INSERT INTO appointment_daily_stats (doctor_id, day, status, appointments) "
+        f"SELECT doctor_id, date(created_at), status, count(*) FROM {_ALL_APPOINTMENTS} "
+        "WHERE doctor_id IS NOT NULL GROUP BY 1, 2, 3",
+        "INSERT INTO appointment_status_totals (doctor_id, status, appointments) "
+        f"SELECT doctor_id, status, count(*) FROM {_ALL_APPOINTMENTS} WHERE doctor_id IS NOT NULL GROUP BY 1, 2",
+    ],
+}
+
+# Triggers and backfill run once both counter tables (and the archive) exist
+AppointmentStatusTotals.__table__.add_is_dependent_on(AppointmentDailyStats.__table__)
+AppointmentStatusTotals.__table__.add_is_dependent_on(ArchivedAppointment.__table__)
+for _statement in [POSTGRES_STATS_FUNCTION, *POSTGRES_STATS_TRIGGERS, *STATS_BACKFILL["postgresql"]]:
+    event.listen(AppointmentStatusTotals.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in [*SQLITE_STATS_TRIGGERS, *STATS_BACKFILL["sqlite"]]:
+    event.listen(AppointmentStatusTotals.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
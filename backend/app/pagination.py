@@ -0,0 +1,39 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+# Opaque keyset cursors. A cursor is the (created_at, id) of the last row of a
+# page; the next page continues strictly after it in (created_at, id) order.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(ValueError):
+    """The cursor query parameter could not be decoded"""
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Encode the position after a row as an opaque cursor string"""
+    raw = json.dumps([created_at.isoformat(), str(row_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Decode a cursor back to (created_at, id); raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+def next_cursor(rows, limit: int):
+    """Cursor for the page after ``rows``, or None when this was the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.created_at, last.id)
+
+def set_next_cursor(response, rows, limit: int):
+    """Expose the next page cursor as a header so list bodies keep their shape"""
+    cursor = next_cursor(rows, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+from datetime import date, datetime, time, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, text, tuple_
+
+from app.config import settings
+from app.database import async_engine, engine
+from app.logging_config import log_event
+from app.models import CLOSED_STATUSES, Appointment, AppointmentSlot, ArchivedAppointment
+
+# Appointment partitions and archive. On Postgres appointments is range
+# partitioned by month of created_at (appointments_YYYY_MM, bounds in UTC,
+# plus appointments_default for anything outside them). The app keeps
+# partition_months_ahead empty months ready (PartitionMaintainer, at startup
+# and every partition_check_interval), so new rows never land in the default.
+#
+# The archive job moves completed and cancelled appointments created before
+# the month archive_after_months ago into appointments_archive, which is
+# partitioned the same way but only indexed for history (patient/doctor by
+# created_at). The live table then holds recent and still open appointments,
+# and its queue, triage and status indexes stay that size. A month with
+# nothing open moves whole: its partition is detached and attached to the
+# archive (no rows copied, the history indexes are kept, the rest dropped).
+# Anything left (months with open appointments, the default partition, and
+# SQLite, which has no partitions) is copied and deleted in batches.
+# Appointment lists, code lookups and exports read both tables.
+#
+#     python -m app.partitions                    # create missing partitions
+#     python -m app.partitions --archive          # and archive (e.g. nightly from cron)
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_PARTITION = re.compile(r"^appointments_(\d{4})_(\d{2})$")
+# Only closed appointments are archived, and closed is final (see TRANSITIONS)
+_OPEN_ROWS = "status NOT IN ({})".format(", ".join(f"'{status}'" for status in CLOSED_STATUSES))
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month``'s"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def month_bounds(month: date) -> Tuple[datetime, datetime]:
+    """[start, end) of a month in UTC, as the partitions are bounded"""
+    start = datetime.combine(month.replace(day=1), time(), tzinfo=timezone.utc)
+    return start, datetime.combine(add_months(month, 1), time(), tzinfo=timezone.utc)
+
+def archive_cutoff(months: int, today: Optional[date] = None) -> datetime:
+    """Start of the month ``months`` before this one: closed appointments created earlier are archived"""
+    today = today or datetime.now(timezone.utc).date()
+    return month_bounds(add_months(today, -months))[0]
+
+def ensure_partitions(conn, months_ahead: Optional[int] = None) -> int:
+    """Create this month's partition and ``months_ahead`` more if missing; returns how many were created"""
+    if conn.dialect.name != "postgresql":
+        return 0
+    months = (settings.partition_months_ahead if months_ahead is None else months_ahead) + 1
+    return conn.execute(
+        text("SELECT ensure_monthly_partitions('appointments', :today, :months)"),
+        {"today": datetime.now(timezone.utc).date(), "months": months}
+    ).scalar()
+
+def _partition_months(conn) -> List[date]:
+    """Months that have a partition under appointments, oldest first"""
+    names = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'appointments'::regclass"
+    )).scalars()
+    return sorted(
+        date(int(match[1]), int(match[2]), 1) for match in map(MONTHLY_PARTITION.match, names) if match
+    )
+
+def _move_month(month: date) -> bool:
+    """Move a month's partition under appointments_archive; False if it still has open appointments
+
+    Holds a SHARE lock on the month (its writes wait, reads go on) while the
+    bounds check is validated, then detaches it, which briefly locks
+    appointments itself; archive_lock_timeout_ms caps the wait for that lock.
+    """
+    name = f"appointments_{month:%Y_%m}"
+    archived = f"appointments_archive_{month:%Y_%m}"
+    start, end = month_bounds(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": archived}).scalar() is not None:
+            return False  # rows of this month were archived one by one before; keep doing that
+        conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.archive_lock_timeout_ms)}"))
+        conn.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE {_OPEN_ROWS})")).scalar():
+            return False
+        # A valid CHECK matching the bounds spares ATTACH its own scan under the stronger lock
+        conn.execute(text(
+            f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+            f"CHECK (created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}') NOT VALID"
+        ))
+        conn.execute(text(f"ALTER TABLE {name} VALIDATE CONSTRAINT {name}_bounds"))
+        conn.execute(text(f"ALTER TABLE appointments DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {archived}"))
+        conn.execute(text(f"ALTER TABLE appointments_archive ATTACH PARTITION {archived} FOR VALUES {bounds}"))
+        # The archive adopts the indexes it also has; the others only served the live queues
+        unused = conn.execute(text(
+            "SELECT indexrelid::regclass::text FROM pg_index "
+            "WHERE indrelid = CAST(:name AS regclass) AND indexrelid NOT IN (SELECT inhrelid FROM pg_inherits)"
+        ), {"name": archived}).scalars().all()
+        for index in unused:
+            conn.execute(text(f"DROP INDEX {index}"))
+        conn.execute(text(f"ALTER TABLE {archived} DROP CONSTRAINT {name}_bounds"))
+    return True
+
+def _months_spanned(first: datetime, last: datetime) -> int:
+    first, last = first.astimezone(timezone.utc), last.astimezone(timezone.utc)
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+def _move_rows(cutoff: datetime, batch_size: int) -> int:
+    """Copy closed appointments created before ``cutoff`` to the archive and delete them, a batch per transaction
+
+    The copy comes first, so the delete triggers can tell an archived row
+    (code kept, still counted in the dashboard stats) from a deleted one.
+    """
+    columns = list(Appointment.__table__.columns)  # same names and order as the archive
+    moved = 0
+    after = None
+    while True:
+        with engine.begin() as conn:
+            # Walks (created_at, id) in index order and leaves open rows behind
+            # in Python: filtering on status makes the planner pick a status
+            # index and sort every closed row again for each batch
+            keys = (
+                select(Appointment.id, Appointment.created_at, Appointment.status)
+                .where(Appointment.created_at < cutoff)
+                .order_by(Appointment.created_at, Appointment.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                keys = keys.where(tuple_(Appointment.created_at, Appointment.id) > after)
+            if conn.dialect.name == "postgresql":
+                keys = keys.with_for_update(skip_locked=True)
+            scanned = conn.execute(keys).all()
+            if not scanned:
+                return moved
+            after = (scanned[-1].created_at, scanned[-1].id)
+            rows = [row for row in scanned if row.status in CLOSED_STATUSES]
+            if not rows:
+                continue
+            first, last = rows[0].created_at, rows[-1].created_at
+            if conn.dialect.name == "postgresql":
+                conn.execute(
+                    text("SELECT ensure_monthly_partitions('appointments_archive', :first, :months)"),
+                    {"first": first.astimezone(timezone.utc).date(), "months": _months_spanned(first, last)}
+                )
+            # The created_at range lets Postgres skip the other months' partitions
+            batch = (Appointment.id.in_([row.id for row in rows]), Appointment.created_at.between(first, last))
+            conn.execute(
+                insert(ArchivedAppointment).from_select([column.name for column in columns], select(*columns).where(*batch))
+            )
+            conn.execute(delete(Appointment).where(*batch))
+            moved += len(rows)
+
+def archive_appointments(older_than_months: Optional[int] = None, batch_size: Optional[int] = None) -> dict:
+    """Move closed appointments created before the cutoff month into appointments_archive
+
+    Whole months first (Postgres), then the remaining rows in batches. Also
+    releases slot holds that ended before the cutoff and tops up the future
+    partitions. Safe to rerun; returns a summary.
+    """
+    months = settings.archive_after_months if older_than_months is None else older_than_months
+    cutoff = archive_cutoff(months)
+    summary = {"cutoff": cutoff.isoformat(), "months_moved": [], "rows_moved": 0}
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            candidates = [month for month in _partition_months(conn) if month_bounds(month)[1] <= cutoff]
+        for month in candidates:
+            if _move_month(month):
+                summary["months_moved"].append(f"{month:%Y-%m}")
+    summary["rows_moved"] = _move_rows(cutoff, batch_size or settings.archive_batch_size)
+    with engine.begin() as conn:
+        summary["slots_released"] = conn.execute(
+            delete(AppointmentSlot).where(AppointmentSlot.slot_end < cutoff)
+        ).rowcount
+        summary["partitions_created"] = ensure_partitions(conn)
+    log_event(logger, "appointments.archived", **summary)
+    return summary
+
+class PartitionMaintainer:
+    """Creates upcoming monthly partitions at startup and every partition_check_interval"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.metrics = {"checks": 0, "created": 0, "failures": 0}
+        self._task = None
+
+    async def check(self):
+        async with self.engine.begin() as conn:
+            created = await conn.run_sync(ensure_partitions)
+        self.metrics["checks"] += 1
+        self.metrics["created"] += created
+        if created:
+            log_event(logger, "partitions.created", count=created)
+
+    async def _monitor(self):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                self.metrics["failures"] += 1
+                logger.exception("Partition check failed")
+            await asyncio.sleep(settings.partition_check_interval)
+
+    async def start(self):
+        if self.engine.dialect.name == "postgresql" and self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+partition_maintainer = PartitionMaintainer(async_engine)
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming appointment partitions and archive closed appointments")
+    parser.add_argument("--archive", action="store_true", help="also archive closed appointments")
+    parser.add_argument("--older-than", type=int, default=settings.archive_after_months, help="months (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    args = parser.parse_args()
+
+    if args.archive:
+        result = archive_appointments(args.older_than, args.batch_size)
+    else:
+        with engine.begin() as conn:
+            result = {"partitions_created": ensure_partitions(conn)}
+    # CLI output for cron/scripts: one JSON line on stdout, logs stay on their handlers
+    sys.stdout.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
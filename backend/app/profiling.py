@@ -0,0 +1,160 @@
+import contextlib
+import contextvars
+import heapq
+import logging
+import time
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import async_engine
+from app.logging_config import log_event
+
+# Per-request SQL profiling. Engine events record every statement into the
+# RequestStats bound to the current context; ProfilingMiddleware binds one per
+# request, reports it as a Server-Timing header and logs the slowest statements.
+# query_budget() binds one around a block of test code.
+
+logger = logging.getLogger(__name__)
+
+_stats_var = contextvars.ContextVar("request_stats", default=None)
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or block issued more SQL statements than its budget"""
+
+class RequestStats:
+    """Statement count, DB time and the slowest statements of one request"""
+
+    def __init__(self, keep: int = 3, parent: "RequestStats" = None):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.keep = keep
+        self.slowest = []  # min-heap of (seconds, statement)
+        self.parent = parent
+
+    def record(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        if self.keep:
+            entry = (seconds, statement)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+        if self.parent is not None:
+            self.parent.record(statement, seconds)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _stats_var.get() is not None:
+        conn.info.setdefault("profiling_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats_var.get()
+    starts = conn.info.get("profiling_start")
+    if stats is not None and starts:
+        stats.record(statement, time.perf_counter() - starts.pop())
+
+def _handle_error(context):
+    starts = context.connection.info.get("profiling_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def install_query_hooks(engine):
+    """Attach the statement timing hooks to an engine (sync or async)"""
+    target = getattr(engine, "sync_engine", engine)
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+@contextlib.contextmanager
+def query_budget(max_statements: int):
+    """Fail the enclosing test if the block issues more than ``max_statements`` statements
+
+        with query_budget(3):
+            client.post("/api/appointments/confirm", ...)
+    """
+    install_query_hooks(async_engine)
+    stats = RequestStats(keep=0)
+    token = _stats_var.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats_var.reset(token)
+    if stats.statements > max_statements:
+        raise QueryBudgetExceeded(f"{stats.statements} SQL statements issued, budget is {max_statements}")
+
+def _route_name(scope) -> str:
+    """Route template (e.g. "GET /api/appointments/{appointment_id}") once routing has run"""
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}"
+
+class ProfilingMiddleware:
+    """ASGI middleware adding Server-Timing (DB statements and time) to every response
+
+    Enabled with PROFILING_ENABLED. Statements slower than SLOW_QUERY_MS are
+    logged with their route; with QUERY_BUDGET_STRICT routes listed in
+    QUERY_BUDGETS raise QueryBudgetExceeded when they go over their budget.
+    The budget is checked as the response starts, so the request fails (a 500,
+    and the exception reaches an in-process test client) instead of the
+    error coming after the response was sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(keep=settings.profiling_slowest, parent=_stats_var.get())
+        start = time.perf_counter()
+        budget_checked = False
+
+        async def send_with_timing(message):
+            nonlocal budget_checked
+            if message["type"] == "http.response.start":
+                if not budget_checked:
+                    # Once: the 500 sent for the exception comes through here too
+                    budget_checked = True
+                    self._check_budget(scope, stats)
+                total_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} queries", '
+                    f"app;dur={total_ms:.2f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        token = _stats_var.set(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stats_var.reset(token)
+            self._report(scope, stats)
+        if not budget_checked:
+            self._check_budget(scope, stats)
+
+    def _report(self, scope, stats: RequestStats):
+        route = _route_name(scope)
+        threshold = settings.slow_query_ms / 1000
+        for seconds, statement in sorted(stats.slowest, reverse=True):
+            if seconds < threshold:
+                break
+            log_event(
+                logger, "db.slow_statement", level=logging.WARNING,
+                route=route, duration_ms=round(seconds * 1000, 2), statement=statement[:1000]
+            )
+
+    def _check_budget(self, scope, stats: RequestStats):
+        route = _route_name(scope)
+        budget = settings.query_budgets.get(route)
+        if budget is not None and stats.statements > budget:
+            log_event(
+                logger, "db.query_budget_exceeded", level=logging.WARNING,
+                route=route, statements=stats.statements, budget=budget
+            )
+            if settings.query_budget_strict:
+                raise QueryBudgetExceeded(f"{route} issued {stats.statements} SQL statements, budget is {budget}")
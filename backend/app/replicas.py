@@ -0,0 +1,245 @@
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import Delete, Insert, Select, Update, event, text
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.config import settings
+from app.logging_config import log_event
+
+# Read-replica routing. Sessions bind per statement (RoutingSession.get_bind):
+# everything goes to the primary unless the current request is a plain GET
+# (ReplicaRoutingMiddleware) and the session has not written yet, in which
+# case SELECTs go to a healthy replica, round robin. Staleness is bounded by:
+#   - a session that wrote reads from the primary from then on;
+#   - an authenticated client (by Authorization header) that sent a write is
+#     pinned to the primary for replica_pin_seconds, so it reads its writes;
+#   - replicas lagging more than replica_max_lag are skipped;
+#   - reads whose results are cached past the request use primary_reads().
+# Replicas that fail a health check or drop a connection are skipped until a
+# later check passes; with none left, reads fall back to the primary. A GET
+# whose replica fails before any response was sent is retried on the primary.
+# Pins are per worker process: keep replica_max_lag below replica_pin_seconds.
+
+logger = logging.getLogger(__name__)
+
+class ReadRoute:
+    """Set for requests whose reads may go to replicas"""
+    replica_failed = False
+
+_read_route_var = contextvars.ContextVar("read_route", default=None)
+
+@contextlib.contextmanager
+def primary_reads():
+    """Send the block's reads to the primary, e.g. results cached past the request"""
+    token = _read_route_var.set(None)
+    try:
+        yield
+    finally:
+        _read_route_var.reset(token)
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class Replica:
+    """One replica engine and its last known health"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.healthy = True  # until the first check says otherwise
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+        self.failures = 0  # times taken out of rotation
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # Dropped connections and failed connects take the replica out of rotation
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(str(context.original_exception))
+            route = _read_route_var.get()
+            if route is not None:
+                route.replica_failed = True
+
+    def mark_down(self, error: str):
+        if self.healthy:
+            log_event(logger, "replica.down", level=logging.WARNING, replica=self.name, error=error[:200])
+            self.failures += 1
+        self.healthy = False
+        self.error = error
+
+    async def check(self):
+        """Connect, measure lag and update ``healthy``"""
+        try:
+            async with self.engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    lag = float(await conn.scalar(POSTGRES_LAG_SQL))
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            self.mark_down(str(e))
+        else:
+            was_healthy = self.healthy
+            self.lag = lag
+            self.healthy = lag <= settings.replica_max_lag
+            self.error = None if self.healthy else f"lag {lag:.1f}s"
+            if self.healthy and not was_healthy:
+                log_event(logger, "replica.up", replica=self.name, lag=lag)
+        self.checked_at = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "replica": self.name,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "reads": self.reads,
+            "failures": self.failures,
+            "error": self.error,
+        }
+
+class ReplicaSet:
+    """Primary engine, its replicas, their health and the clients pinned to the primary"""
+
+    def __init__(self, primary, replicas=()):
+        self.primary = primary
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.pins = TTLCache(10000)  # recently writing clients; evicting one only ends its pin early
+        self.metrics = {"primary_reads": 0, "fallbacks": 0, "pins": 0, "retries": 0}
+        self._rotation = itertools.count()
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pin(self, client: str):
+        """Send ``client``'s reads to the primary for replica_pin_seconds"""
+        self.metrics["pins"] += 1
+        self.pins.set(client, True, time.time() + settings.replica_pin_seconds)
+
+    def is_pinned(self, client: str) -> bool:
+        return self.pins.get(client) is not None
+
+    def choose(self):
+        """Next healthy replica engine, or the primary if none is healthy"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.metrics["fallbacks"] += 1
+            return self.primary
+        replica = healthy[next(self._rotation) % len(healthy)]
+        replica.reads += 1
+        return replica.engine
+
+    async def check(self):
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    async def _monitor(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.replica_check_interval)
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {**self.metrics, "replicas": [replica.stats() for replica in self.replicas]}
+
+class RoutingSession(Session):
+    """Session that sends reads of GET requests to replicas (see module comment)
+
+    The ReplicaSet comes from the session's ``info["replicas"]``.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        replicas: ReplicaSet = self.info.get("replicas")
+        if replicas is None or not replicas.enabled:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["wrote"] = True
+            return replicas.primary.sync_engine
+        if (
+            _read_route_var.get() is None
+            or self.info.get("wrote")
+            or not isinstance(clause, Select)
+            or clause._for_update_arg is not None
+        ):
+            replicas.metrics["primary_reads"] += 1
+            return replicas.primary.sync_engine
+        # Keep one replica per session so a request sees a single snapshot
+        engine = self.info.get("replica")
+        if engine is None:
+            engine = self.info["replica"] = replicas.choose()
+        return engine.sync_engine
+
+SAFE_METHODS = ("GET", "HEAD")
+
+def _client_key(scope) -> Optional[str]:
+    # Anonymous writes (login, registration) have nothing to read back
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            return value.decode("latin-1")
+    return None
+
+class ReplicaRoutingMiddleware:
+    """ASGI middleware allowing replica reads for GETs of clients not pinned to the primary"""
+
+    def __init__(self, app, replicas: ReplicaSet):
+        self.app = app
+        self.replicas = replicas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.replicas.enabled:
+            return await self.app(scope, receive, send)
+
+        client = _client_key(scope)
+        if scope["method"] not in SAFE_METHODS:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if client is not None:
+                    self.replicas.pin(client)
+            return
+
+        if client is not None and self.replicas.is_pinned(client):
+            return await self.app(scope, receive, send)
+
+        route = ReadRoute()
+        started = False
+
+        async def send_tracking(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        token = _read_route_var.set(route)
+        try:
+            await self.app(scope, receive, send_tracking)
+        except Exception:
+            if started or not route.replica_failed:
+                raise
+            self.replicas.metrics["retries"] += 1
+            _read_route_var.set(None)
+            await self.app(scope, receive, send)
+        finally:
+            _read_route_var.reset(token)
@@ -1,47 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Literal, Optional, Set, Union
 
 from app.database import get_db
-from app.models import Patient, Doctor, Appointment
+from app.models import Appointment
 from app.schemas import (
+    Principal,
     AppointmentCreate,
+    AppointmentFilter,
+    AppointmentListItem,
     AppointmentUpdate,
     AppointmentResponse,
     AppointmentCodeLookup,
     AppointmentConfirm,
-    AppointmentReject
+    AppointmentReject,
+    AppointmentBatchTransition,
+    AppointmentBatchResult,
+    AppointmentSearchResult,
+    AppointmentStats
 )
 from app.crud.appointments import (
     create_appointment,
     get_appointment_by_code,
-    get_appointment_by_id,
+    get_appointment_version_by_code,
+    get_appointments_version,
     get_patient_appointments,
     get_doctor_appointments,
     get_all_appointments,
+    get_triage_queue,
+    search_doctor_appointments,
+    pop_next_appointment,
+    batch_transition_appointments,
+    transition_appointment,
     update_appointment,
-    cancel_appointment
+    cancel_appointment,
+    AppointmentNotOwned,
+    SlotUnavailable,
+    TransitionConflict
 )
-from app.routers.auth import get_current_user
+from app.crud.schedules import InvalidSlot
+from app.crud.stats import get_appointment_stats
+from app.config import settings
+from app.http_cache import check_etag
+from app.pagination import InvalidCursor, set_next_cursor
+from app.routers.auth import get_current_principal
+from app.serialization import Encoder, JSONBytesResponse, json_response
 
 router = APIRouter(prefix="/api/appointments", tags=["Appointments"])
 
+def appointment_filters(
+    status: Optional[List[str]] = Query(None, description="Repeat to match several statuses"),
+    severity: Optional[List[str]] = Query(None, description="Repeat to match several severities"),
+    date_from: Optional[datetime] = Query(None, description="Created at or after"),
+    date_to: Optional[datetime] = Query(None, description="Created before"),
+    sort: Literal["created_at", "-created_at"] = "created_at"
+) -> AppointmentFilter:
+    """List filters shared by the appointment list endpoints"""
+    return AppointmentFilter(
+        status=status,
+        severity=[value.lower() for value in severity] if severity else None,
+        date_from=date_from,
+        date_to=date_to,
+        sort=sort
+    )
+
+EXPANDABLE = {"patient", "doctor"}
+
+def appointment_expand(
+    expand: Optional[str] = Query(None, description="Comma separated nested objects to include in full: patient,doctor")
+) -> Set[str]:
+    """Nested objects to return in full; list rows otherwise carry only id/name summaries"""
+    if not expand:
+        return set()
+    requested = {part.strip() for part in expand.split(",") if part.strip()}
+    unknown = requested - EXPANDABLE
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot expand: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+_appointment_encoder = Encoder(AppointmentResponse)
+_list_item_encoder = Encoder(AppointmentListItem)
+
+def _appointment_list_response(response: Response, appointments, expand: Set[str]):
+    """Encode a list page directly (fast_serialization) or leave it to response_model"""
+    if not settings.fast_serialization:
+        return appointments
+    encoder = _appointment_encoder if expand else _list_item_encoder
+    return json_response(response, encoder.encode(appointments))
+
 @router.post("/", response_model=AppointmentResponse)
 async def create_new_appointment(
     appointment: AppointmentCreate,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create a new appointment (patient only)"""
-    if not isinstance(current_user, Patient):
+    """Create a new appointment (patient only)
+
+    With ``slot_start`` (a start from the doctor's availability) the slot is
+    reserved atomically: 409 if someone else holds it, 400 if it is not a slot
+    of the doctor's schedule.
+    """
+    if current_user.type != "patient":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only patients can create appointments"
         )
     
     try:
-        db_appointment = create_appointment(db, appointment, current_user.id)
+        db_appointment = await create_appointment(db, appointment, current_user.id)
         return db_appointment
+    except InvalidSlot as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except SlotUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -51,10 +133,26 @@ async def create_new_appointment(
 @router.get("/code/{appointment_code}", response_model=AppointmentResponse)
 async def get_appointment_by_code_route(
     appointment_code: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get appointment by appointment code (public access for patients to check status)"""
-    appointment = get_appointment_by_code(db, appointment_code)
+    """Get appointment by appointment code (public access for patients to check status)
+
+    Revalidate with If-None-Match: an unchanged appointment costs one narrow
+    version query and a 304 instead of the joined load.
+    """
+    version = await get_appointment_version_by_code(db, appointment_code)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appointment not found"
+        )
+    not_modified = check_etag(request, response, *version)
+    if not_modified:
+        return not_modified
+    
+    appointment = await get_appointment_by_code(db, appointment_code)
     if not appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -62,54 +160,189 @@ async def get_appointment_by_code_route(
         )
     return appointment
 
-@router.get("/my", response_model=List[AppointmentResponse])
+@router.get("/my", response_model=Union[List[AppointmentResponse], List[AppointmentListItem]])
 async def get_my_appointments(
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    filters: AppointmentFilter = Depends(appointment_filters),
+    expand: Set[str] = Depends(appointment_expand)
 ):
-    """Get appointments for current user (patient or doctor)"""
-    if isinstance(current_user, Patient):
-        appointments = get_patient_appointments(db, current_user.id, skip, limit)
-    elif isinstance(current_user, Doctor):
-        appointments = get_doctor_appointments(db, current_user.id, skip, limit)
-    else:
+    """Get appointments for current user (patient or doctor)
+
+    Pass the X-Next-Cursor header of a page as ``cursor`` to fetch the next one;
+    ``skip`` is still honoured when no cursor is given. Rows carry patient/doctor
+    summaries unless ``expand=patient,doctor`` asks for the full objects.
+    Responses carry an ETag; send it back as If-None-Match to get a 304.
+    """
+    # Token types are always patient or doctor (see _decode_credentials)
+    owner = {f"{current_user.type}_id": current_user.id}
+    version = await get_appointments_version(db, filters=filters, **owner)
+    not_modified = check_etag(request, response, current_user.id, *version)
+    if not_modified:
+        return not_modified
+    
+    try:
+        if current_user.type == "patient":
+            appointments = await get_patient_appointments(db, current_user.id, skip, limit, cursor, filters, expand)
+        elif current_user.type == "doctor":
+            appointments = await get_doctor_appointments(db, current_user.id, skip, limit, cursor, filters, expand)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid user type"
+            )
+    except InvalidCursor:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid user type"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
     
-    return appointments
+    set_next_cursor(response, appointments, limit)
+    return _appointment_list_response(response, appointments, expand)
 
-@router.get("/all", response_model=List[AppointmentResponse])
+@router.get("/all", response_model=Union[List[AppointmentResponse], List[AppointmentListItem]])
 async def get_all_appointments_route(
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    filters: AppointmentFilter = Depends(appointment_filters),
+    expand: Set[str] = Depends(appointment_expand)
 ):
     """Get all appointments (admin/doctor only)"""
-    if not isinstance(current_user, Doctor):
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can view all appointments"
         )
     
-    appointments = get_all_appointments(db, skip, limit)
-    return appointments
+    try:
+        appointments = await get_all_appointments(db, skip, limit, cursor, filters, expand)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    set_next_cursor(response, appointments, limit)
+    return _appointment_list_response(response, appointments, expand)
+
+@router.get("/search", response_model=AppointmentSearchResult)
+async def search_appointments_route(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in problems and medical history"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over your appointments, archived ones included, best match first (doctor only)
+
+    Every word must match; matches in the problem rank above matches in the
+    medical history.
+    """
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can search appointments"
+        )
+    
+    appointments, total = await search_doctor_appointments(db, current_user.id, q, limit, offset)
+    if settings.fast_serialization:
+        return JSONBytesResponse(content={"total": total, "appointments": _list_item_encoder.dump(appointments)})
+    return {"total": total, "appointments": appointments}
+
+@router.get("/stats", response_model=AppointmentStats)
+async def get_appointment_stats_route(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+    days: int = Query(30, ge=1, le=366, description="Daily counts for this many days, ending today (UTC)")
+):
+    """Your appointment counts by status, in total and per day (doctor only)"""
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can view appointment statistics"
+        )
+    
+    return await get_appointment_stats(db, current_user.id, days)
+
+@router.get("/queue", response_model=List[AppointmentListItem])
+async def get_triage_queue_route(
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+    department: Optional[str] = Query(None, description="Show this department's queue instead of your own"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Pending appointments in triage order: severity head start plus time waited (doctor only)"""
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can view triage queues"
+        )
+    
+    if department is not None:
+        queue = await get_triage_queue(db, department=department, limit=limit)
+    else:
+        queue = await get_triage_queue(db, doctor_id=current_user.id, limit=limit)
+    return _appointment_list_response(response, queue, set())
+
+@router.post("/queue/next", response_model=AppointmentResponse)
+async def pop_next_appointment_route(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Confirm and return the next patient in your triage queue (doctor only)"""
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can take patients from the queue"
+        )
+    
+    appointment = await pop_next_appointment(db, current_user)
+    if not appointment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No pending appointments"
+        )
+    return appointment
+
+@contextmanager
+def _transition_errors(action: str):
+    """HTTP errors for a failed transition: 403 not yours, 409 wrong state"""
+    try:
+        yield
+    except AppointmentNotOwned:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You can only {action} your own appointments"
+        )
+    except TransitionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.put("/{appointment_id}", response_model=AppointmentResponse)
 async def update_appointment_route(
     appointment_id: str,
     appointment: AppointmentUpdate,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update appointment (doctor only - change status)"""
-    print(f"\n[ROUTER] Update appointment request - ID: {appointment_id}, Status: {appointment.status}")
-    
-    if not isinstance(current_user, Doctor):
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can update appointments"
@@ -124,21 +357,20 @@ async def update_appointment_route(
             detail="Invalid appointment ID format"
         )
     
-    db_appointment = update_appointment(db, appointment_uuid, appointment)
+    with _transition_errors("update"):
+        db_appointment = await update_appointment(db, appointment_uuid, appointment, current_user)
     if not db_appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
-    
-    print(f"[ROUTER] Update successful - New status: {db_appointment.status}")
     return db_appointment
 
 @router.delete("/{appointment_id}", response_model=AppointmentResponse)
 async def cancel_appointment_route(
     appointment_id: str,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """Cancel appointment (patient or doctor)"""
     try:
@@ -150,91 +382,91 @@ async def cancel_appointment_route(
             detail="Invalid appointment ID format"
         )
     
-    # Check if appointment exists and belongs to current patient (if patient)
-    db_appointment = get_appointment_by_id(db, appointment_uuid)
-    if not db_appointment:
+    # Patients can only cancel their own appointments, doctors those assigned to them
+    with _transition_errors("cancel"):
+        cancelled_appointment = await cancel_appointment(db, appointment_uuid, current_user)
+    if not cancelled_appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
-    
-    # Patients can only cancel their own appointments
-    if isinstance(current_user, Patient) and db_appointment.patient_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only cancel your own appointments"
-        )
-    
-    cancelled_appointment = cancel_appointment(db, appointment_uuid)
     return cancelled_appointment
 
 @router.post("/confirm", response_model=AppointmentResponse)
 async def confirm_appointment(
     confirm_data: AppointmentConfirm,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """Confirm appointment (doctor only)"""
-    if not isinstance(current_user, Doctor):
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can confirm appointments"
         )
     
-    # Get appointment
-    db_appointment = get_appointment_by_id(db, confirm_data.appointment_id)
-    if not db_appointment:
+    # One conditional UPDATE: must be this doctor's and still pending
+    with _transition_errors("confirm"):
+        updated_appointment = await transition_appointment(
+            db, confirm_data.appointment_id, current_user, target="confirmed"
+        )
+    if not updated_appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
     
-    # Check if appointment belongs to this doctor
-    if db_appointment.doctor_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only confirm your own appointments"
-        )
-    
-    # Update status to confirmed
-    appointment_update = AppointmentUpdate(status="confirmed")
-    updated_appointment = update_appointment(db, confirm_data.appointment_id, appointment_update)
-    
     return updated_appointment
 
 @router.post("/reject", response_model=AppointmentResponse)
 async def reject_appointment(
     reject_data: AppointmentReject,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """Reject appointment with reason (doctor only)"""
-    if not isinstance(current_user, Doctor):
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can reject appointments"
         )
     
-    # Get appointment
-    db_appointment = get_appointment_by_id(db, reject_data.appointment_id)
-    if not db_appointment:
+    # Update status to cancelled with reason, if this doctor's and not yet completed
+    with _transition_errors("reject"):
+        updated_appointment = await transition_appointment(
+            db, reject_data.appointment_id, current_user,
+            target="cancelled",
+            cancellation_reason=reject_data.cancellation_reason
+        )
+    if not updated_appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
     
-    # Check if appointment belongs to this doctor
-    if db_appointment.doctor_id != current_user.id:
+    return updated_appointment
+
+@router.post("/batch", response_model=List[AppointmentBatchResult])
+async def batch_transition(
+    batch: AppointmentBatchTransition,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Confirm, reject or complete many appointments at once (doctor only)
+
+    Applied in one transaction; each id gets its own result (updated,
+    not_found, forbidden or conflict) instead of failing the whole batch.
+    """
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only reject your own appointments"
+            detail="Only doctors can update appointments"
         )
     
-    # Update status to cancelled with reason
-    appointment_update = AppointmentUpdate(
-        status="cancelled",
-        cancellation_reason=reject_data.cancellation_reason
-    )
-    updated_appointment = update_appointment(db, reject_data.appointment_id, appointment_update)
+    # Later duplicates win; the batch reason fills in items without their own
+    reasons = {}
+    for item in batch.appointments:
+        reason = item.cancellation_reason or batch.cancellation_reason
+        reasons[item.appointment_id] = reason if batch.status == "cancelled" else None
     
-    return updated_appointment
+    return await batch_transition_appointments(db, current_user, batch.status, reasons)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Union
 
@@ -8,6 +8,7 @@ from app.database import get_db
 from app.models import Patient, Doctor
 from app.schemas import (
     Token, 
+    Principal,
     PatientCreate, 
     PatientLogin, 
     DoctorCreate, 
@@ -24,13 +25,25 @@ from app.crud.users import (
     get_patient_by_contact,
     get_doctor_by_email
 )
-from app.utils import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.cache import cache_principal, get_cached_principal
+from app.utils import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES, HashingPoolBusy
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Union[Patient, Doctor]:
+def _decode_credentials(token: str) -> dict:
+    """Decode the bearer token and check the claims we rely on"""
+    payload = verify_token(token)
+    if payload is None or payload.get("sub") is None or payload.get("type") not in ("patient", "doctor"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Union[Patient, Doctor]:
     """Get current authenticated user (patient or doctor) from token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -38,33 +51,42 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
-    
+    payload = _decode_credentials(token)
     identifier: str = payload.get("sub")
     user_type: str = payload.get("type")
     
-    if identifier is None or user_type is None:
-        raise credentials_exception
+    user = get_cached_principal(user_type, identifier)
+    if user is not None:
+        return user
     
     # Check if patient or doctor
     if user_type == "patient":
-        user = get_patient_by_contact(db, contact=identifier)
-    elif user_type == "doctor":
-        user = get_doctor_by_email(db, email=identifier)
+        user = await get_patient_by_contact(db, contact=identifier)
     else:
-        raise credentials_exception
+        user = await get_doctor_by_email(db, email=identifier)
     
     if user is None:
         raise credentials_exception
     
+    # Detach so the cached instance is never shared with another request's session
+    db.expunge(user)
+    cache_principal(user_type, identifier, user, payload["exp"])
     return user
 
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Get current user id and type from the token claims (no DB hit for current tokens)"""
+    payload = _decode_credentials(token)
+    if payload.get("uid"):
+        return Principal(id=payload["uid"], type=payload["type"], subject=payload["sub"])
+    
+    # Tokens issued before the uid claim existed need the user lookup
+    user = await get_current_user(token, db)
+    return Principal(id=user.id, type=payload["type"], subject=payload["sub"])
+
 @router.post("/login/patient", response_model=dict)
-async def login_patient(credentials: PatientLogin, db: Session = Depends(get_db)):
+async def login_patient(credentials: PatientLogin, db: AsyncSession = Depends(get_db)):
     """Login endpoint for patients using contact"""
-    patient = authenticate_patient(db, credentials.contact, credentials.password)
+    patient = await authenticate_patient(db, credentials.contact, credentials.password)
     
     if not patient:
         raise HTTPException(
@@ -76,7 +98,7 @@ async def login_patient(credentials: PatientLogin, db: Session = Depends(get_db)
     # Create access token with patient contact and type
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": patient.contact, "type": "patient"},
+        data={"sub": patient.contact, "type": "patient", "uid": str(patient.id)},
         expires_delta=access_token_expires
     )
     
@@ -92,9 +114,9 @@ async def login_patient(credentials: PatientLogin, db: Session = Depends(get_db)
     }
 
 @router.post("/login/doctor", response_model=dict)
-async def login_doctor(credentials: DoctorLogin, db: Session = Depends(get_db)):
+async def login_doctor(credentials: DoctorLogin, db: AsyncSession = Depends(get_db)):
     """Login endpoint for doctors using email"""
-    doctor = authenticate_doctor(db, credentials.email, credentials.password)
+    doctor = await authenticate_doctor(db, credentials.email, credentials.password)
     
     if not doctor:
         raise HTTPException(
@@ -106,7 +128,7 @@ async def login_doctor(credentials: DoctorLogin, db: Session = Depends(get_db)):
     # Create access token with doctor email and type
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": doctor.email, "type": "doctor"},
+        data={"sub": doctor.email, "type": "doctor", "uid": str(doctor.id)},
         expires_delta=access_token_expires
     )
     
@@ -123,22 +145,22 @@ async def login_doctor(credentials: DoctorLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/register/patient", response_model=dict)
-async def register_patient(patient: PatientCreate, db: Session = Depends(get_db)):
+async def register_patient(patient: PatientCreate, db: AsyncSession = Depends(get_db)):
     """Register a new patient"""
     # Check if contact already exists
-    if get_patient_by_contact(db, patient.contact):
+    if await get_patient_by_contact(db, patient.contact):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Contact number already registered"
         )
     
     try:
-        db_patient = create_patient(db, patient)
+        db_patient = await create_patient(db, patient)
         
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": db_patient.contact, "type": "patient"},
+            data={"sub": db_patient.contact, "type": "patient", "uid": str(db_patient.id)},
             expires_delta=access_token_expires
         )
         
@@ -152,30 +174,33 @@ async def register_patient(patient: PatientCreate, db: Session = Depends(get_db)
                 "type": "patient"
             }
         }
+    except HashingPoolBusy:
+        # Handled by the app-level 503 handler
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating patient: {str(e)}"
         )
 
 @router.post("/register/doctor", response_model=dict)
-async def register_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
+async def register_doctor(doctor: DoctorCreate, db: AsyncSession = Depends(get_db)):
     """Register a new doctor (requires secret key 123$)"""
     # Check if email already exists
-    if get_doctor_by_email(db, doctor.email):
+    if await get_doctor_by_email(db, doctor.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     try:
-        db_doctor = create_doctor(db, doctor)
+        db_doctor = await create_doctor(db, doctor)
         
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": db_doctor.email, "type": "doctor"},
+            data={"sub": db_doctor.email, "type": "doctor", "uid": str(db_doctor.id)},
             expires_delta=access_token_expires
         )
         
@@ -190,8 +215,11 @@ async def register_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
                 "type": "doctor"
             }
         }
+    except HashingPoolBusy:
+        # Handled by the app-level 503 handler
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         error_msg = str(e).lower()
         
         if "duplicate key" in error_msg and "email" in error_msg:
@@ -0,0 +1,216 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Literal, Optional
+import csv
+import io
+import json
+
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db
+from app.schemas import (
+    Principal,
+    AppointmentFilter,
+    AppointmentImport,
+    AppointmentImportError,
+    AppointmentImportResult
+)
+from app.crud.appointments import EXPORT_COLUMNS, bulk_insert_appointments, export_appointments_query
+from app.routers.appointments import appointment_filters
+from app.routers.auth import get_current_principal
+
+router = APIRouter(prefix="/api/appointments", tags=["Bulk Import/Export"])
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+async def _iter_lines(request: Request):
+    """Yield raw lines of the request body as it streams in, line endings kept"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+async def _iter_raw_records(request: Request, fmt: str):
+    """Yield (line number, raw bytes) per record: one line, or for CSV the lines of a quoted newline
+
+    A CSV record ends at a line break outside quotes, i.e. once the quote
+    characters seen since its start are even (csv.writer doubles embedded
+    quotes). The line number is where the record starts.
+    """
+    line_number = 0
+    pending = []
+    start = quotes = 0
+    async for raw in _iter_lines(request):
+        line_number += 1
+        if not pending:
+            start, quotes = line_number, 0
+        pending.append(raw)
+        if fmt == "csv":
+            quotes += raw.count(b'"')
+            if quotes % 2:
+                continue
+        yield start, b"".join(pending)
+        pending = []
+    if pending:
+        # Unterminated quote; csv.reader reports it
+        yield start, b"".join(pending)
+
+async def _iter_records(request: Request, fmt: str):
+    """Yield (line number, record, error) for each non-empty record of an upload
+
+    CSV uploads need a header row; quoted fields may span lines, as csv.writer
+    (and /export) writes them.
+    """
+    header = None
+    async for line_number, raw in _iter_raw_records(request, fmt):
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            # Earlier batches are already committed; report the line like any other bad row
+            yield line_number, None, "Invalid UTF-8"
+            continue
+        if not text.strip():
+            continue
+        if fmt == "csv":
+            try:
+                fields = next(csv.reader([text], strict=True))
+            except csv.Error as e:
+                yield line_number, None, f"Invalid CSV: {e}"
+                continue
+            if header is None:
+                header = [field.strip() for field in fields]
+                continue
+            if len(fields) != len(header):
+                yield line_number, None, f"Expected {len(header)} columns, got {len(fields)}"
+                continue
+            # Empty cells mean "not provided" so optional fields keep their defaults
+            yield line_number, {key: value for key, value in zip(header, fields) if value != ""}, None
+        else:
+            try:
+                record = json.loads(text)
+            except ValueError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, record, None
+
+def _validation_message(error: ValidationError) -> str:
+    # Whole-record checks (e.g. a reason on a non-cancelled row) have no field location
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+@router.post("/import", response_model=AppointmentImportResult)
+async def import_appointments(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk import appointments from an NDJSON or CSV body (doctor only)
+
+    The body is read as a stream and inserted in batches, so uploads of any size
+    use constant memory. Each batch is committed on its own; rows that fail
+    validation or reference unknown patients/doctors are reported by line number.
+    """
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can import appointments"
+        )
+    
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        format = "csv" if content_type in CSV_CONTENT_TYPES else "ndjson"
+    
+    imported = 0
+    failed = 0
+    errors = []
+    
+    def record_errors(batch_errors):
+        nonlocal failed
+        failed += len(batch_errors)
+        errors.extend(batch_errors[:max(0, settings.import_max_errors - len(errors))])
+    
+    batch = []
+    async for line, record, error in _iter_records(request, format):
+        if error is None:
+            try:
+                batch.append((line, AppointmentImport(**record)))
+            except ValidationError as e:
+                error = _validation_message(e)
+        if error is not None:
+            record_errors([AppointmentImportError(line=line, error=error)])
+            continue
+        if len(batch) >= settings.import_batch_size:
+            count, batch_errors = await bulk_insert_appointments(db, batch)
+            imported += count
+            record_errors(batch_errors)
+            batch = []
+    
+    count, batch_errors = await bulk_insert_appointments(db, batch)
+    imported += count
+    record_errors(batch_errors)
+    
+    return AppointmentImportResult(imported=imported, failed=failed, errors=errors)
+
+def _export_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+async def _export_rows(query, fmt: str):
+    """Stream query results chunk by chunk through a server-side cursor"""
+    # Own session: the request-scoped one may be closed before streaming ends
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=settings.export_chunk_size))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow(["" if value is None else _export_value(value) for value in row])
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(
+                        {key: _export_value(value) for key, value in zip(EXPORT_COLUMNS, row)}
+                    ))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+@router.get("/export")
+async def export_appointments(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: AppointmentFilter = Depends(appointment_filters),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Stream appointments as NDJSON or CSV (doctor only, same filters as /all)"""
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can export appointments"
+        )
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(export_appointments_query(filters), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="appointments.{format}"'}
+    )
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import json
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.events import broker
+from app.routers.auth import _decode_credentials, get_current_principal
+from app.schemas import Principal
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+# Server-Sent Events replacing status polling. A stream holds no database
+# connection: the principal comes from the token claims and events arrive
+# through the in-process broker.
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+
+async def _stream_principal(request: Request, token: Optional[str]) -> Principal:
+    """Principal from the Authorization header or ``?token=`` (EventSource cannot set headers)"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    payload = _decode_credentials(token)
+    if payload.get("uid"):
+        return Principal(id=payload["uid"], type=payload["type"], subject=payload["sub"])
+    # Old tokens need one lookup; use a short-lived session, not one held for the stream
+    async with AsyncSessionLocal() as db:
+        return await get_current_principal(token, db)
+
+async def _event_stream(channels: List[str]):
+    """Yield SSE frames for ``channels``; cancelled by StreamingResponse on disconnect"""
+    subscription = broker.subscribe(channels)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = await subscription.get(timeout=settings.events_heartbeat)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+@router.get("/my")
+async def my_appointment_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot send headers")
+):
+    """Stream changes to the current user's appointments (doctor queue or patient history)"""
+    current_user = await _stream_principal(request, token)
+    channel = f"{current_user.type}:{current_user.id}"
+    return StreamingResponse(
+        _event_stream([channel]),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@router.get("/appointments")
+async def appointment_code_events(
+    code: List[str] = Query(..., description="Appointment codes to follow; repeat for several")
+):
+    """Stream status changes of appointments by code (public, like the code lookup)"""
+    if len(code) > 20:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At most 20 appointment codes per stream"
+        )
+    return StreamingResponse(
+        _event_stream([f"appointment:{value}" for value in code]),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
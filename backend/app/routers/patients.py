@@ -1,37 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional, Union
+from uuid import UUID
 
 from app.database import get_db
 from app.models import Patient, Doctor
-from app.schemas import PatientResponse, DoctorResponse, DoctorUpdate
-from app.crud.users import get_all_doctors
-from app.routers.auth import get_current_user
+from app.schemas import (
+    Principal,
+    PatientResponse,
+    AvailableSlot,
+    DoctorResponse,
+    DoctorScheduleEntry,
+    DoctorScheduleUpdate,
+    DoctorSearchResult,
+    DoctorUpdate
+)
+from app.crud.schedules import find_next_free_slots, get_doctor_schedule, get_free_slots, replace_doctor_schedule
+from app.crud.users import get_all_doctors, get_doctors_version, search_doctors, update_doctor
+from app.cache import DirectoryPage, directory_cache
+from app.http_cache import cache_headers, check_etag, is_fresh, request_etag
+from app.pagination import NEXT_CURSOR_HEADER, InvalidCursor, next_cursor
+from app.replicas import primary_reads
+from app.config import settings
+from app.routers.auth import get_current_principal, get_current_user
+from app.serialization import Encoder, JSONBytesResponse
 
 router = APIRouter(prefix="/api", tags=["Patients & Doctors"])
 
+# Serialises doctor rows straight to JSON bytes for the directory cache
+_doctor_encoder = Encoder(DoctorResponse)
+
 @router.get("/doctors", response_model=List[DoctorResponse])
 async def get_doctors(
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
-    """Get list of all doctors (only for patients to book appointments)"""
-    if not isinstance(current_user, Patient):
+    """Get list of all doctors (only for patients to book appointments)
+
+    Pages are cached as ready-to-send JSON (see DirectoryCache), so a hit costs
+    no query and no serialisation; registering or editing a doctor invalidates them.
+    """
+    if current_user.type != "patient":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only patients can view doctor list"
         )
-    doctors = get_all_doctors(db, skip, limit)
-    return doctors
+    
+    key = await directory_cache.page_key(skip, limit, cursor)
+    page = await directory_cache.get(key)
+    if page is None:
+        # Filled from the primary: a lagging replica's page would be cached under
+        # the new version and outlive the invalidation until the TTL
+        with primary_reads():
+            # The directory is the same for every patient; version it by count and newest edit
+            etag = request_etag(request, *await get_doctors_version(db))
+            try:
+                doctors = await get_all_doctors(db, skip, limit, cursor)
+            except InvalidCursor:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
+        body = _doctor_encoder.encode(doctors)
+        page = DirectoryPage(body=body, etag=etag, next_cursor=next_cursor(doctors, limit))
+        await directory_cache.set(key, page)
+    
+    headers = cache_headers(page.etag)
+    if is_fresh(request, page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+@router.get("/doctors/search", response_model=DoctorSearchResult)
+async def search_doctor_directory(
+    q: Optional[str] = Query(None, max_length=100, description="Name, matched by word prefix or fuzzily"),
+    specialization: Optional[List[str]] = Query(None, description="Exact match; repeat for several"),
+    department: Optional[List[str]] = Query(None, description="Exact match; repeat for several"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search doctors by name with specialization/department facets (patients only)
+
+    Facet counts for each field apply the query and the other field's filter,
+    so they show how many doctors selecting that value would return.
+    """
+    if current_user.type != "patient":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only patients can view doctor list"
+        )
+    
+    doctors, total, facets = await search_doctors(db, q, specialization, department, limit, offset)
+    if settings.fast_serialization:
+        return JSONBytesResponse(content={"total": total, "doctors": _doctor_encoder.dump(doctors), "facets": facets})
+    return {"total": total, "doctors": doctors, "facets": facets}
+
+@router.get("/doctors/availability", response_model=List[AvailableSlot])
+async def next_available_slots(
+    specialization: Optional[List[str]] = Query(None, description="Exact match; repeat for several"),
+    department: Optional[List[str]] = Query(None, description="Exact match; repeat for several"),
+    date_from: Optional[datetime] = Query(None, description="Slots starting at or after (default now)"),
+    date_to: Optional[datetime] = Query(None, description="Slots starting before (default the booking horizon)"),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Soonest free slot of each matching doctor, earliest first (patients only)
+
+    E.g. ``?specialization=Cardiology&date_to=<end of week>`` for the next free
+    cardiologists this week. Answered from the in-memory availability index.
+    """
+    if current_user.type != "patient":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only patients can view doctor availability"
+        )
+    
+    slots = await find_next_free_slots(db, date_from, date_to, specialization, department, limit)
+    return [slot._asdict() for slot in slots]
+
+@router.get("/doctors/{doctor_id}/availability", response_model=List[AvailableSlot])
+async def doctor_available_slots(
+    doctor_id: UUID,
+    date_from: Optional[datetime] = Query(None, description="Slots starting at or after (default now)"),
+    date_to: Optional[datetime] = Query(None, description="Slots starting before (default the booking horizon)"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """A doctor's free slots, earliest first (patients only)"""
+    if current_user.type != "patient":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only patients can view doctor availability"
+        )
+    
+    slots = await get_free_slots(db, doctor_id, date_from, date_to, limit)
+    return [slot._asdict() for slot in slots]
 
 ## Removed endpoint for doctors to view all patients (privacy)
 
 @router.get("/patients/me", response_model=PatientResponse)
 async def get_my_patient_profile(
     current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current patient's profile"""
     if not isinstance(current_user, Patient):
@@ -43,8 +163,10 @@ async def get_my_patient_profile(
 
 @router.get("/doctors/me", response_model=DoctorResponse)
 async def get_my_doctor_profile(
+    request: Request,
+    response: Response,
     current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current doctor's profile"""
     if not isinstance(current_user, Doctor):
@@ -52,27 +174,68 @@ async def get_my_doctor_profile(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can access this endpoint"
         )
+    # Versioned by the profile being returned, so no extra query
+    not_modified = check_etag(request, response, current_user.id, current_user.updated_at)
+    if not_modified:
+        return not_modified
     return current_user
 
 @router.put("/doctors/me", response_model=DoctorResponse)
 async def update_my_doctor_profile(
     profile_update: DoctorUpdate,
-    current_user: Union[Patient, Doctor] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update current doctor's profile"""
-    if not isinstance(current_user, Doctor):
+    if current_user.type != "doctor":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only doctors can access this endpoint"
         )
     
     # Update only provided fields
-    update_data = profile_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(current_user, field, value)
+    doctor = await update_doctor(db, current_user.id, profile_update)
+    if not doctor:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Doctor not found"
+        )
+    return doctor
+
+@router.get("/doctors/me/schedule", response_model=List[DoctorScheduleEntry])
+async def get_my_schedule(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Current doctor's weekly working hours"""
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can access this endpoint"
+        )
+    return await get_doctor_schedule(db, current_user.id)
+
+@router.put("/doctors/me/schedule", response_model=List[DoctorScheduleEntry])
+async def update_my_schedule(
+    schedule: DoctorScheduleUpdate,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Replace the current doctor's weekly working hours
+
+    Slots are laid out from these templates; appointments already booked keep
+    their slot even if it is no longer on the schedule.
+    """
+    if current_user.type != "doctor":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only doctors can access this endpoint"
+        )
     
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
\ No newline at end of file
+    try:
+        return await replace_doctor_schedule(db, current_user.id, schedule.entries)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
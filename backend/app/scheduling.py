@@ -0,0 +1,284 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import time
+from datetime import date, datetime, time as clock_time, timedelta, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+
+# Time-slot availability. A doctor's weekly templates (DoctorSchedule rows)
+# lay out a grid of slots in clinic local time; appointments holding a slot
+# take it. The index keeps, per doctor, the templates by weekday and the held
+# intervals as two parallel sorted arrays of epoch seconds, so checking a
+# slot is one bisect and "next free slot" walks the day's grid (also epoch
+# seconds, shared by doctors with the same hours) jumping over held runs.
+#
+# The index only answers availability questions. Double booking is prevented
+# by the database: a trigger claims each booked slot in appointment_slots
+# (primary key, and an exclusion constraint on Postgres). Bookings and
+# cancellations made through this worker update the index in place,
+# schedule edits mark it stale, and everything else shows up when it is
+# rebuilt after availability_index_ttl.
+
+def clinic_tz() -> ZoneInfo:
+    return ZoneInfo(settings.clinic_timezone)
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime; naive values (SQLite, clients) are taken as clinic local time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=clinic_tz())
+    return value.astimezone(timezone.utc)
+
+def stored_utc(value: datetime) -> datetime:
+    """Aware UTC datetime from a DB value (SQLite returns stored UTC values naive)"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def booking_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """[now, now + availability_horizon_days): the slots that can be listed and booked"""
+    now = now or datetime.now(timezone.utc)
+    return now, now + timedelta(days=settings.availability_horizon_days)
+
+class Template(NamedTuple):
+    start: clock_time
+    end: clock_time
+    minutes: int
+
+def day_slots(day: date, templates: Sequence[Template], tz) -> Iterator[Tuple[datetime, datetime]]:
+    """(start, end) of each slot the templates lay out on ``day``, in order"""
+    for template in templates:
+        start = datetime.combine(day, template.start, tzinfo=tz)
+        end = datetime.combine(day, template.end, tzinfo=tz)
+        step = timedelta(minutes=template.minutes)
+        while start + step <= end:
+            yield start, start + step
+            start += step
+
+class Window:
+    """A [after, before) range as epoch seconds, and its days' slot grids computed once"""
+
+    def __init__(self, after: datetime, before: datetime, tz):
+        self.after = after.timestamp()
+        self.before = before.timestamp()
+        self.tz = tz
+        first, last = after.astimezone(tz).date(), before.astimezone(tz).date()
+        self.days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+        self.weekdays = [day.weekday() for day in self.days]
+        self._grids = {}
+
+    def grid(self, offset: int, templates: Tuple[Template, ...]) -> List[Tuple[float, float]]:
+        """(start, end) epoch seconds of the slots ``templates`` lay out on days[offset]"""
+        # Keyed by identity: the index shares one tuple between doctors with the same hours
+        key = (offset, id(templates))
+        grid = self._grids.get(key)
+        if grid is None:
+            grid = self._grids[key] = [
+                (start.timestamp(), end.timestamp()) for start, end in day_slots(self.days[offset], templates, self.tz)
+            ]
+        return grid
+
+def slot_end(templates: Sequence[Template], start: datetime, tz) -> Optional[datetime]:
+    """End of the slot beginning at ``start`` if the templates have one there, else None"""
+    local = start.astimezone(tz)
+    for slot_start, slot_finish in day_slots(local.date(), templates, tz):
+        if slot_start == local:
+            return slot_finish.astimezone(timezone.utc)
+    return None
+
+class Slot(NamedTuple):
+    start: datetime
+    end: datetime
+    doctor_id: UUID
+    doctor_name: str
+    specialization: Optional[str]
+
+class DoctorSlots:
+    """One doctor's weekly templates and held intervals"""
+
+    __slots__ = ("doctor_id", "name", "specialization", "department", "templates", "starts", "ends", "_runs", "_first")
+
+    def __init__(self, doctor_id: UUID, name: str, specialization: Optional[str], department: Optional[str]):
+        self.doctor_id = doctor_id
+        self.name = name
+        self.specialization = specialization
+        self.department = department
+        self.templates: Dict[int, Tuple[Template, ...]] = {}  # weekday -> templates by start time
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        self._runs = None
+        self._first = None  # (after, before, first free slot or None) of the last first_free()
+
+    def busy(self) -> Tuple[List[float], List[float]]:
+        """Held intervals with back-to-back ones merged, as (starts, ends)"""
+        if self._runs is None:
+            starts, ends = [], []
+            for start, end in zip(self.starts, self.ends):
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._runs = (starts, ends)
+        return self._runs
+
+    def is_free(self, start: float, end: float) -> bool:
+        # Busy runs never overlap, so the latest one starting before ``end`` decides
+        starts, ends = self.busy()
+        position = bisect.bisect_left(starts, end)
+        return position == 0 or ends[position - 1] <= start
+
+    def hold(self, start: float, end: float):
+        position = bisect.bisect_left(self.starts, start)
+        if position < len(self.starts) and self.starts[position] == start:
+            return
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self._runs = self._first = None
+
+    def release(self, start: float):
+        position = bisect.bisect_left(self.starts, start)
+        if position < len(self.starts) and self.starts[position] == start:
+            del self.starts[position]
+            del self.ends[position]
+            self._runs = self._first = None
+
+    def free_slots(self, window: Window) -> Iterator[Tuple[float, float]]:
+        """Free slots (epoch seconds) starting inside ``window``, earliest first"""
+        busy_starts, busy_ends = self.busy()
+        for offset, weekday in enumerate(window.weekdays):
+            templates = self.templates.get(weekday)
+            if not templates:
+                continue
+            grid = window.grid(offset, templates)
+            index = bisect.bisect_left(grid, (window.after,))
+            while index < len(grid):
+                start, end = grid[index]
+                if start >= window.before:
+                    return
+                position = bisect.bisect_left(busy_starts, end)
+                if position and busy_ends[position - 1] > start:
+                    # Busy: skip every slot starting before the run ends
+                    index = bisect.bisect_left(grid, (busy_ends[position - 1],), index + 1)
+                    continue
+                yield start, end
+                index += 1
+
+    def first_free(self, window: Window) -> Optional[Tuple[float, float]]:
+        """The earliest of free_slots(window), remembered while it stays the answer"""
+        if self._first is not None:
+            after, before, first = self._first
+            # A later start that has not passed the remembered slot has the same answer
+            if first is not None and after <= window.after <= first[0]:
+                return first if first[0] < window.before else None
+            if first is None and after <= window.after and window.before <= before:
+                return None
+        first = next(self.free_slots(window), None)
+        self._first = (window.after, window.before, first)
+        return first
+
+def _slot(doctor: DoctorSlots, start: float, end: float) -> Slot:
+    return Slot(
+        datetime.fromtimestamp(start, timezone.utc),
+        datetime.fromtimestamp(end, timezone.utc),
+        doctor.doctor_id,
+        doctor.name,
+        doctor.specialization
+    )
+
+class AvailabilityIndex:
+    """In-memory slot grid and held slots for every doctor with a schedule"""
+
+    def __init__(self):
+        self.doctors: Dict[UUID, DoctorSlots] = {}
+        self.by_specialization: Dict[Optional[str], List[DoctorSlots]] = {}
+        self.built_at = 0.0
+        self.stale = True
+        self._lock = asyncio.Lock()
+
+    def build(self, schedules, held):
+        """``schedules``: rows of (doctor_id, name, specialization, department,
+        weekday, start_time, end_time, slot_minutes); ``held``: (doctor_id, start, end)"""
+        doctors = {}
+        for row in schedules:
+            doctor = doctors.get(row.doctor_id)
+            if doctor is None:
+                doctor = doctors[row.doctor_id] = DoctorSlots(row.doctor_id, row.name, row.specialization, row.department)
+            doctor.templates.setdefault(row.weekday, []).append(Template(row.start_time, row.end_time, row.slot_minutes))
+        shared = {}
+        for doctor in doctors.values():
+            doctor.templates = {
+                weekday: shared.setdefault(key, key)
+                for weekday, key in ((weekday, tuple(sorted(templates))) for weekday, templates in doctor.templates.items())
+            }
+        for doctor_id, start, end in sorted(held, key=lambda row: row[1]):
+            doctor = doctors.get(doctor_id)
+            if doctor is not None:
+                doctor.starts.append(stored_utc(start).timestamp())
+                doctor.ends.append(stored_utc(end).timestamp())
+        by_specialization = {}
+        for doctor in doctors.values():
+            by_specialization.setdefault(doctor.specialization, []).append(doctor)
+        self.doctors, self.by_specialization = doctors, by_specialization
+
+    def invalidate(self):
+        """Rebuild on next use (a schedule changed)"""
+        self.stale = True
+
+    async def ensure_fresh(self, load):
+        """Rebuild from ``await load()`` (schedules, held) if stale or older than the TTL"""
+        if not self.stale and time.time() - self.built_at < settings.availability_index_ttl:
+            return
+        if not self.stale and self._lock.locked():
+            return  # merely expired: keep answering from it while another request rebuilds
+        async with self._lock:
+            if not self.stale and time.time() - self.built_at < settings.availability_index_ttl:
+                return
+            self.stale = False
+            built_at = time.time()
+            self.build(*await load())
+            self.built_at = built_at
+
+    def hold(self, doctor_id: UUID, start: datetime, end: datetime):
+        doctor = self.doctors.get(doctor_id)
+        if doctor is not None:
+            doctor.hold(stored_utc(start).timestamp(), stored_utc(end).timestamp())
+
+    def release(self, doctor_id: UUID, start: datetime):
+        doctor = self.doctors.get(doctor_id)
+        if doctor is not None:
+            doctor.release(stored_utc(start).timestamp())
+
+    def free_slots(self, doctor_id: UUID, after: datetime, before: datetime, limit: int) -> List[Slot]:
+        doctor = self.doctors.get(doctor_id)
+        if doctor is None:
+            return []
+        return [
+            _slot(doctor, start, end)
+            for start, end in itertools.islice(doctor.free_slots(Window(after, before, clinic_tz())), limit)
+        ]
+
+    def next_free(self, after: datetime, before: datetime, specializations: Optional[Sequence[str]] = None,
+                  departments: Optional[Sequence[str]] = None, limit: int = 10) -> List[Slot]:
+        """Each matching doctor's earliest free slot in [after, before), the ``limit`` earliest"""
+        window = Window(after, before, clinic_tz())
+        if specializations:
+            doctors = itertools.chain(*(self.by_specialization.get(value, ()) for value in set(specializations)))
+        else:
+            doctors = self.doctors.values()
+        wanted_departments = set(departments or ())
+        candidates = []
+        for doctor in doctors:
+            if wanted_departments and doctor.department not in wanted_departments:
+                continue
+            first = doctor.first_free(window)
+            if first is not None:
+                candidates.append((first, doctor))
+        earliest = heapq.nsmallest(
+            limit, candidates, key=lambda candidate: (candidate[0][0], candidate[1].name, candidate[1].doctor_id)
+        )
+        return [_slot(doctor, start, end) for (start, end), doctor in earliest]
+
+availability_index = AvailabilityIndex()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime, time
 from uuid import UUID
 
 # Token Schemas
@@ -11,6 +11,12 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class Principal(BaseModel):
+    """Authenticated user as described by the token claims alone"""
+    id: UUID
+    type: str  # patient or doctor
+    subject: str  # contact for patients, email for doctors
+
 # Patient Schemas
 class PatientCreate(BaseModel):
     name: str
@@ -66,6 +72,33 @@ class DoctorResponse(BaseModel):
     class Config:
         orm_mode = True
 
+# Doctor working hours: weekly templates the bookable time slots are laid out from
+class DoctorScheduleEntry(BaseModel):
+    weekday: int = Field(..., ge=0, le=6, description="0 = Monday ... 6 = Sunday")
+    start_time: time  # clinic local time
+    end_time: time
+    slot_minutes: int = Field(30, ge=5, le=480)
+    
+    class Config:
+        orm_mode = True
+
+class DoctorScheduleUpdate(BaseModel):
+    entries: List[DoctorScheduleEntry] = Field(..., max_length=100)
+
+# A bookable slot (pass start as slot_start when creating the appointment)
+class AvailableSlot(BaseModel):
+    doctor_id: UUID
+    doctor_name: str
+    specialization: Optional[str] = None
+    start: datetime
+    end: datetime
+
+# Doctor search: one page of matches plus facet counts
+class DoctorSearchResult(BaseModel):
+    total: int
+    doctors: List[DoctorResponse]
+    facets: Dict[str, Dict[str, int]]  # facet -> value -> matching doctors
+
 # Appointment Schemas
 class AppointmentCreate(BaseModel):
     doctor_id: UUID
@@ -73,12 +106,36 @@ class AppointmentCreate(BaseModel):
     severity: Optional[str] = None  # mild, moderate, severe
     duration: Optional[str] = None  # e.g., "2 days", "1 week"
     medical_history: Optional[str] = None  # patient's previous diseases/conditions
+    slot_start: Optional[datetime] = None  # reserve this slot of the doctor's schedule (see /availability)
+
+# Bulk import row: a booking plus the fields historical records carry
+class AppointmentImport(AppointmentCreate):
+    patient_id: UUID
+    appointment_code: Optional[str] = None  # generated when missing
+    status: Literal["pending", "confirmed", "cancelled", "completed"] = 'completed'
+    cancellation_reason: Optional[str] = None  # cancelled records only
+    created_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def reason_only_when_cancelled(self):
+        if self.cancellation_reason is not None and self.status != "cancelled":
+            raise ValueError("cancellation_reason is only allowed when status is cancelled")
+        return self
+
+class AppointmentImportError(BaseModel):
+    line: int
+    error: str
+
+class AppointmentImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[AppointmentImportError]
 
 class AppointmentUpdate(BaseModel):
     status: Optional[str] = None  # pending, confirmed, cancelled, completed
     cancellation_reason: Optional[str] = None  # reason if cancelled
 
-class AppointmentResponse(BaseModel):
+class AppointmentFields(BaseModel):
     id: UUID
     appointment_code: str
     patient_id: UUID
@@ -89,14 +146,54 @@ class AppointmentResponse(BaseModel):
     medical_history: Optional[str] = None
     status: str
     cancellation_reason: Optional[str] = None
+    slot_start: Optional[datetime] = None
+    slot_end: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
-    patient: Optional['PatientResponse'] = None
-    doctor: Optional['DoctorResponse'] = None
     
     class Config:
         orm_mode = True
 
+class AppointmentResponse(AppointmentFields):
+    patient: Optional['PatientResponse'] = None
+    doctor: Optional['DoctorResponse'] = None
+
+# Compact list rows: nested patient/doctor reduced to what list views show
+class PatientSummary(BaseModel):
+    id: UUID
+    name: str
+
+class DoctorSummary(BaseModel):
+    id: UUID
+    name: str
+    specialization: Optional[str] = None
+
+class AppointmentListItem(AppointmentFields):
+    patient: Optional[PatientSummary] = None
+    doctor: Optional[DoctorSummary] = None
+
+# Appointment text search: one page of matches, best first
+class AppointmentSearchResult(BaseModel):
+    total: int
+    appointments: List[AppointmentListItem]
+
+# Appointment list filters (query parameters of the list endpoints)
+class AppointmentFilter(BaseModel):
+    status: Optional[List[str]] = None  # any of pending, confirmed, cancelled, completed
+    severity: Optional[List[str]] = None  # any of mild, moderate, severe
+    date_from: Optional[datetime] = None  # created_at >= date_from
+    date_to: Optional[datetime] = None  # created_at < date_to
+    sort: Literal["created_at", "-created_at"] = "created_at"
+
+# Dashboard counters (kept by database triggers, see models.AppointmentDailyStats)
+class AppointmentDayStats(BaseModel):
+    day: date  # creation day, UTC
+    counts: Dict[str, int]  # status -> appointments
+
+class AppointmentStats(BaseModel):
+    totals: Dict[str, int]  # status -> appointments, every status present
+    daily: List[AppointmentDayStats]  # the requested days, oldest first
+
 # Appointment code lookup schema
 class AppointmentCodeLookup(BaseModel):
     appointment_code: str
@@ -108,3 +205,17 @@ class AppointmentConfirm(BaseModel):
 class AppointmentReject(BaseModel):
     appointment_id: UUID
     cancellation_reason: str = Field(..., description="Reason for cancelling the appointment")
+
+# Batch status change: many confirms/rejects/completions in one transaction
+class AppointmentBatchItem(AppointmentConfirm):
+    cancellation_reason: Optional[str] = None  # overrides the batch reason for this appointment
+
+class AppointmentBatchTransition(BaseModel):
+    status: Literal["confirmed", "cancelled", "completed"]
+    appointments: List[AppointmentBatchItem] = Field(..., min_length=1, max_length=500)
+    cancellation_reason: Optional[str] = None  # applied to every item without its own reason
+
+class AppointmentBatchResult(BaseModel):
+    appointment_id: UUID
+    result: Literal["updated", "not_found", "forbidden", "conflict"]
+    status: Optional[str] = None  # status after the batch (current status on conflict)
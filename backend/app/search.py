@@ -0,0 +1,311 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import re
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+from uuid import UUID
+
+from app.cache import directory_cache
+from app.config import settings
+
+# In-memory doctor search, used where pg_trgm is unavailable (SQLite stand-in)
+# or when DOCTOR_SEARCH_BACKEND=memory. Names are matched by word prefix and by
+# trigram similarity computed the way pg_trgm does it, so both backends rank
+# alike. The index is rebuilt after the directory version changes (doctor
+# registered or edited in this worker) or after doctor_search_index_ttl.
+
+def trigrams(text: str) -> set:
+    """pg_trgm style trigrams: lowercase words padded with two spaces before, one after"""
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class DoctorEntry(NamedTuple):
+    id: UUID
+    name: str
+    specialization: Optional[str]
+    department: Optional[str]
+
+class SearchHit(NamedTuple):
+    ids: List[UUID]  # the requested page, best match first
+    total: int
+    facets: Dict[str, Dict[str, int]]
+
+class DoctorSearchIndex:
+    """Trigram and word-prefix index over doctor names with facet counts"""
+
+    def __init__(self):
+        self.entries: List[DoctorEntry] = []
+        self.grams: Dict[str, List[int]] = {}  # trigram -> entry positions
+        self.gram_counts: List[int] = []
+        self.words: List[tuple] = []  # sorted (word, position) for prefix lookups
+        self.by_specialization: Dict[str, List[int]] = {}
+        self.pair_counts: Counter = Counter()  # (specialization, department) -> doctors
+        self.version = None
+        self.built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def build(self, entries: Sequence[DoctorEntry]):
+        # Positions follow name order, so sorting by position is sorting by name
+        entries = sorted(entries, key=lambda entry: (entry.name, str(entry.id)))
+        grams, gram_counts, words = {}, [], []
+        by_specialization, pair_counts = {}, Counter()
+        for position, entry in enumerate(entries):
+            by_specialization.setdefault(entry.specialization, []).append(position)
+            pair_counts[entry.specialization, entry.department] += 1
+            entry_grams = trigrams(entry.name)
+            gram_counts.append(len(entry_grams))
+            for gram in entry_grams:
+                grams.setdefault(gram, []).append(position)
+            words.extend((word, position) for word in entry.name.lower().split())
+        words.sort()
+        self.entries, self.grams, self.gram_counts, self.words = entries, grams, gram_counts, words
+        self.by_specialization, self.pair_counts = by_specialization, pair_counts
+
+    async def ensure_fresh(self, load):
+        """Rebuild from ``await load()`` if doctors changed or the TTL passed"""
+        version = await directory_cache.backend.counter(directory_cache.VERSION_KEY)
+        if version == self.version and time.time() - self.built_at < settings.doctor_search_index_ttl:
+            return
+        async with self._lock:
+            if version == self.version and time.time() - self.built_at < settings.doctor_search_index_ttl:
+                return
+            self.build(await load())
+            self.version = version
+            self.built_at = time.time()
+
+    def _prefix_matches(self, query: str) -> set:
+        """Positions of names with a word starting with the (single word) query"""
+        start = bisect.bisect_left(self.words, (query,))
+        matches = set()
+        for word, position in self.words[start:]:
+            if not word.startswith(query):
+                break
+            matches.add(position)
+        return matches
+
+    def _scores(self, query: str) -> Dict[int, tuple]:
+        """Matching positions -> sort key (prefix first, then similarity)"""
+        query = " ".join(query.lower().split())
+        prefix = set()
+        if query:
+            prefix = {
+                position for position in self._prefix_matches(query.split()[0])
+                if self.entries[position].name.lower().find(query) != -1
+            }
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.grams.get(gram, ()))
+        scores = {}
+        for position, common in shared.items():
+            similarity = common / (len(query_grams) + self.gram_counts[position] - common)
+            if similarity >= settings.doctor_search_similarity or position in prefix:
+                scores[position] = (position not in prefix, -similarity)
+        for position in prefix:
+            scores.setdefault(position, (False, 0.0))
+        return scores
+
+    def _browse(self, wanted_specializations: set, wanted_departments: set, limit: int, offset: int) -> SearchHit:
+        """Facet-only search: counts come from the pair totals, the page from the posting lists"""
+        specialization_counts, department_counts = Counter(), Counter()
+        total = 0
+        for (specialization, department), count in self.pair_counts.items():
+            in_specialization = not wanted_specializations or specialization in wanted_specializations
+            in_department = not wanted_departments or department in wanted_departments
+            if in_department and specialization:
+                specialization_counts[specialization] += count
+            if in_specialization and department:
+                department_counts[department] += count
+            if in_specialization and in_department:
+                total += count
+
+        if wanted_specializations:
+            positions = heapq.merge(*(self.by_specialization.get(value, ()) for value in wanted_specializations))
+        else:
+            positions = range(len(self.entries))
+        if wanted_departments:
+            positions = (position for position in positions if self.entries[position].department in wanted_departments)
+        return SearchHit(
+            ids=[self.entries[position].id for position in itertools.islice(positions, offset, offset + limit)],
+            total=total,
+            facets={
+                "specialization": dict(specialization_counts.most_common()),
+                "department": dict(department_counts.most_common()),
+            }
+        )
+
+    def search(self, query: Optional[str], specializations: Optional[List[str]] = None,
+               departments: Optional[List[str]] = None, limit: int = 20, offset: int = 0) -> SearchHit:
+        wanted_specializations = set(specializations or ())
+        wanted_departments = set(departments or ())
+        if not query:
+            return self._browse(wanted_specializations, wanted_departments, limit, offset)
+
+        scores = self._scores(query)
+        matched = []
+        specialization_counts, department_counts = Counter(), Counter()
+        for position in scores:
+            entry = self.entries[position]
+            in_specialization = not wanted_specializations or entry.specialization in wanted_specializations
+            in_department = not wanted_departments or entry.department in wanted_departments
+            # Each facet is counted under the other filters, not its own
+            if in_department and entry.specialization:
+                specialization_counts[entry.specialization] += 1
+            if in_specialization and entry.department:
+                department_counts[entry.department] += 1
+            if in_specialization and in_department:
+                matched.append(position)
+
+        matched.sort(key=lambda position: (*scores[position], position))
+        return SearchHit(
+            ids=[self.entries[position].id for position in matched[offset:offset + limit]],
+            total=len(matched),
+            facets={
+                "specialization": dict(specialization_counts.most_common()),
+                "department": dict(department_counts.most_common()),
+            }
+        )
+
+doctor_search_index = DoctorSearchIndex()
+
+# In-memory appointment text search, the stand-in for the tsvector/GIN index
+# on SQLite or with APPOINTMENT_SEARCH_BACKEND=memory. A search never leaves
+# one doctor's appointments, so each doctor gets an inverted index of their
+# own, built on their first search from live and archived rows, kept for the
+# appointment_search_index_doctors most recently searched doctors and rebuilt
+# after appointment_search_index_ttl. Bookings in this worker are added as
+# they commit, imports drop the doctors they touch; problem and medical
+# history do not change afterwards. Words are lowercased, stop words dropped
+# and plurals folded (a light version of Postgres' english configuration).
+# Every query word must match, as with plainto_tsquery, and problem matches
+# weigh more than medical history ones (ts_rank's A and B weights).
+
+WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a about after again all an and any are as at be been before being but by can did do does for from had has "
+    "have he her his how i if in into is it its me my no not of on or our over she so some than that the their "
+    "them then there these they this those to too under up very was we were what when which while who why will "
+    "with you your".split()
+)
+TEXT_WEIGHTS = (1.0, 0.4)  # problem, medical_history
+
+def stem(word: str) -> str:
+    """Fold plurals: "allergies" -> "allergy", "headaches" -> "headache" ("virus", "stress" stay)
+
+    Queries go through the same folding, so "diabetes" -> "diabete" still matches itself.
+    """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def search_terms(text: Optional[str]) -> List[str]:
+    """Index terms of ``text`` in order: lowercased words, stop words dropped, plurals folded"""
+    return [stem(word) for word in WORD.findall((text or "").lower()) if word not in STOP_WORDS]
+
+class AppointmentText(NamedTuple):
+    id: UUID
+    created_at: datetime
+    problem: str
+    medical_history: Optional[str]
+
+class TextHit(NamedTuple):
+    ids: List[UUID]  # the requested page, best match first
+    total: int
+
+class DoctorTextIndex:
+    """One doctor's appointments: term -> {position: weighted term frequency}"""
+
+    def __init__(self, rows: Iterable[AppointmentText]):
+        self.ids: List[UUID] = []
+        self.created: List[datetime] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.known: Set[UUID] = set()
+        self.built_at = time.time()
+        for row in rows:
+            self.add(row)
+
+    def add(self, row: AppointmentText):
+        if row.id in self.known:
+            return
+        position = len(self.ids)
+        self.ids.append(row.id)
+        self.created.append(row.created_at)
+        self.known.add(row.id)
+        for weight, text in zip(TEXT_WEIGHTS, (row.problem, row.medical_history)):
+            for term in search_terms(text):
+                postings = self.postings.setdefault(term, {})
+                postings[position] = postings.get(position, 0.0) + weight
+
+    def search(self, terms: Sequence[str], limit: int, offset: int) -> TextHit:
+        # Intersect from the shortest posting list; the score sums each term's weighted frequency
+        lists = sorted((self.postings.get(term, {}) for term in set(terms)), key=len)
+        if not lists or not lists[0]:
+            return TextHit([], 0)
+        scores = {}
+        for position, score in lists[0].items():
+            for postings in lists[1:]:
+                weight = postings.get(position)
+                if weight is None:
+                    break
+                score += weight
+            else:
+                scores[position] = score
+        # Best score first, newest first among equals (the Postgres order)
+        page = heapq.nlargest(
+            offset + limit, scores, key=lambda position: (scores[position], self.created[position], self.ids[position])
+        )
+        return TextHit(ids=[self.ids[position] for position in page[offset:]], total=len(scores))
+
+class AppointmentSearchIndex:
+    """Per-doctor inverted indexes over problem and medical history, least recently searched evicted"""
+
+    def __init__(self):
+        self.doctors: "OrderedDict[UUID, DoctorTextIndex]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, doctor_id: UUID) -> Optional[DoctorTextIndex]:
+        index = self.doctors.get(doctor_id)
+        if index is None or time.time() - index.built_at >= settings.appointment_search_index_ttl:
+            return None
+        self.doctors.move_to_end(doctor_id)
+        return index
+
+    async def ensure_fresh(self, doctor_id: UUID, load):
+        """Build the doctor's index from ``await load()`` if missing or older than the TTL"""
+        if self._fresh(doctor_id) is not None:
+            return
+        async with self._lock:
+            if self._fresh(doctor_id) is not None:
+                return
+            self.doctors[doctor_id] = DoctorTextIndex(await load())
+            self.doctors.move_to_end(doctor_id)
+            while len(self.doctors) > settings.appointment_search_index_doctors:
+                self.doctors.popitem(last=False)
+
+    def add(self, doctor_id: Optional[UUID], row: AppointmentText):
+        """Index a new appointment if its doctor's index is loaded (otherwise the next build reads it)"""
+        index = self.doctors.get(doctor_id)
+        if index is not None:
+            index.add(row)
+
+    def invalidate(self, doctor_ids: Iterable[UUID]):
+        for doctor_id in doctor_ids:
+            self.doctors.pop(doctor_id, None)
+
+    def search(self, doctor_id: UUID, query: str, limit: int = 20, offset: int = 0) -> TextHit:
+        index = self.doctors.get(doctor_id)
+        terms = search_terms(query)
+        if index is None or not terms:
+            return TextHit([], 0)
+        return index.search(terms, limit, offset)
+
+appointment_search_index = AppointmentSearchIndex()
@@ -0,0 +1,78 @@
+import typing
+from typing import List, Sequence
+
+import pydantic_core
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+# Fast JSON for the list endpoints. FastAPI's response_model path validates
+# every ORM row against the schema, dumps it to Python and then runs
+# json.dumps. Rows coming out of our own queries already have the right
+# types, so an Encoder reads the schema's fields straight off each row
+# (nested schemas included) and hands the dicts to pydantic-core's JSON
+# serializer in one call; rows that already are schema instances (compact
+# list rows) go through a compiled TypeAdapter's dump_json. Schemas stay the
+# source of truth for field names and the OpenAPI docs; anything needing
+# aliases or custom serializers must keep using response_model.
+
+class JSONBytesResponse(Response):
+    """JSON response for content that is already encoded (bytes pass through)"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return pydantic_core.to_json(content)
+
+def _nested_model(annotation):
+    """The BaseModel inside ``Optional[Model]``/``Model``, or None for plain fields"""
+    candidates = [arg for arg in typing.get_args(annotation) if arg is not type(None)] or [annotation]
+    if len(candidates) == 1 and isinstance(candidates[0], type) and issubclass(candidates[0], BaseModel):
+        return candidates[0]
+    return None
+
+def _compile(model) -> tuple:
+    """(field name, nested plan or None) for each field of ``model``"""
+    model.model_rebuild()  # resolve forward references such as 'PatientResponse'
+    plan = []
+    for name, field in model.model_fields.items():
+        nested = _nested_model(field.annotation)
+        plan.append((name, _compile(nested) if nested else None))
+    return tuple(plan)
+
+def _build(row, plan) -> dict:
+    data = {}
+    for name, nested in plan:
+        value = getattr(row, name, None)
+        data[name] = _build(value, nested) if nested is not None and value is not None else value
+    return data
+
+class Encoder:
+    """Encode trusted rows (ORM objects or schema instances) as ``model`` JSON without validating them"""
+
+    def __init__(self, model):
+        self.model = model
+        self._plan = None  # compiled on first use, once every schema is defined
+        self._adapter = None
+
+    @property
+    def plan(self) -> tuple:
+        if self._plan is None:
+            self._plan = _compile(self.model)
+        return self._plan
+
+    def dump(self, rows: Sequence) -> List[dict]:
+        plan = self.plan
+        return [_build(row, plan) for row in rows]
+
+    def encode(self, rows: Sequence) -> bytes:
+        """JSON array of ``rows``"""
+        if rows and isinstance(rows[0], self.model):
+            if self._adapter is None:
+                self._adapter = TypeAdapter(List[self.model])
+            return self._adapter.dump_json(rows)
+        return pydantic_core.to_json(self.dump(rows))
+
+def json_response(response: Response, body: bytes) -> JSONBytesResponse:
+    """Send ``body`` with the headers a route set on its injected ``response``"""
+    return JSONBytesResponse(content=body, headers=dict(response.headers))
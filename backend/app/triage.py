@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.config import settings
+
+# Triage order. A pending appointment's priority is how long it has waited
+# plus a head start for its severity (triage_head_start_minutes), so a severe
+# case goes ahead of milder ones that arrived up to its head start earlier,
+# and anyone who waits long enough eventually reaches the front (aging).
+# Since every waiting appointment ages at the same rate, the order never
+# changes over time: highest priority first is simply lowest
+#   triage_key = created_at - head start
+# which is stored on the row and indexed, so the queue is read in index order.
+
+SEVERITIES = ("mild", "moderate", "severe")
+SEVERITY_ALIASES = {
+    "low": "mild",
+    "minor": "mild",
+    "medium": "moderate",
+    "high": "severe",
+    "critical": "severe",
+    "urgent": "severe",
+    "emergency": "severe",
+}
+
+def normalize_severity(value: Optional[str]) -> Optional[str]:
+    """One of SEVERITIES for recognised (case-insensitive) values, otherwise the trimmed input"""
+    if value is None:
+        return None
+    cleaned = " ".join(value.split())
+    lowered = cleaned.lower()
+    if lowered in SEVERITIES:
+        return lowered
+    return SEVERITY_ALIASES.get(lowered, cleaned or None)
+
+def head_start(severity: Optional[str]) -> timedelta:
+    """Priority bonus of a severity; unknown or missing severities get none"""
+    return timedelta(minutes=settings.triage_head_start_minutes.get(severity or "", 0))
+
+def triage_key(created_at: datetime, severity: Optional[str]) -> datetime:
+    """Queue position: lower goes first"""
+    return created_at - head_start(severity)
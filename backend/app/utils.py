@@ -1,8 +1,13 @@
+import asyncio
 import bcrypt
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
 
+from app.config import settings
+
 # JWT settings
 SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
@@ -31,6 +36,83 @@ def get_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
+# Password hashing pool
+# bcrypt at cost 12 takes ~250 ms of CPU, so it must never run on the event loop.
+# Work goes to a bounded executor; when too many hashes are queued we shed load
+# instead of letting logins pile up behind each other.
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+if settings.hash_executor == "process":
+    _hash_executor = ProcessPoolExecutor(max_workers=settings.hash_workers)
+else:
+    _hash_executor = ThreadPoolExecutor(max_workers=settings.hash_workers, thread_name_prefix="bcrypt")
+
+_hash_in_flight = 0
+
+hash_metrics = {
+    "calls": 0,
+    "rejected": 0,
+    "latency_seconds_total": 0.0,
+    "latency_seconds_max": 0.0,
+    "queue_wait_seconds_total": 0.0,
+    "queue_wait_seconds_max": 0.0,
+}
+
+def _timed_call(fn, *args):
+    """Run fn in the worker and report when it started and how long it took"""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+async def _run_hash(fn, *args):
+    """Run a bcrypt call on the hashing pool with backpressure"""
+    global _hash_in_flight
+    if _hash_in_flight >= settings.hash_max_queue:
+        hash_metrics["rejected"] += 1
+        raise HashingPoolBusy(settings.hash_retry_after)
+
+    _hash_in_flight += 1
+    queued = time.time()
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, latency = await loop.run_in_executor(_hash_executor, _timed_call, fn, *args)
+    finally:
+        _hash_in_flight -= 1
+
+    wait = max(0.0, started - queued)
+    hash_metrics["calls"] += 1
+    hash_metrics["latency_seconds_total"] += latency
+    hash_metrics["latency_seconds_max"] = max(hash_metrics["latency_seconds_max"], latency)
+    hash_metrics["queue_wait_seconds_total"] += wait
+    hash_metrics["queue_wait_seconds_max"] = max(hash_metrics["queue_wait_seconds_max"], wait)
+    return result
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await _run_hash(get_password_hash, password)
+
+def get_hashing_metrics() -> dict:
+    """Snapshot of hashing pool metrics"""
+    calls = hash_metrics["calls"] or 1
+    return {
+        **hash_metrics,
+        "in_flight": _hash_in_flight,
+        "max_queue": settings.hash_max_queue,
+        "workers": settings.hash_workers,
+        "latency_seconds_avg": hash_metrics["latency_seconds_total"] / calls,
+        "queue_wait_seconds_avg": hash_metrics["queue_wait_seconds_total"] / calls,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
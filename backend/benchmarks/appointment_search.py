@@ -0,0 +1,150 @@
+"""Appointment text search benchmark.
+
+Seeds appointments (10M by default) and times /api/appointments/search for
+one doctor: their most common problem as a phrase, single word, plural,
+words from both fields and a deep page, against
+the tsvector/GIN index on Postgres or the in-memory index elsewhere (whose
+first search builds the doctor's index, reported apart). The baseline is the
+substring scan it replaces, ILIKE over problem and medical history. Checks
+that single-word totals equal the substring counts, and that an appointment
+booked during the run is found right away.
+
+    python -m benchmarks.appointment_search --appointments 10000000 --requests 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import func, or_, select
+
+from app.crud.appointments import AppointmentHistory
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.main import app
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+DOCTOR = "bench-d-1@bench.example.com"
+# Words of seed.MEDICAL_HISTORIES; the phrase is the doctor's most common problem
+QUERIES = {
+    "word": "diabetes",
+    "plural": "allergy",
+    "across_fields": "{problem} hypertension",
+}
+# Words that appear once in the seeded text and never inside another word
+SUBSTRING_CHECKS = ["fever", "diabetes", "asthma", "palpitations"]
+
+
+async def login(client, path, payload):
+    response = await client.post(path, json={**payload, "password": seed.BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def time_searches(client, headers, params, requests):
+    latencies = []
+    for _ in range(requests):
+        response = await timed_request(client, "GET", "/api/appointments/search", latencies, headers=headers, params=params)
+        response.raise_for_status()
+    return {**summarize(latencies), "total": response.json()["total"]}
+
+
+def substring_criteria(word):
+    pattern = f"%{word}%"
+    return or_(AppointmentHistory.problem.ilike(pattern), AppointmentHistory.medical_history.ilike(pattern))
+
+
+async def time_substring_scan(doctor_id, word, requests):
+    """Newest 20 substring matches with their count, what a search without an index does"""
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(requests):
+            start = time.perf_counter()
+            (await db.execute(
+                select(AppointmentHistory.id, func.count().over())
+                .where(AppointmentHistory.doctor_id == doctor_id, substring_criteria(word))
+                .order_by(AppointmentHistory.created_at.desc(), AppointmentHistory.id.desc())
+                .limit(20)
+            )).all()
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+async def common_problem(doctor_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(AppointmentHistory.problem)
+            .where(AppointmentHistory.doctor_id == doctor_id)
+            .group_by(AppointmentHistory.problem)
+            .order_by(func.count().desc())
+            .limit(1)
+        )).scalar()
+
+
+async def substring_count(doctor_id, word):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(AppointmentHistory)
+            .where(AppointmentHistory.doctor_id == doctor_id, substring_criteria(word))
+        )).scalar()
+
+
+async def run(requests):
+    results = {}
+    async with asgi_client(app) as client:
+        headers = await login(client, "/api/auth/login/doctor", {"email": DOCTOR})
+        doctor_id = uuid.UUID((await client.get("/api/doctors/me", headers=headers)).json()["id"])
+
+        problem = (await common_problem(doctor_id)).lower()
+
+        latencies = []
+        await timed_request(client, "GET", "/api/appointments/search", latencies, headers=headers, params={"q": "rash"})
+        results["first_search"] = summarize(latencies)
+        results["phrase"] = await time_searches(client, headers, {"q": problem}, requests)
+        for name, query in QUERIES.items():
+            results[name] = await time_searches(client, headers, {"q": query.format(problem=problem)}, requests)
+        results["page_5"] = await time_searches(client, headers, {"q": problem, "offset": 80}, requests)
+        results["substring_scan_baseline"] = await time_substring_scan(doctor_id, QUERIES["word"], requests)
+
+        totals = {}
+        for word in SUBSTRING_CHECKS:
+            response = await client.get("/api/appointments/search", headers=headers, params={"q": word, "limit": 1})
+            totals[word] = {"search": response.json()["total"], "substring": await substring_count(doctor_id, word)}
+        results["totals_match_substring"] = all(value["search"] == value["substring"] for value in totals.values())
+        results["totals"] = totals
+
+        # A booking is searchable as soon as it is created
+        patient = await login(client, "/api/auth/login/patient", {"contact": "bench-p-1"})
+        booked = await client.post("/api/appointments/", headers=patient, json={
+            "doctor_id": str(doctor_id), "problem": "Sprained wrist", "medical_history": "Tendonitis"
+        })
+        booked.raise_for_status()
+        found = (await client.get("/api/appointments/search", headers=headers, params={"q": "sprained wrist"})).json()
+        results["new_booking_found"] = [item["id"] for item in found["appointments"]] == [booked.json()["id"]]
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--appointments", type=int, default=10000000)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200, help="searches per query")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    timings = seed.seed(args.patients, args.doctors, args.appointments)
+    try:
+        results = asyncio.run(run(args.requests))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("appointment_search", {
+        "appointments": args.appointments, "dialect": engine.dialect.name, "seed": timings, **results
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Time-slot availability benchmark.
+
+Seeds doctors (10k by default) working Mon-Fri 09:00-17:00 in 30 minute
+slots and books the earliest slots of most of them (a different number per
+doctor), so "next free slot" has to skip held slots. Times the first
+availability request (index build), /api/doctors/availability for a
+specialization over the next week, a single doctor's free slots and the
+in-memory next_free lookup alone. Then races --racers patients for one slot:
+exactly one booking may succeed, the rest get 409.
+
+    python -m benchmarks.availability --doctors 10000 --requests 300
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+from app.database import async_engine, engine
+from app.main import app
+from app.models import Appointment
+from app.scheduling import Template, availability_index, booking_window, clinic_tz, day_slots
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+TEMPLATE = Template(seed.clock_time(9), seed.clock_time(17), 30)
+MAX_BOOKED = 40  # doctor i holds its first i % MAX_BOOKED slots
+
+
+def upcoming_slots(count):
+    """The first ``count`` slots of the bench template from now on, in UTC"""
+    start, end = booking_window()
+    tz = clinic_tz()
+    day = start.astimezone(tz).date()
+    slots = []
+    while len(slots) < count and day <= end.astimezone(tz).date():
+        if day.weekday() < 5:
+            slots.extend(
+                (slot_start.astimezone(timezone.utc), slot_end.astimezone(timezone.utc))
+                for slot_start, slot_end in day_slots(day, [TEMPLATE], tz) if slot_start >= start
+            )
+        day += timedelta(days=1)
+    return slots[:count]
+
+
+def book_earliest(doctor_ids):
+    """Hold each doctor's earliest slots with bench patients' appointments"""
+    slots = upcoming_slots(MAX_BOOKED)
+    with engine.begin() as conn:
+        patient_ids = [uuid.UUID(str(row[0])) for row in conn.execute(
+            text("SELECT id FROM patients WHERE contact LIKE 'bench-p-%'")
+        )]
+    patients = itertools.cycle(patient_ids)
+    rows = []
+    for position, doctor_id in enumerate(doctor_ids):
+        for slot_start, slot_end in slots[:position % MAX_BOOKED]:
+            rows.append({
+                "id": uuid.uuid4(),
+                "appointment_code": f"BS{len(rows):07X}",
+                "patient_id": next(patients),
+                "doctor_id": uuid.UUID(str(doctor_id)),
+                "problem": "Booked slot",
+                "status": "pending",
+                "slot_start": slot_start,
+                "slot_end": slot_end,
+            })
+    with engine.begin() as conn:
+        for batch_start in range(0, len(rows), seed.BATCH):
+            conn.execute(insert(Appointment), rows[batch_start:batch_start + seed.BATCH])
+    return len(rows)
+
+
+async def login(client, contact):
+    response = await client.post("/api/auth/login/patient", json={"contact": contact, "password": seed.BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(requests, concurrency, racers):
+    results = {}
+    week = (datetime.now(timezone.utc) + timedelta(days=7)).isoformat()
+    async with asgi_client(app) as client:
+        headers = await login(client, "bench-p-1")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        # First call loads schedules and held slots into the index
+        availability_index.invalidate()
+        start = time.perf_counter()
+        response = await client.get("/api/doctors/availability", headers=headers, params={"limit": 1})
+        response.raise_for_status()
+        results["index_build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        doctor_id = next(iter(availability_index.doctors))
+        cases = {
+            "next_free_specialization": ("/api/doctors/availability", {"specialization": "Cardiology", "date_to": week}),
+            "next_free_any": ("/api/doctors/availability", {"date_to": week, "limit": 20}),
+            "doctor_slots": (f"/api/doctors/{doctor_id}/availability", {"date_to": week}),
+        }
+        for name, (url, params) in cases.items():
+            latencies = []
+
+            async def one():
+                async with semaphore:
+                    await timed_request(client, "GET", url, latencies, headers=headers, params=params)
+
+            sample = (await client.get(url, headers=headers, params=params)).json()
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results[name] = {
+                **summarize(latencies, time.perf_counter() - start),
+                "slots": len(sample),
+                "first": sample[0]["start"] if sample else None,
+            }
+
+        # The index lookup on its own, without HTTP and auth
+        after, before = booking_window()
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            availability_index.next_free(after, min(before, after + timedelta(days=7)), ["Cardiology"])
+            latencies.append(time.perf_counter() - start)
+        results["index_next_free"] = summarize(latencies)
+
+        # Many patients booking the same free slot at once
+        slot = (await client.get(f"/api/doctors/{doctor_id}/availability", headers=headers, params={"limit": 1})).json()[0]
+        racer_headers = await asyncio.gather(*(login(client, f"bench-p-{i + 1}") for i in range(racers)))
+        responses = await asyncio.gather(*(
+            client.post("/api/appointments/", headers=racer, json={
+                "doctor_id": str(doctor_id), "problem": "Race", "slot_start": slot["start"]
+            })
+            for racer in racer_headers
+        ))
+        statuses = [response.status_code for response in responses]
+        results["double_booking_race"] = {
+            "racers": racers,
+            "booked": statuses.count(200),
+            "conflicts": statuses.count(409),
+            "other": len(statuses) - statuses.count(200) - statuses.count(409),
+        }
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=300, help="requests per case")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--racers", type=int, default=20, help="patients booking the same slot")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    seed.seed(patients=max(args.racers, 50), doctors=args.doctors, appointments=0)
+    try:
+        templates = seed.seed_schedules()
+        booked = book_earliest(seed.bench_doctor_ids())
+        results = asyncio.run(run(args.requests, args.concurrency, args.racers))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("availability", {"doctors": args.doctors, "templates": templates, "booked_slots": booked, **results})
+
+
+if __name__ == "__main__":
+    main()
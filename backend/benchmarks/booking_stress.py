@@ -0,0 +1,122 @@
+"""Concurrent booking stress test for appointment code allocation.
+
+Starts several worker processes, each with its own engine and event loop,
+that book appointments in parallel through crud.create_appointment. Reports
+duplicate codes (must be 0), SQL statements per booking and code retries.
+``--code-length 3`` shrinks the code space to force collisions and exercise
+the ON CONFLICT retry path.
+
+    python -m benchmarks.booking_stress --workers 8 --bookings 500
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from sqlalchemy import event, text
+
+
+def worker(worker_id, bookings, concurrency, code_length, results):
+    # Imported in the child so every process gets its own engine and pool
+    from app.crud import appointments as crud
+    from app.database import AsyncSessionLocal, async_engine, engine
+    from app.schemas import AppointmentCreate
+
+    crud.CODE_LENGTH = code_length
+    statements = {"count": 0, "inserts": 0}
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements["count"] += 1
+        if statement.lstrip().upper().startswith("INSERT"):
+            statements["inserts"] += 1
+
+    with engine.connect() as conn:
+        patient_id, doctor_id = conn.execute(text(
+            "SELECT (SELECT id FROM patients WHERE contact = 'bench-p-1'), "
+            "(SELECT id FROM doctors WHERE email = 'bench-d-1@bench.example.com')"
+        )).one()
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        failures = 0
+
+        async def book(n):
+            nonlocal failures
+            async with semaphore, AsyncSessionLocal() as db:
+                try:
+                    await crud.create_appointment(db, AppointmentCreate(
+                        doctor_id=doctor_id, problem=f"stress {worker_id}-{n}"
+                    ), patient_id)
+                except RuntimeError:
+                    failures += 1
+
+        await asyncio.gather(*(book(n) for n in range(bookings)))
+        await async_engine.dispose()
+        return failures
+
+    failures = asyncio.run(run())
+    results.put({"worker": worker_id, "failures": failures, **statements})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--bookings", type=int, default=500, help="per worker")
+    parser.add_argument("--concurrency", type=int, default=10, help="per worker")
+    parser.add_argument("--code-length", type=int, default=8)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    from app.database import engine
+    from benchmarks import seed
+    from benchmarks.common import report
+
+    seed.seed(patients=1, doctors=1, appointments=0)
+    try:
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(n, args.bookings, args.concurrency, args.code_length, results)
+            )
+            for n in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        per_worker = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        with engine.connect() as conn:
+            duplicates = conn.execute(text("""
+                SELECT count(*) FROM (
+                    SELECT appointment_code FROM appointments
+                    WHERE problem LIKE 'stress %'
+                    GROUP BY appointment_code HAVING count(*) > 1
+                ) d
+            """)).scalar()
+            booked = conn.execute(text(
+                "SELECT count(*) FROM appointments WHERE problem LIKE 'stress %'"
+            )).scalar()
+    finally:
+        if not args.keep:
+            seed.clear()
+
+    statements = sum(w["count"] for w in per_worker)
+    inserts = sum(w["inserts"] for w in per_worker)
+    report("booking_stress", {
+        "workers": args.workers,
+        "booked": booked,
+        "failed": sum(w["failures"] for w in per_worker),
+        "duplicate_codes": duplicates,
+        "bookings_per_second": round(booked / elapsed, 1),
+        "statements_per_booking": round(statements / max(booked, 1), 3),
+        "code_retries": inserts - booked,
+    })
+
+
+if __name__ == "__main__":
+    main()
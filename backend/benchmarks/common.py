@@ -0,0 +1,55 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the scripts from the backend directory, e.g. ``python -m benchmarks.concurrency``.
+They talk to the FastAPI app in-process through httpx's ASGI transport, so a
+database (see app/database.py) must be reachable but no server is needed.
+"""
+import json
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile (0-100) of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed=None):
+    """Summarise a list of latencies (seconds) as milliseconds"""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+    if elapsed:
+        summary["rps"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def asgi_client(app, headers=None):
+    """httpx client bound to the ASGI app (no network hop)"""
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench",
+        headers=headers,
+    )
+
+
+async def timed_request(client, method, url, latencies, **kwargs):
+    """Issue a request and append its latency to ``latencies``"""
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    latencies.append(time.perf_counter() - start)
+    return response
+
+
+def report(name, results):
+    """Print a machine-readable result line"""
+    print(json.dumps({"benchmark": name, **results}, indent=2))
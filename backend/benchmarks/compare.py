@@ -0,0 +1,68 @@
+"""Compare two ``benchmarks.run`` JSON reports route by route.
+
+    python -m benchmarks.compare baseline.json candidate.json
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits non-zero when any route's p95 latency or queries per request regress by
+more than the threshold (percent), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["rps", "p50_ms", "p95_ms", "p99_ms", "db_statements_per_request"]
+
+
+def change(old, new):
+    """Percentage change from old to new"""
+    if not old:
+        return 0.0 if not new else float("inf")
+    return (new - old) / old * 100
+
+
+def compare(baseline, candidate, threshold):
+    """Print a per-route table and return the list of regressions"""
+    regressions = []
+    for mix, result in candidate["mixes"].items():
+        previous = baseline["mixes"].get(mix)
+        if previous is None:
+            continue
+        print(f"\n== {mix} ==")
+        print(f"{'route':<45}" + "".join(f"{metric:>28}" for metric in METRICS))
+        for route, stats in result["routes"].items():
+            old = previous["routes"].get(route)
+            if old is None:
+                continue
+            cells = []
+            for metric in METRICS:
+                delta = change(old.get(metric, 0), stats.get(metric, 0))
+                cells.append(f"{old.get(metric, 0):>10} -> {stats.get(metric, 0):<8} ({delta:+.0f}%)")
+                worse = delta < -threshold if metric == "rps" else delta > threshold
+                if worse and metric in ("p95_ms", "db_statements_per_request"):
+                    regressions.append((mix, route, metric, delta))
+            print(f"{route:<45}" + "".join(f"{cell:>28}" for cell in cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print("\nRegressions:")
+        for mix, route, metric, delta in regressions:
+            print(f"  {mix} {route} {metric} {delta:+.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
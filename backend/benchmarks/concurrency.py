@@ -0,0 +1,71 @@
+"""Event-loop concurrency benchmark.
+
+Fires fast requests at the API while a number of slow queries (pg_sleep) are
+in flight and reports fast-request latency. With the async session the p99
+stays flat as slow queries are added; ``--sync-slow`` runs the slow queries on
+the blocking engine instead, which reproduces the old behaviour.
+
+    python -m benchmarks.concurrency --requests 500 --slow 0 4 16
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.main import app
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+
+async def slow_query_async(seconds):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT pg_sleep(:s)"), {"s": seconds})
+
+
+async def slow_query_sync(seconds):
+    # Deliberately blocking: this is what every handler used to do
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_sleep(:s)"), {"s": seconds})
+
+
+async def run(requests, concurrency, slow, slow_seconds, sync_slow):
+    latencies = []
+    slow_fn = slow_query_sync if sync_slow else slow_query_async
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with asgi_client(app) as client:
+        async def fast():
+            async with semaphore:
+                await timed_request(client, "GET", "/api/appointments/code/BENCH000", latencies)
+
+        start = time.perf_counter()
+        slow_tasks = [asyncio.create_task(slow_fn(slow_seconds)) for _ in range(slow)]
+        await asyncio.gather(*(fast() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*slow_tasks)
+
+    # Pooled connections are bound to this event loop
+    await async_engine.dispose()
+    return summarize(latencies, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--slow", type=int, nargs="+", default=[0, 4, 16])
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    parser.add_argument("--sync-slow", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for slow in args.slow:
+        results[f"slow_{slow}"] = asyncio.run(
+            run(args.requests, args.concurrency, slow, args.slow_seconds, args.sync_slow)
+        )
+    report("concurrency", {"sync_slow": args.sync_slow, "results": results})
+
+
+if __name__ == "__main__":
+    main()
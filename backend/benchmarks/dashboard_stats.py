@@ -0,0 +1,156 @@
+"""Dashboard statistics benchmark.
+
+Seeds appointments (1M by default) and compares /api/appointments/stats,
+read from the trigger-maintained counters, with the COUNT ... GROUP BY it
+replaces. Then runs a write mix through the API (bookings, confirms,
+rejections, batch completions, queue pops) and checks that the counters
+still equal a fresh GROUP BY over appointments, overall and per day.
+
+    python -m benchmarks.dashboard_stats --appointments 1000000 --requests 300
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import func, select
+
+from app.crud.stats import get_appointment_stats
+from app.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models import Appointment, AppointmentDailyStats, AppointmentStatusTotals
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+DOCTOR = "bench-d-1@bench.example.com"
+
+
+async def login(client, path, payload):
+    response = await client.post(path, json={**payload, "password": seed.BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def group_by_counts(db, doctor_id):
+    """What a server-side dashboard computes without counters"""
+    result = await db.execute(
+        select(Appointment.status, func.count())
+        .where(Appointment.doctor_id == doctor_id)
+        .group_by(Appointment.status)
+    )
+    return dict(result.all())
+
+
+async def time_reads(read, doctor_id, count):
+    """Run ``await read(db, doctor_id)`` ``count`` times, one after another"""
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(count):
+            start = time.perf_counter()
+            value = await read(db, doctor_id)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies), value
+
+
+async def counters_match():
+    """Counters equal a GROUP BY over every appointment (totals and days)"""
+    async with AsyncSessionLocal() as db:
+        expected = (await db.execute(
+            select(Appointment.doctor_id, Appointment.status, func.count())
+            .where(Appointment.doctor_id.isnot(None))
+            .group_by(Appointment.doctor_id, Appointment.status)
+        )).all()
+        totals = (await db.execute(
+            select(AppointmentStatusTotals.doctor_id, AppointmentStatusTotals.status, AppointmentStatusTotals.appointments)
+            .where(AppointmentStatusTotals.appointments != 0)
+        )).all()
+        daily = (await db.execute(
+            select(AppointmentDailyStats.doctor_id, AppointmentDailyStats.status, func.sum(AppointmentDailyStats.appointments))
+            .group_by(AppointmentDailyStats.doctor_id, AppointmentDailyStats.status)
+            .having(func.sum(AppointmentDailyStats.appointments) != 0)
+        )).all()
+    expected = {(doctor_id, status): count for doctor_id, status, count in expected}
+    return {
+        "totals": expected == {(doctor_id, status): count for doctor_id, status, count in totals},
+        "daily": expected == {(doctor_id, status): count for doctor_id, status, count in daily},
+    }
+
+
+async def write_mix(client, doctor_headers, doctor_id, bookings):
+    """Bookings, confirms, rejections, batch completions and pops through the API"""
+    patients = await asyncio.gather(*(
+        login(client, "/api/auth/login/patient", {"contact": f"bench-p-{i + 1}"}) for i in range(10)
+    ))
+    latencies = []
+    created = []
+    for i in range(bookings):
+        response = await timed_request(client, "POST", "/api/appointments/", latencies, headers=patients[i % 10], json={
+            "doctor_id": str(doctor_id), "problem": "Dashboard check", "severity": seed.SEVERITIES[i % 3]
+        })
+        created.append(response.json()["id"])
+    for appointment_id in created[:bookings // 4]:
+        await client.post("/api/appointments/confirm", headers=doctor_headers, json={"appointment_id": appointment_id})
+    for appointment_id in created[bookings // 4:bookings // 2]:
+        await client.post("/api/appointments/reject", headers=doctor_headers, json={
+            "appointment_id": appointment_id, "cancellation_reason": "Benchmark"
+        })
+    await client.post("/api/appointments/batch", headers=doctor_headers, json={
+        "status": "completed", "appointments": [{"appointment_id": value} for value in created[:bookings // 8]]
+    })
+    for _ in range(bookings // 8):
+        await client.post("/api/appointments/queue/next", headers=doctor_headers)
+    return summarize(latencies)
+
+
+async def run(requests, concurrency, bookings):
+    results = {}
+    async with asgi_client(app) as client:
+        headers = await login(client, "/api/auth/login/doctor", {"email": DOCTOR})
+        doctor_id = uuid.UUID((await client.get("/api/doctors/me", headers=headers)).json()["id"])
+        semaphore = asyncio.Semaphore(concurrency)
+
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                await timed_request(client, "GET", "/api/appointments/stats", latencies, headers=headers)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        stats = (await client.get("/api/appointments/stats", headers=headers)).json()
+        results["stats_endpoint"] = {**summarize(latencies, time.perf_counter() - start), "totals": stats["totals"]}
+
+        # The same question answered by the database alone
+        summary, stats = await time_reads(get_appointment_stats, doctor_id, requests)
+        results["counters_query"] = {**summary, "totals": stats.totals}
+        summary, counts = await time_reads(group_by_counts, doctor_id, requests)
+        results["group_by_baseline"] = {**summary, "totals": counts}
+
+        results["bookings_with_counters"] = await write_mix(client, headers, doctor_id, bookings)
+        results["counters_match_group_by"] = await counters_match()
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--bookings", type=int, default=200, help="appointments in the write mix")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    timings = seed.seed(patients=1000, doctors=args.doctors, appointments=args.appointments)
+    try:
+        results = asyncio.run(run(args.requests, args.concurrency, args.bookings))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("dashboard_stats", {"appointments": args.appointments, "seed": timings, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Doctor directory cache benchmark.
+
+Seeds doctors, logs in a bench patient and hammers GET /api/doctors with the
+directory cache disabled and enabled, then once more revalidating with
+If-None-Match. Reports requests/sec, latency and DB statements per request.
+
+    python -m benchmarks.doctor_directory --doctors 200 --requests 3000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event
+
+from app.cache import directory_cache
+from app.config import settings
+from app.database import async_engine
+from app.main import app
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+statements = [0]
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements[0] += 1
+
+
+async def run(requests, concurrency, limit):
+    results = {}
+    async with asgi_client(app) as client:
+        response = await client.post("/api/auth/login/patient", json={
+            "contact": "bench-p-1", "password": seed.BENCH_PASSWORD
+        })
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        params = {"limit": limit}
+        etag = (await client.get("/api/doctors", headers=headers, params=params)).headers["etag"]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        scenarios = [
+            ("cache_off", False, headers),
+            ("cache_on", True, headers),
+            ("cache_on_revalidate", True, {**headers, "If-None-Match": etag}),
+        ]
+        for name, enabled, request_headers in scenarios:
+            settings.directory_cache_enabled = enabled
+            await directory_cache.invalidate()
+            latencies = []
+
+            async def one():
+                async with semaphore:
+                    await timed_request(client, "GET", "/api/doctors", latencies, headers=request_headers, params=params)
+
+            before = statements[0]
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results[name] = {
+                **summarize(latencies, time.perf_counter() - start),
+                "db_statements_per_request": round((statements[0] - before) / requests, 3),
+            }
+        results["cache"] = directory_cache.stats()
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=100, help="page size requested")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    seed.seed(patients=1, doctors=args.doctors, appointments=0)
+    try:
+        results = asyncio.run(run(args.requests, args.concurrency, args.limit))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("doctor_directory", results)
+
+
+if __name__ == "__main__":
+    main()
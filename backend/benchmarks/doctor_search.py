@@ -0,0 +1,85 @@
+"""Doctor search benchmark.
+
+Seeds a large doctor directory (50k by default, names built from common first
+and last names) and times /api/doctors/search for prefix, fuzzy (misspelt),
+facet-only and combined queries. Reports latency per query kind and the
+search backend used (pg_trgm on Postgres, the in-memory index elsewhere).
+
+    python -m benchmarks.doctor_search --doctors 50000 --requests 500
+"""
+import argparse
+import asyncio
+import time
+
+from app.config import settings
+from app.database import async_engine, engine
+from app.main import app
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+QUERIES = {
+    "prefix": {"q": "zai"},
+    "full_name": {"q": "sana qureshi"},
+    "fuzzy": {"q": "siddiqi"},
+    "facet_only": {"specialization": "Cardiology"},
+    "fuzzy_and_facets": {"q": "hussan", "specialization": "Neurology", "department": "Neurological Sciences"},
+}
+
+
+async def run(requests, concurrency):
+    results = {}
+    async with asgi_client(app) as client:
+        response = await client.post("/api/auth/login/patient", json={
+            "contact": "bench-p-1", "password": seed.BENCH_PASSWORD
+        })
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        # First call builds the in-memory index when that backend is used
+        start = time.perf_counter()
+        await client.get("/api/doctors/search", headers=headers, params={"q": "warmup"})
+        results["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        for name, params in QUERIES.items():
+            latencies = []
+
+            async def one():
+                async with semaphore:
+                    await timed_request(client, "GET", "/api/doctors/search", latencies, headers=headers, params=params)
+
+            sample = (await client.get("/api/doctors/search", headers=headers, params=params)).json()
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results[name] = {
+                **summarize(latencies, time.perf_counter() - start),
+                "total": sample["total"],
+                "top": [doctor["name"] for doctor in sample["doctors"][:3]],
+            }
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--doctors", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per query kind")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    seed.seed(patients=1, doctors=args.doctors, appointments=0)
+    try:
+        results = asyncio.run(run(args.requests, args.concurrency))
+    finally:
+        if not args.keep:
+            seed.clear()
+    backend = settings.doctor_search_backend
+    if backend == "auto":
+        backend = "postgres" if engine.dialect.name == "postgresql" else "memory"
+    report("doctor_search", {"doctors": args.doctors, "backend": backend, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""EXPLAIN check for the doctor pending-queue query.
+
+Seeds appointments at several sizes and prints the plan of the busiest
+doctor's pending queue. Exits non-zero if the queue query needs a Sort or a
+sequential scan, or if the id/created_at projection is not an Index Only Scan.
+
+    python -m benchmarks.explain_queue --sizes 100000 1000000
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import text
+
+from app.database import engine
+from benchmarks import seed
+
+QUEUE_QUERY = """
+    SELECT {columns} FROM appointments
+    WHERE doctor_id = :doctor_id AND status = 'pending'
+    ORDER BY created_at, id
+    LIMIT 50
+"""
+
+
+def explain(conn, columns, doctor_id):
+    plan = conn.execute(
+        text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + QUEUE_QUERY.format(columns=columns)),
+        {"doctor_id": doctor_id}
+    ).scalar()
+    return plan[0]
+
+
+def node_types(node):
+    yield node["Node Type"]
+    for child in node.get("Plans", []):
+        yield from node_types(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    ok = True
+    results = []
+    try:
+        seeded = 0
+        for size in args.sizes:
+            seed.seed(patients=10000, doctors=50, appointments=size - seeded)
+            seeded = size
+            # VACUUM cannot run in a transaction; it also sets the visibility map
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("VACUUM ANALYZE appointments"))
+                doctor_id = conn.execute(text(
+                    "SELECT doctor_id FROM appointments WHERE status = 'pending' "
+                    "GROUP BY doctor_id ORDER BY count(*) DESC LIMIT 1"
+                )).scalar()
+                for label, columns in (("ids", "id, created_at"), ("rows", "*")):
+                    plan = explain(conn, columns, doctor_id)
+                    nodes = list(node_types(plan["Plan"]))
+                    passed = "Sort" not in nodes and "Seq Scan" not in nodes
+                    if label == "ids":
+                        passed = passed and "Index Only Scan" in nodes
+                    ok = ok and passed
+                    results.append({
+                        "rows": size,
+                        "query": label,
+                        "nodes": nodes,
+                        "execution_ms": plan["Execution Time"],
+                        "passed": passed,
+                    })
+    finally:
+        if not args.keep:
+            seed.clear()
+
+    print(json.dumps({"benchmark": "explain_queue", "results": results}, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
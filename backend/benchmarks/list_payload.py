@@ -0,0 +1,80 @@
+"""Compact vs expanded appointment list benchmark.
+
+Logs in as a seeded doctor and fetches 100-row pages of /api/appointments/all
+in the default compact form and with ``expand=patient,doctor``, reporting
+payload size, request latency and pure serialisation time of the page.
+
+    python -m benchmarks.list_payload --pages 50
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.crud.appointments import get_all_appointments
+from app.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.schemas import AppointmentListItem, AppointmentResponse
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+
+async def login_doctor(client):
+    response = await client.post("/api/auth/login/doctor", json={
+        "email": "bench-d-1@bench.example.com",
+        "password": seed.BENCH_PASSWORD,
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def serialisation_ms(expand, schema, repeat):
+    adapter = TypeAdapter(List[schema])
+    async with AsyncSessionLocal() as db:
+        rows = await get_all_appointments(db, limit=100, expand=expand)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+
+async def run(pages):
+    results = {}
+    async with asgi_client(app) as client:
+        headers = await login_doctor(client)
+        for label, params in (("compact", {}), ("expanded", {"expand": "patient,doctor"})):
+            latencies = []
+            size = 0
+            for page in range(pages):
+                response = await timed_request(
+                    client, "GET", "/api/appointments/all", latencies,
+                    headers=headers, params={"skip": page * 100, "limit": 100, **params}
+                )
+                size += len(response.content)
+            results[label] = {**summarize(latencies), "avg_payload_bytes": size // pages}
+
+    results["compact"]["serialise_ms"] = await serialisation_ms(None, AppointmentListItem, pages)
+    results["expanded"]["serialise_ms"] = await serialisation_ms({"patient", "doctor"}, AppointmentResponse, pages)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    seed.seed(patients=1000, doctors=20, appointments=args.pages * 100)
+    try:
+        results = asyncio.run(run(args.pages))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("list_payload", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Offset vs keyset pagination benchmark.
+
+Seeds a large appointment table (default 1M rows) and times fetching a deep
+page of /api/appointments/all with ``skip`` versus with the cursor that points
+at the same position.
+
+    python -m benchmarks.pagination --rows 1000000 --page 1000 --limit 100
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.crud.appointments import get_all_appointments
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.pagination import encode_cursor
+from benchmarks import seed
+from benchmarks.common import report, summarize
+
+
+async def time_page(repeat, **kwargs):
+    latencies = []
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            rows = await get_all_appointments(db, **kwargs)
+            latencies.append(time.perf_counter() - start)
+    return latencies, rows
+
+
+async def run(page, limit, repeat):
+    skip = (page - 1) * limit
+    # Cursor for the same page: the row just before it in (created_at, id) order
+    with engine.connect() as conn:
+        before = conn.execute(text(
+            "SELECT created_at, id FROM appointments ORDER BY created_at, id OFFSET :o LIMIT 1"
+        ), {"o": skip - 1}).one()
+    cursor = encode_cursor(before.created_at, before.id)
+
+    offset_latencies, offset_rows = await time_page(repeat, skip=skip, limit=limit)
+    cursor_latencies, cursor_rows = await time_page(repeat, limit=limit, cursor=cursor)
+    await async_engine.dispose()
+
+    return {
+        "page": page,
+        "limit": limit,
+        "same_rows": [r.id for r in offset_rows] == [r.id for r in cursor_rows],
+        "offset": summarize(offset_latencies),
+        "cursor": summarize(cursor_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    timings = seed.seed(patients=10000, doctors=500, appointments=args.rows)
+    try:
+        results = asyncio.run(run(args.page, args.limit, args.repeat))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("pagination", {"rows": args.rows, "seed": timings, **results})
+
+
+if __name__ == "__main__":
+    main()
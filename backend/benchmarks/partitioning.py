@@ -0,0 +1,185 @@
+"""Appointment partitioning and archive benchmark.
+
+Seeds appointments spread over three years (50M by default) and times the
+hot queries: a doctor's triage queue, the clinic-wide triage head, a
+patient's history (first page) and appointment code lookups. They run
+before and after the archive job (app/partitions.py) moves closed
+appointments older than --older-than months out of the live table, and on
+Postgres also against an unpartitioned copy of the same rows (skip with
+--skip-flat, it doubles the disk used). Open appointments left before the
+cutoff are closed first, as they would be in a real clinic, so whole months
+can move. Checks that history and code lookups return the same rows after
+archiving.
+
+    python -m benchmarks.partitioning --appointments 50000000 --requests 200
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.models import Appointment
+from app.partitions import archive_appointments, archive_cutoff
+from benchmarks import seed
+from benchmarks.common import report, summarize
+
+DOCTOR = "bench-d-1@bench.example.com"
+PATIENT = "bench-p-1"
+_HISTORY_COLUMNS = "id, appointment_code, patient_id, status, created_at"
+HISTORY = (
+    f"(SELECT {_HISTORY_COLUMNS} FROM appointments "
+    f"UNION ALL SELECT {_HISTORY_COLUMNS} FROM appointments_archive) AS appointment_history"
+)
+# Shapes of the queries the app runs (app/crud/appointments.py)
+QUERIES = {
+    "doctor_queue": (
+        "SELECT id, triage_key FROM {live} WHERE doctor_id = :doctor_id AND status = 'pending' "
+        "ORDER BY triage_key, id LIMIT 20"
+    ),
+    "triage_head": "SELECT id, triage_key FROM {live} WHERE status = 'pending' ORDER BY triage_key, id LIMIT 20",
+    "patient_history": "SELECT id, created_at FROM {history} WHERE patient_id = :patient_id ORDER BY created_at, id LIMIT 50",
+    "code_lookup": "SELECT id, status FROM {history} WHERE appointment_code = :code{pruning}",
+}
+PARTITIONED = {
+    "live": "appointments",
+    "history": HISTORY,
+    "pruning": (
+        " AND id = (SELECT appointment_id FROM appointment_codes WHERE appointment_code = :code)"
+        " AND created_at = (SELECT created_at FROM appointment_codes WHERE appointment_code = :code)"
+    ),
+}
+FLAT = {"live": "appointments_flat", "history": "appointments_flat", "pruning": ""}
+
+
+def time_queries(layout, params, codes, requests):
+    """Latency of each hot query, run ``requests`` times one after another"""
+    results = {}
+    with engine.connect() as conn:
+        for name, query in QUERIES.items():
+            statement = text(query.format(**layout))
+            latencies = []
+            for i in range(requests):
+                start = time.perf_counter()
+                conn.execute(statement, {**params, "code": codes[i % len(codes)]}).all()
+                latencies.append(time.perf_counter() - start)
+            results[name] = summarize(latencies)
+    return results
+
+
+def snapshot(layout, params, codes):
+    """Rows the history and code queries return, to compare across layouts"""
+    with engine.connect() as conn:
+        history = conn.execute(text(
+            "SELECT id FROM {history} WHERE patient_id = :patient_id ORDER BY created_at, id".format(**layout)
+        ), params).scalars().all()
+        found = [
+            conn.execute(text(QUERIES["code_lookup"].format(**layout)), {"code": code}).first() is not None
+            for code in codes
+        ]
+    return [str(value) for value in history], found
+
+
+def table_sizes():
+    """Rows and index size (MB) of the live table and the archive (Postgres)"""
+    sizes = {}
+    with engine.connect() as conn:
+        for table in ("appointments", "appointments_archive"):
+            sizes[table] = {"rows": conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()}
+            if engine.dialect.name == "postgresql":
+                index_bytes = conn.execute(text(
+                    f"SELECT sum(pg_indexes_size(relid)) FROM pg_partition_tree('{table}')"
+                )).scalar()
+                sizes[table]["index_mb"] = round((index_bytes or 0) / 2 ** 20, 1)
+    return sizes
+
+
+def close_old(cutoff):
+    """Complete or cancel the appointments still open before the cutoff"""
+    with engine.begin() as conn:
+        return conn.execute(text(
+            "UPDATE appointments SET status = CASE status WHEN 'confirmed' THEN 'completed' ELSE 'cancelled' END "
+            "WHERE created_at < :cutoff AND status IN ('pending', 'confirmed')"
+        ), {"cutoff": cutoff}).rowcount
+
+
+def flat_copy():
+    """appointments_flat: the live rows in one ordinary table with the same indexes"""
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS appointments_flat"))
+        conn.execute(text("CREATE TABLE appointments_flat (LIKE appointments INCLUDING DEFAULTS)"))
+        conn.execute(text("INSERT INTO appointments_flat SELECT * FROM appointments"))
+        conn.execute(text("ALTER TABLE appointments_flat ADD PRIMARY KEY (id)"))
+        for index in Appointment.__table__.indexes:
+            columns = ", ".join(column.name for column in index.columns)
+            conn.execute(text(f"CREATE INDEX {index.name.replace('appointments_', 'appointments_flat_')} "
+                              f"ON appointments_flat ({columns})"))
+        conn.execute(text("ANALYZE appointments_flat"))
+        return round(conn.execute(text("SELECT pg_indexes_size('appointments_flat')")).scalar() / 2 ** 20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--appointments", type=int, default=50000000)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--span-days", type=int, default=3 * 365, help="appointments are spread over this many days")
+    parser.add_argument("--older-than", type=int, default=12, help="archive closed appointments older than this many months")
+    parser.add_argument("--requests", type=int, default=200, help="runs of each query")
+    parser.add_argument("--skip-flat", action="store_true", help="no unpartitioned baseline (Postgres)")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    postgres = engine.dialect.name == "postgresql"
+    cutoff = archive_cutoff(args.older_than)
+    results = {"appointments": args.appointments, "dialect": engine.dialect.name}
+    results["seed"] = seed.seed(args.patients, args.doctors, args.appointments, args.span_days)
+    try:
+        results["closed_before_cutoff"] = close_old(cutoff)
+        with engine.begin() as conn:
+            if postgres:
+                conn.execute(text("ANALYZE appointments"))
+            params = {
+                "doctor_id": conn.execute(text("SELECT id FROM doctors WHERE email = :email"), {"email": DOCTOR}).scalar(),
+                "patient_id": conn.execute(text("SELECT id FROM patients WHERE contact = :contact"), {"contact": PATIENT}).scalar(),
+            }
+            # Half the codes end up archived, half stay live
+            codes = [
+                row.appointment_code for row in conn.execute(text(
+                    "SELECT appointment_code FROM appointments WHERE appointment_code LIKE 'B%' "
+                    "AND created_at < :cutoff LIMIT 50"
+                ), {"cutoff": cutoff})
+            ] + [
+                row.appointment_code for row in conn.execute(text(
+                    "SELECT appointment_code FROM appointments WHERE appointment_code LIKE 'B%' "
+                    "AND created_at >= :cutoff LIMIT 50"
+                ), {"cutoff": cutoff})
+            ]
+
+        if postgres and not args.skip_flat:
+            results["unpartitioned"] = {"index_mb": flat_copy(), **time_queries(FLAT, params, codes, args.requests)}
+        results["before_archive"] = {"sizes": table_sizes(), **time_queries(PARTITIONED, params, codes, args.requests)}
+        before = snapshot(PARTITIONED, params, codes)
+
+        start = time.perf_counter()
+        results["archive"] = {**archive_appointments(args.older_than), "seconds": round(time.perf_counter() - start, 2)}
+        if postgres:
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE appointments"))
+                conn.execute(text("ANALYZE appointments_archive"))
+
+        results["after_archive"] = {"sizes": table_sizes(), **time_queries(PARTITIONED, params, codes, args.requests)}
+        after = snapshot(PARTITIONED, params, codes)
+        results["history_preserved"] = before[0] == after[0]
+        results["codes_found"] = {"before": sum(before[1]), "after": sum(after[1]), "sampled": len(codes)}
+    finally:
+        if postgres and not args.skip_flat:
+            with engine.begin() as conn:
+                conn.execute(text("DROP TABLE IF EXISTS appointments_flat"))
+        if not args.keep:
+            seed.clear()
+    report("partitioning", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Connection pool exhaustion load test.
+
+Holds more concurrent sessions than pool_size + max_overflow, each running
+pg_sleep, with a short pool_timeout. Sessions beyond the pool limit wait and
+then fail with a pool timeout, which the API turns into 503 + Retry-After.
+The report shows how many succeeded or timed out and the pool metrics from
+/metrics.
+
+    python -m benchmarks.pool_exhaustion --sessions 40 --hold 3
+"""
+import argparse
+import asyncio
+import os
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--hold", type=float, default=3.0, help="seconds each session holds its connection")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--pool-timeout", type=int, default=1)
+    args = parser.parse_args()
+
+    # Settings are read when app.database is imported
+    os.environ["POOL_SIZE"] = str(args.pool_size)
+    os.environ["MAX_OVERFLOW"] = str(args.max_overflow)
+    os.environ["POOL_TIMEOUT"] = str(args.pool_timeout)
+
+    from sqlalchemy import text
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from app.database import AsyncSessionLocal, async_engine
+    from app.main import app
+    from benchmarks.common import asgi_client, report, summarize
+
+    async def hold(outcomes, latencies):
+        start = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT pg_sleep(:s)"), {"s": args.hold})
+            outcomes["ok"] += 1
+        except PoolTimeoutError:
+            outcomes["pool_timeout"] += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def run():
+        outcomes = {"ok": 0, "pool_timeout": 0}
+        latencies = []
+        async with asgi_client(app) as client:
+            holders = [asyncio.create_task(hold(outcomes, latencies)) for _ in range(args.sessions)]
+            await asyncio.sleep(args.pool_timeout / 2)
+            # An API request made while the pool is exhausted
+            probe = await client.get("/api/appointments/code/BENCH000")
+            await asyncio.gather(*holders)
+            metrics = (await client.get("/metrics")).json()["pool"]["primary"]
+        await async_engine.dispose()
+        return {
+            "capacity": args.pool_size + args.max_overflow,
+            "sessions": args.sessions,
+            **outcomes,
+            "probe_status": probe.status_code,
+            "probe_retry_after": probe.headers.get("Retry-After"),
+            "latency": summarize(latencies),
+            "pool": metrics,
+        }
+
+    report("pool_exhaustion", asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Principal cache benchmark.
+
+Registers a throwaway patient, then hammers /api/auth/me/patient (which needs
+the full user) with the principal cache enabled and disabled and reports
+requests/sec and latency for each.
+
+    python -m benchmarks.principal_cache --requests 2000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.cache import principal_cache
+from app.config import settings
+from app.database import async_engine
+from app.main import app
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+
+async def run(requests, concurrency):
+    results = {}
+    async with asgi_client(app) as client:
+        response = await client.post("/api/auth/register/patient", json={
+            "name": "Bench Patient",
+            "contact": f"bench-{uuid.uuid4().hex[:12]}",
+            "password": "bench-password",
+        })
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        for enabled in (False, True):
+            settings.principal_cache_enabled = enabled
+            principal_cache.clear()
+            latencies = []
+
+            async def one():
+                async with semaphore:
+                    await timed_request(client, "GET", "/api/auth/me/patient", latencies, headers=headers)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results["cache_on" if enabled else "cache_off"] = {
+                **summarize(latencies, time.perf_counter() - start),
+                "cache": principal_cache.stats(),
+            }
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    report("principal_cache", asyncio.run(run(args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Push (Server-Sent Events) versus polling benchmark.
+
+N clients follow one appointment code each while a doctor changes those
+appointments at a steady rate. Phase one has every client poll
+GET /api/appointments/code/{code}; phase two has every client hold an
+/api/events/appointments stream. For each phase it reports DB statements
+issued (total and per second), requests served and how long a status change
+took to reach a client.
+
+The app runs under a real uvicorn server on localhost (httpx's ASGI transport
+buffers whole responses, so it cannot carry a stream).
+
+    python -m benchmarks.push_vs_poll --clients 200 --interval 2 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+
+from app.database import async_engine
+from app.main import app
+from benchmarks import seed
+from benchmarks.common import percentile, report
+
+statements = [0]
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements[0] += 1
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Tracker:
+    """When each code changed and when each client first saw the change"""
+
+    def __init__(self):
+        self.changed_at = {}  # code -> (status, time)
+        self.delays = []
+
+    def changed(self, code, status):
+        self.changed_at[code] = (status, time.perf_counter())
+
+    def seen(self, code, status):
+        change = self.changed_at.get(code)
+        if change is not None and change[0] == status:
+            self.delays.append(time.perf_counter() - change[1])
+            del self.changed_at[code]
+
+
+async def writer(client, headers, appointments, tracker, rate, stop):
+    """Confirm, then complete, the followed appointments at ``rate`` changes per second"""
+    steps = [(item, "confirmed") for item in appointments] + [(item, "completed") for item in appointments]
+    for item, status in steps:
+        if stop.is_set():
+            return
+        response = await client.put(f"/api/appointments/{item['id']}", headers=headers, json={"status": status})
+        if response.status_code == 200:
+            tracker.changed(item["appointment_code"], status)
+        await asyncio.sleep(1 / rate)
+
+
+async def poller(client, code, interval, tracker, stop, counter):
+    last = None
+    while not stop.is_set():
+        response = await client.get(f"/api/appointments/code/{code}")
+        counter[0] += 1
+        status = response.json().get("status")
+        if status != last:
+            tracker.seen(code, status)
+            last = status
+        await asyncio.sleep(interval)
+
+
+async def listener(client, code, tracker, stop, counter, ready):
+    async with client.stream("GET", "/api/events/appointments", params={"code": code}) as response:
+        counter[0] += 1
+        ready.release()
+        async for line in response.aiter_lines():
+            if stop.is_set():
+                return
+            if line.startswith("data: "):
+                tracker.seen(code, json.loads(line[6:])["status"])
+
+
+async def phase(base_url, mode, doctor_headers, appointments, args):
+    tracker = Tracker()
+    stop = asyncio.Event()
+    counter = [0]
+    limits = httpx.Limits(max_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        if mode == "poll":
+            tasks = [
+                asyncio.create_task(poller(client, item["appointment_code"], args.interval, tracker, stop, counter))
+                for item in appointments
+            ]
+        else:
+            ready = asyncio.Semaphore(0)
+            tasks = [
+                asyncio.create_task(listener(client, item["appointment_code"], tracker, stop, counter, ready))
+                for item in appointments
+            ]
+            for _ in tasks:
+                await ready.acquire()
+
+        before = statements[0]
+        start = time.perf_counter()
+        write = asyncio.create_task(writer(client, doctor_headers, appointments, tracker, args.rate, stop))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - start
+        issued = statements[0] - before
+        for task in tasks + [write]:
+            task.cancel()
+        await asyncio.gather(*tasks, write, return_exceptions=True)
+
+    return {
+        "clients": len(appointments),
+        "requests": counter[0],
+        "db_statements": issued,
+        "db_statements_per_second": round(issued / elapsed, 1),
+        "changes_seen": len(tracker.delays),
+        "delay_p50_ms": round(percentile(tracker.delays, 50) * 1000, 1),
+        "delay_p95_ms": round(percentile(tracker.delays, 95) * 1000, 1),
+    }
+
+
+async def run(args):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            response = await client.post("/api/auth/login/doctor", json={
+                "email": "bench-d-1@bench.example.com", "password": seed.BENCH_PASSWORD
+            })
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            queue = await client.get("/api/appointments/my", headers=headers, params={"status": "pending", "limit": args.clients * 2})
+            pending = queue.json()
+
+        for mode in ("poll", "push"):
+            followed, pending = pending[:args.clients], pending[args.clients:]
+            if len(followed) < args.clients:
+                raise SystemExit(f"Only {len(followed)} pending appointments left for bench doctor 1; seed more")
+            results[mode] = await phase(base_url, mode, headers, followed, args)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="connected clients, one appointment each")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls per client")
+    parser.add_argument("--rate", type=float, default=5.0, help="status changes per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    # One bench doctor owning plenty of pending appointments for both phases
+    seed.seed(patients=max(10, args.clients), doctors=1, appointments=args.clients * 16)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("push_vs_poll", {**vars(args), **results})
+
+
+if __name__ == "__main__":
+    main()
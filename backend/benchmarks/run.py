@@ -0,0 +1,300 @@
+"""Load-testing harness covering every API route.
+
+Seeds synthetic patients, doctors and appointments at a configurable scale,
+then replays a workload mix against the app in-process and reports, per
+route: requests, errors, RPS, p50/p95/p99 latency and DB statements per
+request. Results are written as JSON so runs can be compared with
+``python -m benchmarks.compare old.json new.json``.
+
+Point DATABASE_URL/ASYNC_DATABASE_URL at a local Postgres, or at SQLite as a
+stand-in (e.g. ASYNC_DATABASE_URL=sqlite+aiosqlite:///./bench.db and
+DATABASE_URL=sqlite:///./bench.db).
+
+    python -m benchmarks.run --scale 100000 --mix mixed --requests 5000 --output run.json
+    python -m benchmarks.run --mix login_burst booking queue_polling code_lookup
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime
+import json
+import platform
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import event
+
+from app.database import async_engine, engine
+from app.main import app
+from benchmarks import seed
+from benchmarks.common import asgi_client, summarize
+
+# DB statements issued while serving the current request (see count_statement)
+_statements = contextvars.ContextVar("bench_statements", default=None)
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class Workload:
+    """Tokens and ids gathered once so operations can pick realistic targets"""
+
+    def __init__(self, client, rng):
+        self.client = client
+        self.rng = rng
+        self.patients = []  # (contact, headers)
+        self.doctors = []  # (email, doctor_id, headers)
+        self.codes = []
+        self.pending = defaultdict(list)  # doctor index -> pending appointment ids
+
+    async def prepare(self, users, codes):
+        for n in range(1, users + 1):
+            contact = f"bench-p-{n}"
+            response = await self.client.post("/api/auth/login/patient", json={"contact": contact, "password": seed.BENCH_PASSWORD})
+            self.patients.append((contact, {"Authorization": f"Bearer {response.json()['access_token']}"}))
+
+            email = f"bench-d-{n}@bench.example.com"
+            response = await self.client.post("/api/auth/login/doctor", json={"email": email, "password": seed.BENCH_PASSWORD})
+            body = response.json()
+            headers = {"Authorization": f"Bearer {body['access_token']}"}
+            self.doctors.append((email, body["user"]["id"], headers))
+
+            queue = await self.client.get("/api/appointments/my", headers=headers, params={"status": "pending", "limit": 500})
+            self.pending[n - 1] = [row["id"] for row in queue.json()]
+        self.codes = seed.bench_codes(codes)
+
+    def patient(self):
+        return self.rng.choice(self.patients)
+
+    def doctor(self):
+        index = self.rng.randrange(len(self.doctors))
+        return index, self.doctors[index]
+
+    def pending_id(self, index):
+        queue = self.pending[index]
+        return queue.pop() if queue else str(uuid.uuid4())
+
+    # Operations return (route label, method, url, request kwargs)
+
+    def login_patient(self):
+        contact, _ = self.patient()
+        return "POST /api/auth/login/patient", "POST", "/api/auth/login/patient", {"json": {"contact": contact, "password": seed.BENCH_PASSWORD}}
+
+    def login_doctor(self):
+        _, (email, _, _) = self.doctor()
+        return "POST /api/auth/login/doctor", "POST", "/api/auth/login/doctor", {"json": {"email": email, "password": seed.BENCH_PASSWORD}}
+
+    def register_patient(self):
+        body = {"name": "Bench Patient", "contact": f"bench-p-r{uuid.uuid4().hex[:12]}", "password": seed.BENCH_PASSWORD}
+        return "POST /api/auth/register/patient", "POST", "/api/auth/register/patient", {"json": body}
+
+    def me_patient(self):
+        _, headers = self.patient()
+        return "GET /api/auth/me/patient", "GET", "/api/auth/me/patient", {"headers": headers}
+
+    def me_doctor(self):
+        _, (_, _, headers) = self.doctor()
+        return "GET /api/auth/me/doctor", "GET", "/api/auth/me/doctor", {"headers": headers}
+
+    def patient_profile(self):
+        _, headers = self.patient()
+        return "GET /api/patients/me", "GET", "/api/patients/me", {"headers": headers}
+
+    def doctor_profile(self):
+        _, (_, _, headers) = self.doctor()
+        return "GET /api/doctors/me", "GET", "/api/doctors/me", {"headers": headers}
+
+    def update_doctor_profile(self):
+        _, (_, _, headers) = self.doctor()
+        body = {"bio": f"Updated by benchmark at {time.time()}"}
+        return "PUT /api/doctors/me", "PUT", "/api/doctors/me", {"headers": headers, "json": body}
+
+    def doctor_list(self):
+        _, headers = self.patient()
+        return "GET /api/doctors", "GET", "/api/doctors", {"headers": headers}
+
+    def booking(self):
+        _, headers = self.patient()
+        _, (_, doctor_id, _) = self.doctor()
+        body = {"doctor_id": doctor_id, "problem": self.rng.choice(seed.PROBLEMS), "severity": self.rng.choice(seed.SEVERITIES)}
+        return "POST /api/appointments/", "POST", "/api/appointments/", {"headers": headers, "json": body}
+
+    def code_lookup(self):
+        code = self.rng.choice(self.codes) if self.codes else "BENCH000"
+        return "GET /api/appointments/code/{code}", "GET", f"/api/appointments/code/{code}", {}
+
+    def patient_history(self):
+        _, headers = self.patient()
+        return "GET /api/appointments/my (patient)", "GET", "/api/appointments/my", {"headers": headers, "params": {"limit": 50}}
+
+    def queue_polling(self):
+        _, (_, _, headers) = self.doctor()
+        params = {"status": "pending", "limit": 50}
+        return "GET /api/appointments/my (doctor queue)", "GET", "/api/appointments/my", {"headers": headers, "params": params}
+
+    def all_appointments(self):
+        _, (_, _, headers) = self.doctor()
+        return "GET /api/appointments/all", "GET", "/api/appointments/all", {"headers": headers, "params": {"limit": 100}}
+
+    def confirm(self):
+        index, (_, _, headers) = self.doctor()
+        body = {"appointment_id": self.pending_id(index)}
+        return "POST /api/appointments/confirm", "POST", "/api/appointments/confirm", {"headers": headers, "json": body}
+
+    def reject(self):
+        index, (_, _, headers) = self.doctor()
+        body = {"appointment_id": self.pending_id(index), "cancellation_reason": "Benchmark"}
+        return "POST /api/appointments/reject", "POST", "/api/appointments/reject", {"headers": headers, "json": body}
+
+    def batch_confirm(self):
+        index, (_, _, headers) = self.doctor()
+        body = {"status": "confirmed", "appointments": [{"appointment_id": self.pending_id(index)} for _ in range(10)]}
+        return "POST /api/appointments/batch", "POST", "/api/appointments/batch", {"headers": headers, "json": body}
+
+    def update_status(self):
+        index, (_, _, headers) = self.doctor()
+        appointment_id = self.pending_id(index)
+        return "PUT /api/appointments/{id}", "PUT", f"/api/appointments/{appointment_id}", {"headers": headers, "json": {"status": "confirmed"}}
+
+    def cancel(self):
+        index, (_, _, headers) = self.doctor()
+        appointment_id = self.pending_id(index)
+        return "DELETE /api/appointments/{id}", "DELETE", f"/api/appointments/{appointment_id}", {"headers": headers}
+
+    def export(self):
+        _, (_, _, headers) = self.doctor()
+        since = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)).isoformat()
+        return "GET /api/appointments/export", "GET", "/api/appointments/export", {"headers": headers, "params": {"date_from": since}}
+
+    def health(self):
+        return "GET /health", "GET", "/health", {}
+
+
+# Workload mixes: operation name -> relative weight
+MIXES = {
+    "login_burst": {"login_patient": 6, "login_doctor": 4},
+    "booking": {"booking": 6, "doctor_list": 3, "patient_history": 1},
+    "queue_polling": {"queue_polling": 8, "confirm": 1, "reject": 1, "batch_confirm": 1},
+    "code_lookup": {"code_lookup": 1},
+    "mixed": {
+        "login_patient": 2, "login_doctor": 1, "register_patient": 1,
+        "me_patient": 3, "me_doctor": 3, "patient_profile": 2, "doctor_profile": 2,
+        "update_doctor_profile": 1, "doctor_list": 5, "booking": 5, "code_lookup": 10,
+        "patient_history": 6, "queue_polling": 12, "all_appointments": 2,
+        "confirm": 2, "reject": 1, "batch_confirm": 1, "update_status": 1, "cancel": 1, "export": 1, "health": 1,
+    },
+}
+
+
+async def replay(workload, mix, requests, concurrency):
+    """Run ``requests`` weighted operations with bounded concurrency"""
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    latencies = defaultdict(list)
+    statements = defaultdict(int)
+    errors = defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name):
+        route, method, url, kwargs = getattr(workload, name)()
+        async with semaphore:
+            counter = [0]
+            token = _statements.set(counter)
+            start = time.perf_counter()
+            try:
+                response = await workload.client.request(method, url, **kwargs)
+                if response.status_code >= 400:
+                    errors[route] += 1
+            finally:
+                latencies[route].append(time.perf_counter() - start)
+                statements[route] += counter[0]
+                _statements.reset(token)
+
+    start = time.perf_counter()
+    picks = workload.rng.choices(operations, weights=weights, k=requests)
+    await asyncio.gather(*(one(name) for name in picks))
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for route, samples in sorted(latencies.items()):
+        routes[route] = {
+            **summarize(samples, elapsed),
+            "errors": errors[route],
+            "db_statements_per_request": round(statements[route] / len(samples), 2),
+        }
+    total = sum(len(samples) for samples in latencies.values())
+    return {"requests": total, "elapsed_seconds": round(elapsed, 2), "rps": round(total / elapsed, 1), "routes": routes}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results = {}
+    async with asgi_client(app) as client:
+        workload = Workload(client, rng)
+        await workload.prepare(users=args.users, codes=1000)
+        for mix in args.mix:
+            results[mix] = await replay(workload, MIXES[mix], args.requests, args.concurrency)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10000, help="appointments to seed (10k to 10M)")
+    parser.add_argument("--mix", nargs="+", choices=sorted(MIXES), default=["mixed"])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mix")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20, help="logged-in patients and doctors")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the workload")
+    parser.add_argument("--no-seed", action="store_true", help="reuse previously seeded data")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    seeding = None
+    if not args.no_seed:
+        seeding = seed.seed(
+            patients=max(args.users, args.scale // 10),
+            doctors=max(args.users, args.scale // 1000),
+            appointments=args.scale
+        )
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if not args.keep:
+            seed.clear()
+
+    output = {
+        "benchmark": "run",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "scale": args.scale,
+        "concurrency": args.concurrency,
+        "seeding": seeding,
+        "mixes": results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
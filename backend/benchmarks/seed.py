@@ -0,0 +1,241 @@
+"""Synthetic data for benchmarks.
+
+On Postgres rows are generated server-side with generate_series so seeding
+millions of appointments takes seconds; other databases (the SQLite stand-in)
+get the same data through batched executemany. Everything seeded here is
+tagged (contacts start with ``bench-p-``, emails with ``bench-d-``,
+appointment codes with ``B``) and removed by ``clear()``.
+
+    python -m benchmarks.seed --patients 10000 --doctors 500 --appointments 1000000
+    python -m benchmarks.seed --clear
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, time as clock_time, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+from app.database import Base, engine
+from app.config import settings
+from app.models import Appointment, Doctor, DoctorSchedule, Patient
+from app.triage import triage_key
+from app.utils import get_password_hash
+
+BENCH_PASSWORD = "bench-password"
+SPECIALIZATIONS = ["Cardiology", "Neurology", "Pediatrics", "Orthopedics", "Dermatology"]
+DEPARTMENTS = ["Cardiovascular Medicine", "Neurological Sciences", "Pediatric Care", "Orthopedic Surgery", "Skin Health"]
+PROBLEMS = ["Headache and fever", "Chest pain", "Back pain", "Skin rash", "Heart palpitations"]
+MEDICAL_HISTORIES = ["Hypertension", None, "Type 2 diabetes", "Asthma since childhood", None,
+                     "Migraines and seasonal allergies", "Previous knee surgery"]
+STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+SEVERITIES = ["mild", "moderate", "severe"]
+# Doctor names are first x last combinations so name search has realistic matches
+FIRST_NAMES = ["Ahmed", "Ayesha", "Bilal", "Fatima", "Hamza", "Hina", "Imran", "Javeria", "Kamran", "Lubna",
+               "Maria", "Nadia", "Omar", "Rabia", "Saad", "Sana", "Tariq", "Usman", "Zainab", "Zara"]
+LAST_NAMES = ["Abbasi", "Akhtar", "Baig", "Butt", "Chaudhry", "Farooq", "Hussain", "Iqbal", "Javed", "Khan",
+              "Malik", "Mirza", "Nawaz", "Qureshi", "Rana", "Raza", "Shah", "Siddiqui", "Sheikh", "Yousaf"]
+BATCH = 10000
+
+
+def _spacing(appointments, span_days):
+    """(seconds between consecutive appointments, seconds after which created_at wraps around)
+
+    By default appointments are a second apart within the last year;
+    ``span_days`` spreads them evenly over that many days instead.
+    """
+    if span_days is None:
+        return 1, 365 * 86400
+    return max(1, span_days * 86400 // max(appointments, 1)), span_days * 86400
+
+
+def seed(patients, doctors, appointments, span_days=None):
+    """Insert tagged patients, doctors and appointments; returns timings"""
+    if engine.dialect.name != "postgresql":
+        return _seed_portable(patients, doctors, appointments, span_days)
+
+    timings = {}
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        conn.execute(text("""
+            INSERT INTO patients (id, name, contact, password_hash)
+            SELECT gen_random_uuid(), 'Bench Patient ' || g, 'bench-p-' || g, :hash
+            FROM generate_series(1, :n) g
+            ON CONFLICT DO NOTHING
+        """), {"n": patients, "hash": password_hash})
+        conn.execute(text("""
+            INSERT INTO doctors (id, name, email, password_hash, specialization, department)
+            SELECT gen_random_uuid(),
+                   'Dr. ' || (:first)[1 + g % 20] || ' ' || (:last)[1 + (g / 20) % 20],
+                   'bench-d-' || g || '@bench.example.com', :hash,
+                   (ARRAY['Cardiology','Neurology','Pediatrics','Orthopedics','Dermatology'])[1 + g % 5],
+                   (ARRAY['Cardiovascular Medicine','Neurological Sciences','Pediatric Care','Orthopedic Surgery','Skin Health'])[1 + g % 5]
+            FROM generate_series(1, :n) g
+            ON CONFLICT DO NOTHING
+        """), {"n": doctors, "hash": password_hash, "first": FIRST_NAMES, "last": LAST_NAMES})
+        timings["users_seconds"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        # Monthly partitions for the whole span, so nothing lands in appointments_default
+        spacing, span = _spacing(appointments, span_days)
+        conn.execute(text("SELECT ensure_monthly_partitions('appointments', current_date - :days, :months)"),
+                     {"days": span // 86400, "months": span // (28 * 86400) + 2})
+        conn.execute(text("""
+            WITH p AS (SELECT array_agg(id) AS ids FROM patients WHERE contact LIKE 'bench-p-%'),
+                 d AS (SELECT array_agg(id) AS ids FROM doctors WHERE email LIKE 'bench-d-%')
+            INSERT INTO appointments (id, appointment_code, patient_id, doctor_id, problem, medical_history,
+                                      status, severity, triage_key, created_at, updated_at)
+            SELECT gen_random_uuid(),
+                   'B' || lpad(upper(to_hex(g)), 7, '0'),
+                   p.ids[1 + (g * 7919) % array_length(p.ids, 1)],
+                   d.ids[1 + (g * 104729) % array_length(d.ids, 1)],
+                   (ARRAY['Headache and fever','Chest pain','Back pain','Skin rash','Heart palpitations'])[1 + g % 5],
+                   (:histories)[1 + g % 7],
+                   (ARRAY['pending','confirmed','completed','cancelled'])[1 + (g / 3) % 4],
+                   (ARRAY['mild','moderate','severe'])[1 + g % 3],
+                   now() - (g::bigint * :spacing % :span) * interval '1 second'
+                         - (:head_starts)[1 + g % 3] * interval '1 minute',
+                   now() - (g::bigint * :spacing % :span) * interval '1 second',
+                   now() - (g::bigint * :spacing % :span) * interval '1 second'
+            FROM generate_series(
+                (SELECT count(*) FROM appointment_codes WHERE appointment_code LIKE 'B%') + 1,
+                (SELECT count(*) FROM appointment_codes WHERE appointment_code LIKE 'B%') + :n
+            ) g, p, d
+        """), {"n": appointments, "spacing": spacing, "span": span, "histories": MEDICAL_HISTORIES,
+               "head_starts": [settings.triage_head_start_minutes.get(value, 0) for value in SEVERITIES]})
+        timings["appointments_seconds"] = round(time.perf_counter() - start, 2)
+        conn.execute(text("ANALYZE appointments"))
+    return timings
+
+
+def _seed_portable(patients, doctors, appointments, span_days=None):
+    """Same data as seed() generated in Python, for databases without generate_series"""
+    Base.metadata.create_all(bind=engine)
+    timings = {}
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        existing = conn.execute(text("SELECT count(*) FROM patients WHERE contact LIKE 'bench-p-%'")).scalar()
+        new_patients = [
+            {"id": uuid.uuid4(), "name": f"Bench Patient {g}", "contact": f"bench-p-{g}", "password_hash": password_hash}
+            for g in range(existing + 1, patients + 1)
+        ]
+        if new_patients:
+            conn.execute(insert(Patient), new_patients)
+        existing = conn.execute(text("SELECT count(*) FROM doctors WHERE email LIKE 'bench-d-%'")).scalar()
+        new_doctors = [
+            {"id": uuid.uuid4(), "name": f"Dr. {FIRST_NAMES[g % 20]} {LAST_NAMES[(g // 20) % 20]}",
+             "email": f"bench-d-{g}@bench.example.com",
+             "password_hash": password_hash, "specialization": SPECIALIZATIONS[g % 5], "department": DEPARTMENTS[g % 5]}
+            for g in range(existing + 1, doctors + 1)
+        ]
+        if new_doctors:
+            conn.execute(insert(Doctor), new_doctors)
+        timings["users_seconds"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        patient_ids = [row.id for row in conn.execute(text("SELECT id FROM patients WHERE contact LIKE 'bench-p-%'"))]
+        doctor_ids = [row.id for row in conn.execute(text("SELECT id FROM doctors WHERE email LIKE 'bench-d-%'"))]
+        # Codes of archived appointments stay taken, so count the registry
+        spacing, span = _spacing(appointments, span_days)
+        first = conn.execute(text("SELECT count(*) FROM appointment_codes WHERE appointment_code LIKE 'B%'")).scalar() + 1
+        for batch_start in range(first, first + appointments, BATCH):
+            rows = []
+            for g in range(batch_start, min(batch_start + BATCH, first + appointments)):
+                created_at = now - timedelta(seconds=g * spacing % span)
+                rows.append({
+                    "id": uuid.uuid4(),
+                    "appointment_code": "B%07X" % g,
+                    "patient_id": uuid.UUID(str(patient_ids[(g * 7919) % len(patient_ids)])),
+                    "doctor_id": uuid.UUID(str(doctor_ids[(g * 104729) % len(doctor_ids)])),
+                    "problem": PROBLEMS[g % 5],
+                    "medical_history": MEDICAL_HISTORIES[g % 7],
+                    "status": STATUSES[(g // 3) % 4],
+                    "severity": SEVERITIES[g % 3],
+                    "triage_key": triage_key(created_at, SEVERITIES[g % 3]),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+            conn.execute(insert(Appointment), rows)
+        timings["appointments_seconds"] = round(time.perf_counter() - start, 2)
+    return timings
+
+
+def seed_schedules(weekdays=range(5), start=clock_time(9), end=clock_time(17), slot_minutes=30):
+    """Give every seeded doctor the same weekly working hours (Mon-Fri 9-17 by default)"""
+    Base.metadata.create_all(bind=engine)
+    doctor_ids = [uuid.UUID(str(doctor_id)) for doctor_id in bench_doctor_ids()]
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM doctor_schedules WHERE doctor_id IN "
+            "(SELECT id FROM doctors WHERE email LIKE 'bench-d-%')"
+        ))
+        rows = [
+            {"id": uuid.uuid4(), "doctor_id": doctor_id, "weekday": weekday,
+             "start_time": start, "end_time": end, "slot_minutes": slot_minutes}
+            for doctor_id in doctor_ids for weekday in weekdays
+        ]
+        for batch_start in range(0, len(rows), BATCH):
+            conn.execute(insert(DoctorSchedule), rows[batch_start:batch_start + BATCH])
+    return len(rows)
+
+
+def bench_codes(limit):
+    """A sample of seeded appointment codes"""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT appointment_code FROM appointments WHERE appointment_code LIKE 'B%' LIMIT :limit"),
+            {"limit": limit}
+        )
+        return [row.appointment_code for row in rows]
+
+
+def bench_doctor_ids(limit=None):
+    """Ids of seeded doctors"""
+    query = "SELECT id FROM doctors WHERE email LIKE 'bench-d-%' ORDER BY email"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    with engine.connect() as conn:
+        return [row.id for row in conn.execute(text(query))]
+
+
+def clear():
+    """Remove all seeded rows"""
+    with engine.begin() as conn:
+        # Explicit for databases that don't enforce ON DELETE CASCADE (SQLite);
+        # the stats counter tables have no foreign key at all. Triggers release
+        # the codes and slots held in the registries.
+        for table in ("appointments", "appointments_archive"):
+            conn.execute(text(
+                f"DELETE FROM {table} WHERE patient_id IN "
+                "(SELECT id FROM patients WHERE contact LIKE 'bench-p-%')"
+            ))
+        for table in ("doctor_schedules", "appointment_daily_stats", "appointment_status_totals"):
+            conn.execute(text(
+                f"DELETE FROM {table} WHERE doctor_id IN "
+                "(SELECT id FROM doctors WHERE email LIKE 'bench-d-%')"
+            ))
+        conn.execute(text("DELETE FROM patients WHERE contact LIKE 'bench-p-%'"))
+        conn.execute(text("DELETE FROM doctors WHERE email LIKE 'bench-d-%'"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--appointments", type=int, default=100000)
+    parser.add_argument("--span-days", type=int, help="spread appointments over this many days (default: a second apart)")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    if args.clear:
+        clear()
+        print("Cleared benchmark data")
+        return
+    print(seed(args.patients, args.doctors, args.appointments, args.span_days))
+
+
+if __name__ == "__main__":
+    main()
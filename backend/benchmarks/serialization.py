@@ -0,0 +1,113 @@
+"""Response serialization microbenchmark.
+
+Encodes 100-row appointment pages (nested patient and doctor, as returned by
+?expand=patient,doctor, plus the compact list rows) three ways and reports
+the time per page:
+
+  response_model  FastAPI's default: validate against the schema, dump to
+                  Python, render with json.dumps (JSONResponse)
+  type_adapter    compiled TypeAdapter: validate_python(from_attributes) + dump_json
+  encoder         app.serialization.Encoder: no validation, one pydantic-core dump
+
+Rows are built in memory, so no database is needed.
+
+    python -m benchmarks.serialization --rows 100 --iterations 500
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+from app.models import Appointment, Doctor, Patient
+from app.schemas import AppointmentListItem, AppointmentResponse
+from app.serialization import Encoder
+from benchmarks.common import report
+
+
+def appointment_rows(count):
+    """Appointments with loaded patient and doctor, like a joinedload page"""
+    now = datetime.now()
+    rows = []
+    for n in range(count):
+        patient = Patient(id=uuid.uuid4(), name=f"Bench Patient {n}", contact=f"bench-p-{n}", created_at=now)
+        doctor = Doctor(
+            id=uuid.uuid4(), name=f"Dr. Bench {n}", email=f"bench-d-{n}@bench.example.com", phone="0300-0000000",
+            qualification="MBBS, FCPS", specialization="Cardiology", department="Cardiac Sciences",
+            experience="10 years", bio="Consultant cardiologist. " * 8, created_at=now
+        )
+        rows.append(Appointment(
+            id=uuid.uuid4(), appointment_code=f"APT{n:08d}", patient_id=patient.id, doctor_id=doctor.id,
+            problem="Chest pain on exertion for the last few days", severity="moderate", duration="3 days",
+            medical_history="Hypertension", status="pending", created_at=now - timedelta(minutes=n),
+            updated_at=now, patient=patient, doctor=doctor
+        ))
+    return rows
+
+
+def list_items(rows):
+    return [
+        AppointmentListItem(
+            **{name: getattr(row, name) for name in AppointmentListItem.model_fields if name not in ("patient", "doctor")},
+            patient={"id": row.patient.id, "name": row.patient.name},
+            doctor={"id": row.doctor.id, "name": row.doctor.name, "specialization": row.doctor.specialization}
+        )
+        for row in rows
+    ]
+
+
+def encoders(model, loop):
+    field = create_response_field(name="response", type_=List[model])
+    adapter = TypeAdapter(List[model])
+    encoder = Encoder(model)
+
+    def response_model(rows):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=rows))
+        return JSONResponse(content).body
+
+    def type_adapter(rows):
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    return {"response_model": response_model, "type_adapter": type_adapter, "encoder": encoder.encode}
+
+
+def time_per_page(encode, rows, iterations):
+    encode(rows)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(rows)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows per page")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = appointment_rows(args.rows)
+    pages = {"expanded": (AppointmentResponse, rows), "list_items": (AppointmentListItem, list_items(rows))}
+    loop = asyncio.new_event_loop()
+    results = {}
+    for page, (model, page_rows) in pages.items():
+        timings = {}
+        bodies = {}
+        for name, encode in encoders(model, loop).items():
+            bodies[name] = json.loads(encode(page_rows))
+            timings[f"{name}_ms"] = round(time_per_page(encode, page_rows, args.iterations), 3)
+        timings["same_output"] = all(body == bodies["response_model"] for body in bodies.values())
+        timings["speedup"] = round(timings["response_model_ms"] / timings["encoder_ms"], 1)
+        results[page] = timings
+    loop.close()
+    report("serialization", {"rows": args.rows, "iterations": args.iterations, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Triage queue benchmark.
+
+Seeds one doctor with a long pending queue (100k by default, mixed
+severities, arrivals spread over the last three days) and a department
+colleague with a shorter one. Times the top of the doctor's and the
+department's queue, popping the next patient one at a time and with
+concurrent pops (each appointment must be handed out once), against the
+alternative of loading every pending row and sorting it in Python. Checks
+that pops come out in triage order.
+
+    python -m benchmarks.triage_queue --pending 100000 --pops 200
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.main import app
+from app.models import Appointment
+from app.triage import SEVERITIES, triage_key
+from benchmarks import seed
+from benchmarks.common import asgi_client, report, summarize, timed_request
+
+DOCTOR = "bench-d-1@bench.example.com"
+COLLEAGUE = "bench-d-6@bench.example.com"  # same department as bench-d-1
+
+
+def seed_queue(doctor_id, pending, patient_ids, code_prefix, rng):
+    """``pending`` pending appointments for a doctor, arrived over the last three days"""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        for batch_start in range(0, pending, seed.BATCH):
+            rows = []
+            for g in range(batch_start, min(batch_start + seed.BATCH, pending)):
+                created_at = now - timedelta(seconds=rng.randrange(3 * 86400))
+                severity = rng.choice(SEVERITIES)
+                rows.append({
+                    "id": uuid.uuid4(),
+                    "appointment_code": f"{code_prefix}{g:07X}",
+                    "patient_id": patient_ids[g % len(patient_ids)],
+                    "doctor_id": doctor_id,
+                    "problem": seed.PROBLEMS[g % 5],
+                    "status": "pending",
+                    "severity": severity,
+                    "triage_key": triage_key(created_at, severity),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+            conn.execute(insert(Appointment), rows)
+
+
+async def python_sorted_queue(doctor_id):
+    """The queue without the index: every pending row loaded and sorted here"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Appointment.id, Appointment.severity, Appointment.created_at)
+            .where(Appointment.doctor_id == doctor_id, Appointment.status == "pending")
+        )
+        rows = result.all()
+    return sorted(rows, key=lambda row: (triage_key(row.created_at, row.severity), row.id))[:20]
+
+
+def in_triage_order(appointments):
+    keys = [triage_key(datetime.fromisoformat(item["created_at"]), item["severity"]) for item in appointments]
+    return all(earlier <= later for earlier, later in zip(keys, keys[1:]))
+
+
+async def run(doctor_id, requests, pops, concurrency):
+    results = {}
+    async with asgi_client(app) as client:
+        response = await client.post("/api/auth/login/doctor", json={"email": DOCTOR, "password": seed.BENCH_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        semaphore = asyncio.Semaphore(concurrency)
+        department = seed.DEPARTMENTS[1]
+
+        for name, params in (("doctor_queue", {}), ("department_queue", {"department": department})):
+            latencies = []
+
+            async def one():
+                async with semaphore:
+                    await timed_request(client, "GET", "/api/appointments/queue", latencies, headers=headers, params=params)
+
+            sample = (await client.get("/api/appointments/queue", headers=headers, params=params)).json()
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            results[name] = {
+                **summarize(latencies, time.perf_counter() - start),
+                "in_triage_order": in_triage_order(sample),
+                "head_severity": sample[0]["severity"] if sample else None,
+            }
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(20):
+            batch_start = time.perf_counter()
+            await python_sorted_queue(doctor_id)
+            latencies.append(time.perf_counter() - batch_start)
+        results["python_sort_baseline"] = summarize(latencies, time.perf_counter() - start)
+
+        # One doctor taking patients one after another
+        latencies, popped = [], []
+        start = time.perf_counter()
+        for _ in range(pops):
+            response = await timed_request(client, "POST", "/api/appointments/queue/next", latencies, headers=headers)
+            popped.append(response.json())
+        results["pop_sequential"] = {
+            **summarize(latencies, time.perf_counter() - start),
+            "in_triage_order": in_triage_order(popped),
+        }
+
+        # Several tabs/workers popping at once must never get the same patient
+        latencies = []
+
+        async def pop():
+            async with semaphore:
+                return await timed_request(client, "POST", "/api/appointments/queue/next", latencies, headers=headers)
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(pop() for _ in range(pops)))
+        ids = [response.json()["id"] for response in responses if response.status_code == 200]
+        results["pop_concurrent"] = {
+            **summarize(latencies, time.perf_counter() - start),
+            "popped": len(ids),
+            "duplicates": len(ids) - len(set(ids)),
+            "errors": sum(response.status_code != 200 for response in responses),
+        }
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pending", type=int, default=100000, help="pending appointments in the doctor's queue")
+    parser.add_argument("--requests", type=int, default=300, help="queue reads per kind")
+    parser.add_argument("--pops", type=int, default=200, help="pops per mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    seed.seed(patients=1000, doctors=10, appointments=0)
+    try:
+        with engine.connect() as conn:
+            patient_ids = [uuid.UUID(str(row.id)) for row in conn.execute(
+                select(seed.Patient.id).where(seed.Patient.contact.like("bench-p-%"))
+            )]
+            doctors = {row.email: uuid.UUID(str(row.id)) for row in conn.execute(
+                select(seed.Doctor.id, seed.Doctor.email).where(seed.Doctor.email.in_([DOCTOR, COLLEAGUE]))
+            )}
+        start = time.perf_counter()
+        seed_queue(doctors[DOCTOR], args.pending, patient_ids, "BQ", rng)
+        seed_queue(doctors[COLLEAGUE], args.pending // 10, patient_ids, "BR", rng)
+        seed_seconds = round(time.perf_counter() - start, 2)
+        results = asyncio.run(run(doctors[DOCTOR], args.requests, args.pops, args.concurrency))
+    finally:
+        if not args.keep:
+            seed.clear()
+    report("triage_queue", {"pending": args.pending, "seed_seconds": seed_seconds, **results})
+
+
+if __name__ == "__main__":
+    main()
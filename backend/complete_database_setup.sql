@@ -21,6 +21,8 @@ SET row_security = off;
 -- ========================================================
 
 CREATE EXTENSION IF NOT EXISTS pgcrypto WITH SCHEMA public;
+CREATE EXTENSION IF NOT EXISTS btree_gist WITH SCHEMA public;
+CREATE EXTENSION IF NOT EXISTS btree_gin WITH SCHEMA public;
 COMMENT ON EXTENSION pgcrypto IS 'cryptographic functions';
 
 -- ========================================================
@@ -93,7 +95,8 @@ CREATE TABLE public.doctors (
     department text,
     experience text,
     bio text,
-    created_at timestamp with time zone DEFAULT now() NOT NULL
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL
 );
 
 ALTER TABLE public.doctors OWNER TO postgres;
@@ -108,10 +111,98 @@ ALTER TABLE ONLY public.doctors
 -- Add index for email
 CREATE INDEX doctors_email_idx ON public.doctors USING btree (email);
 
+-- Keyset pagination index for the doctor directory
+CREATE INDEX doctors_created_id_idx ON public.doctors USING btree (created_at, id);
+
+-- max(updated_at) versions the doctor directory for ETags
+CREATE INDEX doctors_updated_at_idx ON public.doctors USING btree (updated_at);
+
+-- Doctor search: trigram/prefix name matching and facet filters
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX doctors_name_trgm_idx ON public.doctors USING gin (lower(name) gin_trgm_ops);
+CREATE INDEX doctors_specialization_idx ON public.doctors USING btree (specialization);
+CREATE INDEX doctors_department_idx ON public.doctors USING btree (department);
+
+-- Keep updated_at current on profile edits
+CREATE TRIGGER trg_doctors_updated_at BEFORE UPDATE ON public.doctors FOR EACH ROW EXECUTE FUNCTION public.appointments_set_updated_at();
+
+-- ========================================================
+-- DOCTOR SCHEDULES TABLE
+-- ========================================================
+
+-- Weekly working hours (clinic local time), split into slots of slot_minutes
+CREATE TABLE public.doctor_schedules (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    doctor_id uuid NOT NULL,
+    weekday smallint NOT NULL,
+    start_time time without time zone NOT NULL,
+    end_time time without time zone NOT NULL,
+    slot_minutes integer DEFAULT 30 NOT NULL,
+    CONSTRAINT doctor_schedules_weekday_check CHECK (weekday BETWEEN 0 AND 6),
+    CONSTRAINT doctor_schedules_hours_check CHECK (end_time > start_time),
+    CONSTRAINT doctor_schedules_slot_minutes_check CHECK (slot_minutes > 0)
+);
+
+ALTER TABLE public.doctor_schedules OWNER TO postgres;
+
+ALTER TABLE ONLY public.doctor_schedules
+    ADD CONSTRAINT doctor_schedules_pkey PRIMARY KEY (id);
+
+ALTER TABLE ONLY public.doctor_schedules
+    ADD CONSTRAINT doctor_schedules_doctor_weekday_start_key UNIQUE (doctor_id, weekday, start_time);
+
+ALTER TABLE ONLY public.doctor_schedules
+    ADD CONSTRAINT doctor_schedules_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE CASCADE;
+
 -- ========================================================
 -- APPOINTMENTS TABLE
 -- ========================================================
 
+-- The trigger and partition functions below use unqualified table names
+SELECT pg_catalog.set_config('search_path', 'public', false);
+
+-- Monthly partitions <parent>_YYYY_MM (bounds in UTC) for ``months`` months
+-- from first_month; app/partitions.py keeps months ahead of today ready. A
+-- month whose rows already sit in the default partition is skipped
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent regclass, first_month date, months integer) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    month date;
+    lower_bound timestamp with time zone;
+    upper_bound timestamp with time zone;
+    partition_name text;
+    occupied boolean;
+    created integer := 0;
+BEGIN
+    -- One caller at a time (several workers check on startup)
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_monthly_partitions'));
+    FOR i IN 0 .. months - 1 LOOP
+        month := (date_trunc('month', first_month) + make_interval(months => i))::date;
+        partition_name := format('%s_%s', parent::text, to_char(month, 'YYYY_MM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        lower_bound := month::timestamp AT TIME ZONE 'UTC';
+        upper_bound := (month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+        IF to_regclass(parent::text || '_default') IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE created_at >= %L AND created_at < %L)',
+                           parent::text || '_default', lower_bound, upper_bound)
+            INTO occupied;
+            IF occupied THEN
+                RAISE WARNING 'rows for % are in the default partition; not creating %', month, partition_name;
+                CONTINUE;
+            END IF;
+        END IF;
+        EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, parent, lower_bound, upper_bound);
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END
+$$;
+
+-- Range partitioned by month of created_at; primary key and every unique
+-- index must include it, so appointment codes and held slots are unique
+-- through the registries below instead
 CREATE TABLE public.appointments (
     id uuid DEFAULT gen_random_uuid() NOT NULL,
     appointment_code text DEFAULT ('APT-'::text || substring(gen_random_uuid()::text, 1, 8)) NOT NULL,
@@ -122,34 +213,279 @@ CREATE TABLE public.appointments (
     severity text,
     duration text,
     medical_history text,
+    cancellation_reason text,
+    slot_start timestamp with time zone,
+    slot_end timestamp with time zone,
+    triage_key timestamp with time zone,
     created_at timestamp with time zone DEFAULT now() NOT NULL,
-    updated_at timestamp with time zone DEFAULT now() NOT NULL
-);
+    updated_at timestamp with time zone DEFAULT now() NOT NULL,
+    -- Text search (problem weighted A, medical history B), same on both tables
+    search_vector tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(problem, '')), 'A') || setweight(to_tsvector('english', coalesce(medical_history, '')), 'B')) STORED
+) PARTITION BY RANGE (created_at);
 
 ALTER TABLE public.appointments OWNER TO postgres;
 
 -- Add constraints
 ALTER TABLE ONLY public.appointments
-    ADD CONSTRAINT appointments_pkey PRIMARY KEY (id);
+    ADD CONSTRAINT appointments_pkey PRIMARY KEY (id, created_at);
 
-ALTER TABLE ONLY public.appointments
-    ADD CONSTRAINT appointments_appointment_code_key UNIQUE (appointment_code);
+-- Rows outside every monthly partition, then this month and three ahead
+CREATE TABLE public.appointments_default PARTITION OF public.appointments DEFAULT;
+SELECT public.ensure_monthly_partitions('public.appointments', current_date, 4);
 
 -- Add indexes
 CREATE INDEX appointments_patient_idx ON public.appointments USING btree (patient_id);
 CREATE INDEX appointments_doctor_idx ON public.appointments USING btree (doctor_id);
 CREATE INDEX appointments_code_idx ON public.appointments USING btree (appointment_code);
 
+-- Keyset pagination indexes (lists are ordered by created_at, id)
+CREATE INDEX appointments_created_id_idx ON public.appointments USING btree (created_at, id);
+CREATE INDEX appointments_patient_created_idx ON public.appointments USING btree (patient_id, created_at, id);
+CREATE INDEX appointments_doctor_created_idx ON public.appointments USING btree (doctor_id, created_at, id);
+
+-- Status-filtered queue indexes (e.g. a doctor's pending appointments)
+CREATE INDEX appointments_doctor_status_created_idx ON public.appointments USING btree (doctor_id, status, created_at, id);
+CREATE INDEX appointments_patient_status_created_idx ON public.appointments USING btree (patient_id, status, created_at, id);
+
+-- Triage queues: pending appointments by triage_key (created_at minus the severity head start)
+CREATE INDEX appointments_doctor_status_triage_idx ON public.appointments USING btree (doctor_id, status, triage_key, id);
+CREATE INDEX appointments_status_triage_idx ON public.appointments USING btree (status, triage_key, id);
+
+-- Text search within a doctor's appointments (/api/appointments/search)
+CREATE INDEX appointments_doctor_search_idx ON public.appointments USING gin (doctor_id, search_vector);
+
 -- Add foreign keys
-ALTER TABLE ONLY public.appointments
+ALTER TABLE public.appointments
     ADD CONSTRAINT appointments_patient_id_fkey FOREIGN KEY (patient_id) REFERENCES public.patients(id) ON DELETE CASCADE;
 
-ALTER TABLE ONLY public.appointments
+ALTER TABLE public.appointments
     ADD CONSTRAINT appointments_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE SET NULL;
 
 -- Add trigger
 CREATE TRIGGER trg_appointments_updated_at BEFORE UPDATE ON public.appointments FOR EACH ROW EXECUTE FUNCTION public.appointments_set_updated_at();
 
+-- ========================================================
+-- APPOINTMENTS ARCHIVE
+-- ========================================================
+
+-- Closed appointments moved out of appointments by the archive job
+-- (python -m app.partitions --archive), same columns and partitioning but
+-- only the history indexes
+CREATE TABLE public.appointments_archive (
+    id uuid NOT NULL,
+    appointment_code text NOT NULL,
+    patient_id uuid NOT NULL,
+    doctor_id uuid,
+    problem text NOT NULL,
+    status text NOT NULL,
+    severity text,
+    duration text,
+    medical_history text,
+    cancellation_reason text,
+    slot_start timestamp with time zone,
+    slot_end timestamp with time zone,
+    triage_key timestamp with time zone,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL,
+    -- Text search (problem weighted A, medical history B), same on both tables
+    search_vector tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(problem, '')), 'A') || setweight(to_tsvector('english', coalesce(medical_history, '')), 'B')) STORED
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE public.appointments_archive OWNER TO postgres;
+
+ALTER TABLE ONLY public.appointments_archive
+    ADD CONSTRAINT appointments_archive_pkey PRIMARY KEY (id, created_at);
+
+CREATE TABLE public.appointments_archive_default PARTITION OF public.appointments_archive DEFAULT;
+
+-- Same definitions as on appointments, so a whole month moves over keeping them
+CREATE INDEX appointments_archive_patient_created_idx ON public.appointments_archive USING btree (patient_id, created_at, id);
+CREATE INDEX appointments_archive_doctor_created_idx ON public.appointments_archive USING btree (doctor_id, created_at, id);
+CREATE INDEX appointments_archive_doctor_search_idx ON public.appointments_archive USING gin (doctor_id, search_vector);
+
+ALTER TABLE public.appointments_archive
+    ADD CONSTRAINT appointments_archive_patient_id_fkey FOREIGN KEY (patient_id) REFERENCES public.patients(id) ON DELETE CASCADE;
+
+ALTER TABLE public.appointments_archive
+    ADD CONSTRAINT appointments_archive_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE SET NULL;
+
+-- ========================================================
+-- APPOINTMENT CODE AND SLOT REGISTRIES
+-- ========================================================
+
+-- Every appointment code in use, live or archived, and where its row is
+CREATE TABLE public.appointment_codes (
+    appointment_code text NOT NULL,
+    appointment_id uuid NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    CONSTRAINT appointment_codes_pkey PRIMARY KEY (appointment_code)
+);
+
+-- Slots held by live appointments: no double booking, no overlapping slots
+CREATE TABLE public.appointment_slots (
+    doctor_id uuid NOT NULL,
+    slot_start timestamp with time zone NOT NULL,
+    slot_end timestamp with time zone NOT NULL,
+    appointment_id uuid NOT NULL,
+    CONSTRAINT appointment_slots_pkey PRIMARY KEY (doctor_id, slot_start),
+    CONSTRAINT appointment_slots_doctor_excl EXCLUDE USING gist (doctor_id WITH =, tstzrange(slot_start, slot_end) WITH &&)
+);
+
+CREATE INDEX appointment_slots_appointment_idx ON public.appointment_slots USING btree (appointment_id);
+CREATE INDEX appointment_slots_end_idx ON public.appointment_slots USING btree (slot_end);
+
+-- An insert claims its slot, then its code, and is skipped when either is
+-- taken (the app reads that like ON CONFLICT DO NOTHING)
+CREATE OR REPLACE FUNCTION appointment_claim_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id)
+        ON CONFLICT DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    INSERT INTO appointment_codes (appointment_code, appointment_id, created_at)
+    VALUES (NEW.appointment_code, NEW.id, NEW.created_at)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        DELETE FROM appointment_slots WHERE appointment_id = NEW.id;
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+-- Status, slot or code changes update the claims; a delete gives them back,
+-- except the code of a row that has just been copied to the archive
+CREATE OR REPLACE FUNCTION appointment_sync_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_slots WHERE appointment_id = OLD.id;
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM appointments_archive WHERE id = OLD.id AND created_at = OLD.created_at) THEN
+            DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF NEW.appointment_code <> OLD.appointment_code THEN
+        UPDATE appointment_codes SET appointment_code = NEW.appointment_code WHERE appointment_code = OLD.appointment_code;
+    END IF;
+    -- Fails the update (unique or exclusion violation) if the new slot is taken
+    IF NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION appointment_archive_release_code() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER trg_appointments_claim_keys BEFORE INSERT ON public.appointments
+    FOR EACH ROW EXECUTE FUNCTION appointment_claim_keys();
+CREATE TRIGGER trg_appointments_keys_update AFTER UPDATE ON public.appointments
+    FOR EACH ROW WHEN (OLD.appointment_code IS DISTINCT FROM NEW.appointment_code OR OLD.doctor_id IS DISTINCT FROM NEW.doctor_id
+                       OR OLD.slot_start IS DISTINCT FROM NEW.slot_start OR OLD.slot_end IS DISTINCT FROM NEW.slot_end
+                       OR (OLD.status = 'cancelled') IS DISTINCT FROM (NEW.status = 'cancelled'))
+    EXECUTE FUNCTION appointment_sync_keys();
+CREATE TRIGGER trg_appointments_keys_delete AFTER DELETE ON public.appointments
+    FOR EACH ROW EXECUTE FUNCTION appointment_sync_keys();
+CREATE TRIGGER trg_appointments_archive_release_code AFTER DELETE ON public.appointments_archive
+    FOR EACH ROW EXECUTE FUNCTION appointment_archive_release_code();
+
+-- ========================================================
+-- DASHBOARD STATS TABLES
+-- ========================================================
+
+-- Appointments per doctor, creation day (UTC) and status, and per doctor and
+-- status overall. Kept by the triggers below; no foreign key to doctors, since
+-- deleting a doctor counts its appointments down through the update trigger
+CREATE TABLE public.appointment_daily_stats (
+    doctor_id uuid NOT NULL,
+    day date NOT NULL,
+    status text NOT NULL,
+    appointments integer DEFAULT 0 NOT NULL,
+    PRIMARY KEY (doctor_id, day, status)
+);
+
+CREATE TABLE public.appointment_status_totals (
+    doctor_id uuid NOT NULL,
+    status text NOT NULL,
+    appointments integer DEFAULT 0 NOT NULL,
+    PRIMARY KEY (doctor_id, status)
+);
+
+-- One aggregated counter upsert per statement, from its transition tables
+CREATE OR REPLACE FUNCTION appointment_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Rows the archive job copied to appointments_archive stay counted
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows
+                         WHERE NOT EXISTS (SELECT 1 FROM appointments_archive AS archived
+                                           WHERE archived.id = old_rows.id AND archived.created_at = old_rows.created_at)),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSE
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows UNION ALL SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER trg_appointments_stats_insert AFTER INSERT ON public.appointments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_update AFTER UPDATE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_delete AFTER DELETE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+
 -- ========================================================
 -- SAMPLE DATA - PATIENTS
 -- ========================================================
@@ -180,6 +516,9 @@ ON CONFLICT DO NOTHING;
 -- SAMPLE DATA - APPOINTMENTS
 -- ========================================================
 
+-- The sample appointments are from December 2025
+SELECT public.ensure_monthly_partitions('public.appointments', DATE '2025-12-01', 1);
+
 INSERT INTO public.appointments (id, appointment_code, patient_id, doctor_id, problem, status, severity, duration, medical_history, created_at, updated_at) VALUES
 ('51a97223-0399-4a91-a547-a22ec57822c6', 'KQQHWZLU', 'f2f6401b-92a4-4d17-a133-7c3999a10ca6', 'ed226719-18cd-41ec-bae7-9914d3e729bb', 'Headache and fever', 'pending', NULL, NULL, NULL, '2025-12-11 01:04:04.937478+05', '2025-12-11 01:04:04.937478+05'),
 ('061c1a7b-33f9-4140-bdcd-ac3cad7c0898', 'AGOCK6QZ', 'f2f6401b-92a4-4d17-a133-7c3999a10ca6', 'ed226719-18cd-41ec-bae7-9914d3e729bb', 'Heart palpitations', 'pending', NULL, NULL, NULL, '2025-12-11 01:09:09.171064+05', '2025-12-11 01:09:09.171064+05'),
@@ -0,0 +1,18 @@
+-- ========================================================
+-- MIGRATION 001 - KEYSET PAGINATION INDEXES
+-- Lists are ordered by (created_at, id) and paged with cursors.
+-- Run with: psql -d projectdb -f migrations/001_keyset_pagination_indexes.sql
+-- (CONCURRENTLY cannot run inside a transaction block)
+-- ========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS doctors_created_id_idx
+    ON public.doctors USING btree (created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_created_id_idx
+    ON public.appointments USING btree (created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_patient_created_idx
+    ON public.appointments USING btree (patient_id, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_doctor_created_idx
+    ON public.appointments USING btree (doctor_id, created_at, id);
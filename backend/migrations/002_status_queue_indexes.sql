@@ -0,0 +1,16 @@
+-- ========================================================
+-- MIGRATION 002 - STATUS QUEUE INDEXES
+-- Backs the status/severity/date filters on the appointment list endpoints.
+-- A doctor's pending queue (doctor_id = ? AND status = 'pending'
+-- ORDER BY created_at, id) is served straight from the index with no sort.
+-- Run with: psql -d projectdb -f migrations/002_status_queue_indexes.sql
+-- ========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_doctor_status_created_idx
+    ON public.appointments USING btree (doctor_id, status, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_patient_status_created_idx
+    ON public.appointments USING btree (patient_id, status, created_at, id);
+
+-- Keep the visibility map fresh so queue scans can stay index-only
+ANALYZE public.appointments;
@@ -0,0 +1,17 @@
+-- ========================================================
+-- MIGRATION 003 - DOCTOR UPDATED_AT
+-- Doctors get an updated_at version column like appointments. ETags on
+-- /api/doctors, /api/doctors/me and appointment reads are derived from it.
+-- Run with: psql -d projectdb -f migrations/003_doctor_updated_at.sql
+-- ========================================================
+
+ALTER TABLE public.doctors
+    ADD COLUMN IF NOT EXISTS updated_at timestamp with time zone DEFAULT now() NOT NULL;
+
+-- Same trigger function as appointments: sets NEW.updated_at = now()
+DROP TRIGGER IF EXISTS trg_doctors_updated_at ON public.doctors;
+CREATE TRIGGER trg_doctors_updated_at BEFORE UPDATE ON public.doctors
+    FOR EACH ROW EXECUTE FUNCTION public.appointments_set_updated_at();
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS doctors_updated_at_idx
+    ON public.doctors USING btree (updated_at);
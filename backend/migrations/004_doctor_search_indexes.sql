@@ -0,0 +1,20 @@
+-- ========================================================
+-- MIGRATION 004 - DOCTOR SEARCH INDEXES
+-- /api/doctors/search matches names by word prefix (LIKE 'q%' / '% q%')
+-- or trigram similarity (%), both served by a GIN pg_trgm index on
+-- lower(name); specialization/department facets filter by equality.
+-- Run with: psql -d projectdb -f migrations/004_doctor_search_indexes.sql
+-- ========================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS doctors_name_trgm_idx
+    ON public.doctors USING gin (lower(name) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS doctors_specialization_idx
+    ON public.doctors USING btree (specialization);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS doctors_department_idx
+    ON public.doctors USING btree (department);
+
+ANALYZE public.doctors;
@@ -0,0 +1,43 @@
+-- ========================================================
+-- MIGRATION 005 - TIME SLOTS
+-- Doctors get weekly working-hours templates (doctor_schedules) and
+-- appointments may reserve a slot (slot_start, slot_end). Double booking
+-- is impossible at the database level: a partial unique index on
+-- (doctor_id, slot_start) is the INSERT ... ON CONFLICT target, and an
+-- exclusion constraint rejects any overlapping live slots of a doctor.
+-- Cancelled appointments release their slot.
+-- Run with: psql -d projectdb -f migrations/005_time_slots.sql
+-- ========================================================
+
+-- Lets the exclusion constraint combine uuid equality with range overlap
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS public.doctor_schedules (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    doctor_id uuid NOT NULL,
+    weekday smallint NOT NULL,
+    start_time time without time zone NOT NULL,
+    end_time time without time zone NOT NULL,
+    slot_minutes integer DEFAULT 30 NOT NULL,
+    CONSTRAINT doctor_schedules_pkey PRIMARY KEY (id),
+    CONSTRAINT doctor_schedules_doctor_weekday_start_key UNIQUE (doctor_id, weekday, start_time),
+    CONSTRAINT doctor_schedules_weekday_check CHECK (weekday BETWEEN 0 AND 6),
+    CONSTRAINT doctor_schedules_hours_check CHECK (end_time > start_time),
+    CONSTRAINT doctor_schedules_slot_minutes_check CHECK (slot_minutes > 0),
+    CONSTRAINT doctor_schedules_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE CASCADE
+);
+
+ALTER TABLE public.appointments
+    ADD COLUMN IF NOT EXISTS slot_start timestamp with time zone,
+    ADD COLUMN IF NOT EXISTS slot_end timestamp with time zone;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS appointments_doctor_slot_key
+    ON public.appointments USING btree (doctor_id, slot_start)
+    WHERE status <> 'cancelled' AND slot_start IS NOT NULL;
+
+ALTER TABLE public.appointments
+    ADD CONSTRAINT appointments_doctor_slot_excl
+    EXCLUDE USING gist (doctor_id WITH =, tstzrange(slot_start, slot_end) WITH &&)
+    WHERE (status <> 'cancelled' AND slot_start IS NOT NULL);
+
+ANALYZE public.doctor_schedules;
@@ -0,0 +1,46 @@
+-- ========================================================
+-- MIGRATION 006 - TRIAGE QUEUE
+-- Pending appointments are served in triage order: time waited plus a
+-- head start for the (normalised) severity. Because everyone ages at the
+-- same rate the order is fixed, stored as triage_key = created_at - head
+-- start, and read in index order by /api/appointments/queue and
+-- /api/appointments/queue/next. The head starts below must match
+-- TRIAGE_HEAD_START_MINUTES (defaults: moderate 60, severe 240 minutes).
+-- Run with: psql -d projectdb -f migrations/006_triage_queue.sql
+-- ========================================================
+
+ALTER TABLE public.appointments
+    ADD COLUMN IF NOT EXISTS triage_key timestamp with time zone;
+
+-- Normalise existing severities the way new bookings are (app/triage.py)
+UPDATE public.appointments
+SET severity = CASE lower(btrim(severity))
+        WHEN 'low' THEN 'mild'
+        WHEN 'minor' THEN 'mild'
+        WHEN 'medium' THEN 'moderate'
+        WHEN 'high' THEN 'severe'
+        WHEN 'critical' THEN 'severe'
+        WHEN 'urgent' THEN 'severe'
+        WHEN 'emergency' THEN 'severe'
+        WHEN 'mild' THEN 'mild'
+        WHEN 'moderate' THEN 'moderate'
+        WHEN 'severe' THEN 'severe'
+        ELSE severity
+    END
+WHERE severity IS NOT NULL;
+
+UPDATE public.appointments
+SET triage_key = created_at - CASE severity
+        WHEN 'severe' THEN interval '240 minutes'
+        WHEN 'moderate' THEN interval '60 minutes'
+        ELSE interval '0'
+    END
+WHERE triage_key IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_doctor_status_triage_idx
+    ON public.appointments USING btree (doctor_id, status, triage_key, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS appointments_status_triage_idx
+    ON public.appointments USING btree (status, triage_key, id);
+
+ANALYZE public.appointments;
@@ -0,0 +1,106 @@
+-- ========================================================
+-- MIGRATION 007 - DASHBOARD STATS
+-- Per-doctor appointment counts by status (all time) and by creation day
+-- (UTC), kept by statement-level triggers on appointments in the same
+-- transaction as every insert, status change and delete. Read by
+-- /api/appointments/stats instead of COUNT ... GROUP BY over appointments.
+-- The function must match POSTGRES_STATS_FUNCTION in app/models.py.
+-- Run with: psql -d projectdb -f migrations/007_dashboard_stats.sql
+-- ========================================================
+
+CREATE TABLE IF NOT EXISTS public.appointment_daily_stats (
+    doctor_id uuid NOT NULL,
+    day date NOT NULL,
+    status text NOT NULL,
+    appointments integer DEFAULT 0 NOT NULL,
+    PRIMARY KEY (doctor_id, day, status)
+);
+
+CREATE TABLE IF NOT EXISTS public.appointment_status_totals (
+    doctor_id uuid NOT NULL,
+    status text NOT NULL,
+    appointments integer DEFAULT 0 NOT NULL,
+    PRIMARY KEY (doctor_id, status)
+);
+
+CREATE OR REPLACE FUNCTION appointment_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSE
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows UNION ALL SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Writes wait while the triggers go in and the counters are filled, so no
+-- appointment is counted twice or missed
+BEGIN;
+LOCK TABLE public.appointments IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trg_appointments_stats_insert ON public.appointments;
+DROP TRIGGER IF EXISTS trg_appointments_stats_update ON public.appointments;
+DROP TRIGGER IF EXISTS trg_appointments_stats_delete ON public.appointments;
+CREATE TRIGGER trg_appointments_stats_insert AFTER INSERT ON public.appointments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_update AFTER UPDATE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_delete AFTER DELETE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+
+TRUNCATE public.appointment_daily_stats, public.appointment_status_totals;
+
+INSERT INTO public.appointment_daily_stats (doctor_id, day, status, appointments)
+SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date, status, count(*)
+FROM public.appointments
+WHERE doctor_id IS NOT NULL
+GROUP BY 1, 2, 3;
+
+INSERT INTO public.appointment_status_totals (doctor_id, status, appointments)
+SELECT doctor_id, status, count(*)
+FROM public.appointments
+WHERE doctor_id IS NOT NULL
+GROUP BY 1, 2;
+
+COMMIT;
+
+ANALYZE public.appointment_daily_stats;
+ANALYZE public.appointment_status_totals;
@@ -0,0 +1,319 @@
+-- ========================================================
+-- MIGRATION 008 - PARTITIONED APPOINTMENTS AND ARCHIVE
+-- appointments becomes range partitioned by month of created_at
+-- (appointments_YYYY_MM, bounds in UTC, plus appointments_default), with
+-- primary key (id, created_at). Closed appointments older than
+-- ARCHIVE_AFTER_MONTHS move to appointments_archive, partitioned the same way
+-- and only indexed for history (python -m app.partitions --archive).
+-- Unique indexes on a partitioned table must include created_at, so code
+-- uniqueness and no double booking move to two registries, appointment_codes
+-- and appointment_slots, claimed by a BEFORE INSERT trigger that skips the
+-- row when either is taken (the app reads that as ON CONFLICT DO NOTHING).
+-- Functions and triggers must match app/models.py (POSTGRES_PARTITION_FUNCTION,
+-- POSTGRES_KEYS_FUNCTIONS, POSTGRES_STATS_FUNCTION). Needs Postgres 13+.
+-- Rewrites the table: run in a maintenance window, the app stopped.
+-- Run with: psql -d projectdb -f migrations/008_partitioned_appointments.sql
+-- ========================================================
+
+-- Monthly partitions <parent>_YYYY_MM for ``months`` months from first_month;
+-- a month whose rows already sit in the default partition is skipped
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent regclass, first_month date, months integer) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    month date;
+    lower_bound timestamp with time zone;
+    upper_bound timestamp with time zone;
+    partition_name text;
+    occupied boolean;
+    created integer := 0;
+BEGIN
+    -- One caller at a time (several workers check on startup)
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_monthly_partitions'));
+    FOR i IN 0 .. months - 1 LOOP
+        month := (date_trunc('month', first_month) + make_interval(months => i))::date;
+        partition_name := format('%s_%s', parent::text, to_char(month, 'YYYY_MM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        lower_bound := month::timestamp AT TIME ZONE 'UTC';
+        upper_bound := (month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+        IF to_regclass(parent::text || '_default') IS NOT NULL THEN
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE created_at >= %L AND created_at < %L)',
+                           parent::text || '_default', lower_bound, upper_bound)
+            INTO occupied;
+            IF occupied THEN
+                RAISE WARNING 'rows for % are in the default partition; not creating %', month, partition_name;
+                CONTINUE;
+            END IF;
+        END IF;
+        EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, parent, lower_bound, upper_bound);
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION appointment_claim_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id)
+        ON CONFLICT DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    INSERT INTO appointment_codes (appointment_code, appointment_id, created_at)
+    VALUES (NEW.appointment_code, NEW.id, NEW.created_at)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        DELETE FROM appointment_slots WHERE appointment_id = NEW.id;
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION appointment_sync_keys() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_slots WHERE appointment_id = OLD.id;
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM appointments_archive WHERE id = OLD.id AND created_at = OLD.created_at) THEN
+            DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF NEW.appointment_code <> OLD.appointment_code THEN
+        UPDATE appointment_codes SET appointment_code = NEW.appointment_code WHERE appointment_code = OLD.appointment_code;
+    END IF;
+    -- Fails the update (unique or exclusion violation) if the new slot is taken
+    IF NEW.slot_start IS NOT NULL AND NEW.status <> 'cancelled' AND NEW.doctor_id IS NOT NULL THEN
+        INSERT INTO appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+        VALUES (NEW.doctor_id, NEW.slot_start, NEW.slot_end, NEW.id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION appointment_archive_release_code() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    DELETE FROM appointment_codes WHERE appointment_code = OLD.appointment_code;
+    RETURN NULL;
+END
+$$;
+
+-- Archived appointments stay counted: the archive job copies a row before
+-- deleting it, and such deletes are left out of the counters
+CREATE OR REPLACE FUNCTION appointment_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows
+                         WHERE NOT EXISTS (SELECT 1 FROM appointments_archive AS archived
+                                           WHERE archived.id = old_rows.id AND archived.created_at = old_rows.created_at)),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    ELSE
+        WITH changes AS (SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, 1 AS delta FROM new_rows UNION ALL SELECT doctor_id, (created_at AT TIME ZONE 'UTC')::date AS day, status, -1 AS delta FROM old_rows),
+        daily AS (
+            INSERT INTO appointment_daily_stats AS counter (doctor_id, day, status, appointments)
+            SELECT doctor_id, day, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+            GROUP BY doctor_id, day, status HAVING sum(delta) <> 0 ORDER BY doctor_id, day, status
+            ON CONFLICT (doctor_id, day, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments
+        )
+        INSERT INTO appointment_status_totals AS counter (doctor_id, status, appointments)
+        SELECT doctor_id, status, sum(delta) FROM changes WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, status HAVING sum(delta) <> 0 ORDER BY doctor_id, status
+        ON CONFLICT (doctor_id, status) DO UPDATE SET appointments = counter.appointments + EXCLUDED.appointments;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+BEGIN;
+LOCK TABLE public.appointments IN ACCESS EXCLUSIVE MODE;
+
+-- The old table and its index/constraint names make way for the new ones
+ALTER TABLE public.appointments ADD COLUMN IF NOT EXISTS cancellation_reason text;
+ALTER TABLE public.appointments RENAME TO appointments_old;
+DROP TRIGGER IF EXISTS trg_appointments_updated_at ON public.appointments_old;
+DROP TRIGGER IF EXISTS trg_appointments_stats_insert ON public.appointments_old;
+DROP TRIGGER IF EXISTS trg_appointments_stats_update ON public.appointments_old;
+DROP TRIGGER IF EXISTS trg_appointments_stats_delete ON public.appointments_old;
+DO $$
+DECLARE
+    index_name text;
+BEGIN
+    FOR index_name IN
+        SELECT indexrelid::regclass::text FROM pg_index
+        WHERE indrelid = 'public.appointments_old'::regclass
+          AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = 'public.appointments_old'::regclass)
+    LOOP
+        EXECUTE format('ALTER INDEX %s RENAME TO %I', index_name, index_name || '_old');
+    END LOOP;
+END
+$$;
+ALTER TABLE public.appointments_old DROP CONSTRAINT IF EXISTS appointments_doctor_slot_excl;
+ALTER TABLE public.appointments_old RENAME CONSTRAINT appointments_pkey TO appointments_old_pkey;
+
+CREATE TABLE public.appointments (
+    id uuid DEFAULT gen_random_uuid() NOT NULL,
+    appointment_code text DEFAULT ('APT-'::text || substring(gen_random_uuid()::text, 1, 8)) NOT NULL,
+    patient_id uuid NOT NULL,
+    doctor_id uuid,
+    problem text NOT NULL,
+    severity text,
+    duration text,
+    medical_history text,
+    status text DEFAULT 'pending'::text NOT NULL,
+    cancellation_reason text,
+    slot_start timestamp with time zone,
+    slot_end timestamp with time zone,
+    triage_key timestamp with time zone,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL,
+    CONSTRAINT appointments_pkey PRIMARY KEY (id, created_at),
+    CONSTRAINT appointments_patient_id_fkey FOREIGN KEY (patient_id) REFERENCES public.patients(id) ON DELETE CASCADE,
+    CONSTRAINT appointments_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE SET NULL
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE public.appointments_default PARTITION OF public.appointments DEFAULT;
+
+-- Every month from the oldest appointment to three months ahead
+SELECT ensure_monthly_partitions('public.appointments', first_month,
+       ((extract(year FROM current_date) - extract(year FROM first_month)) * 12
+        + extract(month FROM current_date) - extract(month FROM first_month))::integer + 4)
+FROM (SELECT coalesce(min(created_at) AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC')::date AS first_month
+      FROM public.appointments_old) AS oldest;
+
+INSERT INTO public.appointments (id, appointment_code, patient_id, doctor_id, problem, severity, duration,
+                                 medical_history, status, cancellation_reason, slot_start, slot_end,
+                                 triage_key, created_at, updated_at)
+SELECT id, appointment_code, patient_id, doctor_id, problem, severity, duration,
+       medical_history, status, cancellation_reason, slot_start, slot_end,
+       triage_key, created_at, updated_at
+FROM public.appointments_old;
+
+-- Indexes after the copy (created on every partition)
+CREATE INDEX appointments_patient_idx ON public.appointments USING btree (patient_id);
+CREATE INDEX appointments_doctor_idx ON public.appointments USING btree (doctor_id);
+CREATE INDEX appointments_code_idx ON public.appointments USING btree (appointment_code);
+CREATE INDEX appointments_created_id_idx ON public.appointments USING btree (created_at, id);
+CREATE INDEX appointments_patient_created_idx ON public.appointments USING btree (patient_id, created_at, id);
+CREATE INDEX appointments_doctor_created_idx ON public.appointments USING btree (doctor_id, created_at, id);
+CREATE INDEX appointments_doctor_status_created_idx ON public.appointments USING btree (doctor_id, status, created_at, id);
+CREATE INDEX appointments_patient_status_created_idx ON public.appointments USING btree (patient_id, status, created_at, id);
+CREATE INDEX appointments_doctor_status_triage_idx ON public.appointments USING btree (doctor_id, status, triage_key, id);
+CREATE INDEX appointments_status_triage_idx ON public.appointments USING btree (status, triage_key, id);
+
+CREATE TABLE public.appointments_archive (
+    id uuid NOT NULL,
+    appointment_code text NOT NULL,
+    patient_id uuid NOT NULL,
+    doctor_id uuid,
+    problem text NOT NULL,
+    severity text,
+    duration text,
+    medical_history text,
+    status text NOT NULL,
+    cancellation_reason text,
+    slot_start timestamp with time zone,
+    slot_end timestamp with time zone,
+    triage_key timestamp with time zone,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL,
+    CONSTRAINT appointments_archive_pkey PRIMARY KEY (id, created_at),
+    CONSTRAINT appointments_archive_patient_id_fkey FOREIGN KEY (patient_id) REFERENCES public.patients(id) ON DELETE CASCADE,
+    CONSTRAINT appointments_archive_doctor_id_fkey FOREIGN KEY (doctor_id) REFERENCES public.doctors(id) ON DELETE SET NULL
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE public.appointments_archive_default PARTITION OF public.appointments_archive DEFAULT;
+
+-- History only: same definitions as on appointments, so whole months move over keeping them
+CREATE INDEX appointments_archive_patient_created_idx ON public.appointments_archive USING btree (patient_id, created_at, id);
+CREATE INDEX appointments_archive_doctor_created_idx ON public.appointments_archive USING btree (doctor_id, created_at, id);
+
+-- Registries of the two rules that span every partition and the archive
+CREATE TABLE public.appointment_codes (
+    appointment_code text NOT NULL,
+    appointment_id uuid NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    CONSTRAINT appointment_codes_pkey PRIMARY KEY (appointment_code)
+);
+
+CREATE TABLE public.appointment_slots (
+    doctor_id uuid NOT NULL,
+    slot_start timestamp with time zone NOT NULL,
+    slot_end timestamp with time zone NOT NULL,
+    appointment_id uuid NOT NULL,
+    CONSTRAINT appointment_slots_pkey PRIMARY KEY (doctor_id, slot_start),
+    CONSTRAINT appointment_slots_doctor_excl EXCLUDE USING gist (doctor_id WITH =, tstzrange(slot_start, slot_end) WITH &&)
+);
+
+CREATE INDEX appointment_slots_appointment_idx ON public.appointment_slots USING btree (appointment_id);
+CREATE INDEX appointment_slots_end_idx ON public.appointment_slots USING btree (slot_end);
+
+INSERT INTO public.appointment_codes (appointment_code, appointment_id, created_at)
+SELECT appointment_code, id, created_at FROM public.appointments;
+
+INSERT INTO public.appointment_slots (doctor_id, slot_start, slot_end, appointment_id)
+SELECT doctor_id, slot_start, slot_end, id FROM public.appointments
+WHERE status <> 'cancelled' AND slot_start IS NOT NULL AND doctor_id IS NOT NULL;
+
+-- Triggers last, so the copy above is not counted or claimed twice
+CREATE TRIGGER trg_appointments_updated_at BEFORE UPDATE ON public.appointments FOR EACH ROW EXECUTE FUNCTION public.appointments_set_updated_at();
+CREATE TRIGGER trg_appointments_claim_keys BEFORE INSERT ON public.appointments
+    FOR EACH ROW EXECUTE FUNCTION appointment_claim_keys();
+CREATE TRIGGER trg_appointments_keys_update AFTER UPDATE ON public.appointments
+    FOR EACH ROW WHEN (OLD.appointment_code IS DISTINCT FROM NEW.appointment_code OR OLD.doctor_id IS DISTINCT FROM NEW.doctor_id
+                       OR OLD.slot_start IS DISTINCT FROM NEW.slot_start OR OLD.slot_end IS DISTINCT FROM NEW.slot_end
+                       OR (OLD.status = 'cancelled') IS DISTINCT FROM (NEW.status = 'cancelled'))
+    EXECUTE FUNCTION appointment_sync_keys();
+CREATE TRIGGER trg_appointments_keys_delete AFTER DELETE ON public.appointments
+    FOR EACH ROW EXECUTE FUNCTION appointment_sync_keys();
+CREATE TRIGGER trg_appointments_archive_release_code AFTER DELETE ON public.appointments_archive
+    FOR EACH ROW EXECUTE FUNCTION appointment_archive_release_code();
+CREATE TRIGGER trg_appointments_stats_insert AFTER INSERT ON public.appointments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_update AFTER UPDATE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+CREATE TRIGGER trg_appointments_stats_delete AFTER DELETE ON public.appointments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stats_apply();
+
+DROP TABLE public.appointments_old;
+
+COMMIT;
+
+ANALYZE public.appointments;
+ANALYZE public.appointment_codes;
+ANALYZE public.appointment_slots;
@@ -0,0 +1,30 @@
+-- ========================================================
+-- MIGRATION 009 - APPOINTMENT TEXT SEARCH
+-- /api/appointments/search matches a doctor's appointments (live and
+-- archived) by problem and medical history: a stored generated tsvector,
+-- problem weighted A and medical history B, kept current by every insert and
+-- update, GIN indexed together with doctor_id (btree_gin) in every partition.
+-- Definitions must match app/models.py (SEARCH_VECTOR, POSTGRES_SEARCH), and
+-- be the same on both tables so a month moved to the archive keeps its index.
+-- Adding a stored column rewrites every partition: run in a maintenance
+-- window. Needs Postgres 12+ (generated columns on partitioned tables).
+-- Run with: psql -d projectdb -f migrations/009_appointment_search.sql
+-- ========================================================
+
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+ALTER TABLE public.appointments ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(problem, '')), 'A') || setweight(to_tsvector('english', coalesce(medical_history, '')), 'B')) STORED;
+
+ALTER TABLE public.appointments_archive ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(problem, '')), 'A') || setweight(to_tsvector('english', coalesce(medical_history, '')), 'B')) STORED;
+
+-- Created on each partition and attached to the parent
+CREATE INDEX IF NOT EXISTS appointments_doctor_search_idx
+    ON public.appointments USING gin (doctor_id, search_vector);
+
+CREATE INDEX IF NOT EXISTS appointments_archive_doctor_search_idx
+    ON public.appointments_archive USING gin (doctor_id, search_vector);
+
+ANALYZE public.appointments;
+ANALYZE public.appointments_archive;
@@ -0,0 +1,87 @@
+"""Shared fixtures: the app on a throwaway SQLite database, driven in-process.
+
+Run from the backend directory with ``python -m pytest``. The settings are read
+from the environment when app.config is first imported, so it is set here
+before anything from the app is loaded.
+"""
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+_db_path = os.path.join(tempfile.mkdtemp(prefix="hospital-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+os.environ["PROFILING_ENABLED"] = "true"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+import pytest
+
+from app.main import app
+
+DOCTOR_SECRET = "123$"
+PASSWORD = "test-password"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client(anyio_backend):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def _account(response):
+    response.raise_for_status()
+    body = response.json()
+    return SimpleNamespace(
+        id=uuid.UUID(body["user"]["id"]),
+        headers={"Authorization": f"Bearer {body['access_token']}"}
+    )
+
+
+@pytest.fixture
+def register_doctor(client):
+    """Register a fresh doctor; returns its id and auth headers"""
+    async def register():
+        return _account(await client.post("/api/auth/register/doctor", json={
+            "secret_key": DOCTOR_SECRET, "name": "Test Doctor",
+            "email": f"d-{uuid.uuid4().hex}@test.example.com", "password": PASSWORD
+        }))
+    return register
+
+
+@pytest.fixture
+def register_patient(client):
+    """Register a fresh patient; returns its id and auth headers"""
+    async def register():
+        return _account(await client.post("/api/auth/register/patient", json={
+            "name": "Test Patient", "contact": f"p-{uuid.uuid4().hex}", "password": PASSWORD
+        }))
+    return register
+
+
+@pytest.fixture
+async def doctor(register_doctor):
+    return await register_doctor()
+
+
+@pytest.fixture
+async def patient(register_patient):
+    return await register_patient()
+
+
+@pytest.fixture
+def book(client):
+    """Book an appointment as ``patient`` with ``doctor``; returns the response body"""
+    async def book(patient, doctor, **fields):
+        response = await client.post("/api/appointments/", headers=patient.headers, json={
+            "doctor_id": str(doctor.id), "problem": "Headache", **fields
+        })
+        response.raise_for_status()
+        return response.json()
+    return book
@@ -0,0 +1,60 @@
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def batch(client, doctor, status, appointment_ids, **fields):
+    return await client.post("/api/appointments/batch", headers=doctor.headers, json={
+        "status": status,
+        "appointments": [{"appointment_id": str(appointment_id)} for appointment_id in appointment_ids],
+        **fields
+    })
+
+
+async def test_mixed_results(client, doctor, patient, book, register_doctor):
+    pending = await book(patient, doctor)
+    confirmed = await book(patient, doctor)
+    await batch(client, doctor, "confirmed", [confirmed["id"]])
+    other = await book(patient, await register_doctor())
+    missing = uuid.uuid4()
+
+    response = await batch(client, doctor, "confirmed", [pending["id"], confirmed["id"], other["id"], missing])
+    assert response.status_code == 200
+    assert response.json() == [
+        {"appointment_id": pending["id"], "result": "updated", "status": "confirmed"},
+        {"appointment_id": confirmed["id"], "result": "conflict", "status": "confirmed"},
+        {"appointment_id": other["id"], "result": "forbidden", "status": None},
+        {"appointment_id": str(missing), "result": "not_found", "status": None},
+    ]
+
+    # Only the updated appointment changed
+    my = (await client.get("/api/appointments/my", headers=patient.headers)).json()
+    statuses = {appointment["id"]: appointment["status"] for appointment in my}
+    assert statuses[other["id"]] == "pending"
+
+
+async def test_cancel_reasons(client, doctor, patient, book):
+    first = await book(patient, doctor)
+    second = await book(patient, doctor)
+    response = await client.post("/api/appointments/batch", headers=doctor.headers, json={
+        "status": "cancelled",
+        "cancellation_reason": "Clinic closed",
+        "appointments": [
+            {"appointment_id": first["id"]},
+            {"appointment_id": second["id"], "cancellation_reason": "Doctor away"},
+        ]
+    })
+    assert [item["result"] for item in response.json()] == ["updated", "updated"]
+
+    my = (await client.get("/api/appointments/my", headers=patient.headers)).json()
+    reasons = {appointment["id"]: appointment["cancellation_reason"] for appointment in my}
+    assert reasons[first["id"]] == "Clinic closed"
+    assert reasons[second["id"]] == "Doctor away"
+
+
+async def test_patients_forbidden(client, patient, doctor, book):
+    appointment = await book(patient, doctor)
+    response = await batch(client, patient, "cancelled", [appointment["id"]])
+    assert response.status_code == 403
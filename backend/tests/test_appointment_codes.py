@@ -0,0 +1,52 @@
+import uuid
+
+import pytest
+
+from app.crud import appointments
+
+pytestmark = pytest.mark.anyio
+
+
+def fresh_code():
+    return uuid.uuid4().hex[:appointments.CODE_LENGTH].upper()
+
+
+def codes(monkeypatch, *values):
+    """Make generate_appointment_code return ``values`` in turn; returns the calls made"""
+    calls = []
+    def generate():
+        calls.append(values[len(calls)])
+        return calls[-1]
+    monkeypatch.setattr(appointments, "generate_appointment_code", generate)
+    return calls
+
+
+async def test_codes_are_unique(doctor, patient, book):
+    first = await book(patient, doctor)
+    second = await book(patient, doctor)
+    assert first["appointment_code"] != second["appointment_code"]
+
+
+async def test_collision_retried_with_fresh_code(monkeypatch, doctor, patient, book):
+    taken = (await book(patient, doctor))["appointment_code"]
+    fresh = fresh_code()
+    calls = codes(monkeypatch, taken, fresh)
+
+    appointment = await book(patient, doctor)
+    assert appointment["appointment_code"] == fresh
+    assert calls == [taken, fresh]
+
+
+async def test_gives_up_after_attempts(monkeypatch, client, doctor, patient, book):
+    taken = (await book(patient, doctor))["appointment_code"]
+    calls = codes(monkeypatch, *[taken] * appointments.CODE_ATTEMPTS)
+
+    response = await client.post("/api/appointments/", headers=patient.headers, json={
+        "doctor_id": str(doctor.id), "problem": "Headache"
+    })
+    assert response.status_code == 500
+    assert len(calls) == appointments.CODE_ATTEMPTS
+
+    # Nothing was left behind by the failed attempts
+    my = (await client.get("/api/appointments/my", headers=patient.headers)).json()
+    assert len(my) == 1
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.crud.appointments import SlotUnavailable, create_appointment
+from app.database import AsyncSessionLocal
+from app.schemas import AppointmentCreate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def slot(client, doctor, patient):
+    """Start of the doctor's first free slot, open every day 09:00-17:00"""
+    response = await client.put("/api/doctors/me/schedule", headers=doctor.headers, json={"entries": [
+        {"weekday": weekday, "start_time": "09:00", "end_time": "17:00", "slot_minutes": 30}
+        for weekday in range(7)
+    ]})
+    response.raise_for_status()
+    response = await client.get(f"/api/doctors/{doctor.id}/availability", headers=patient.headers, params={"limit": 1})
+    return response.json()[0]["start"]
+
+
+async def free_slots(client, doctor, patient):
+    response = await client.get(f"/api/doctors/{doctor.id}/availability", headers=patient.headers)
+    return [item["start"] for item in response.json()]
+
+
+async def test_concurrent_bookings_of_one_slot(doctor, register_patient, slot):
+    patients = [await register_patient(), await register_patient()]
+    booking = AppointmentCreate(doctor_id=doctor.id, problem="Checkup", slot_start=datetime.fromisoformat(slot))
+
+    async def book(patient):
+        async with AsyncSessionLocal() as db:
+            return await create_appointment(db, booking, patient.id)
+
+    results = await asyncio.gather(*(book(patient) for patient in patients), return_exceptions=True)
+    booked = [result for result in results if not isinstance(result, Exception)]
+    refused = [result for result in results if isinstance(result, Exception)]
+    assert len(booked) == 1
+    assert [type(error) for error in refused] == [SlotUnavailable]
+
+
+async def test_booked_slot_leaves_availability(client, doctor, patient, book, register_patient, slot):
+    appointment = await book(patient, doctor, slot_start=slot)
+    assert appointment["slot_start"] is not None
+    assert slot not in await free_slots(client, doctor, patient)
+
+    other = await register_patient()
+    response = await client.post("/api/appointments/", headers=other.headers, json={
+        "doctor_id": str(doctor.id), "problem": "Checkup", "slot_start": slot
+    })
+    assert response.status_code == 409
+
+
+async def test_cancelling_frees_slot(client, doctor, patient, book, slot):
+    appointment = await book(patient, doctor, slot_start=slot)
+    assert (await client.delete(f"/api/appointments/{appointment['id']}", headers=patient.headers)).status_code == 200
+    assert slot in await free_slots(client, doctor, patient)
+    await book(patient, doctor, slot_start=slot)
+
+
+async def test_slot_off_schedule_rejected(client, doctor, patient, slot):
+    off_schedule = datetime.fromisoformat(slot) + timedelta(minutes=7)
+    response = await client.post("/api/appointments/", headers=patient.headers, json={
+        "doctor_id": str(doctor.id), "problem": "Checkup", "slot_start": off_schedule.isoformat()
+    })
+    assert response.status_code == 400
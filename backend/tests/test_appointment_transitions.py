@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def confirm(client, doctor, appointment_id):
+    return await client.post("/api/appointments/confirm", headers=doctor.headers, json={
+        "appointment_id": str(appointment_id)
+    })
+
+
+async def test_confirm_pending(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    response = await confirm(client, doctor, appointment["id"])
+    assert response.status_code == 200
+    assert response.json()["status"] == "confirmed"
+    assert response.json()["patient"]["id"] == str(patient.id)
+
+
+async def test_confirm_twice_conflicts(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    await confirm(client, doctor, appointment["id"])
+    response = await confirm(client, doctor, appointment["id"])
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Cannot change appointment from confirmed to confirmed"
+
+
+async def test_complete_requires_confirmed(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    response = await client.put(f"/api/appointments/{appointment['id']}", headers=doctor.headers, json={
+        "status": "completed"
+    })
+    assert response.status_code == 409
+
+
+async def test_reject_cancelled_conflicts(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    assert (await client.delete(f"/api/appointments/{appointment['id']}", headers=patient.headers)).status_code == 200
+    response = await client.post("/api/appointments/reject", headers=doctor.headers, json={
+        "appointment_id": appointment["id"], "cancellation_reason": "Unavailable"
+    })
+    assert response.status_code == 409
+
+
+async def test_other_doctors_appointment_forbidden(client, doctor, patient, book, register_doctor):
+    appointment = await book(patient, doctor)
+    other = await register_doctor()
+    response = await confirm(client, other, appointment["id"])
+    assert response.status_code == 403
+
+    # Untouched: the owner can still confirm it
+    assert (await confirm(client, doctor, appointment["id"])).json()["status"] == "confirmed"
+
+
+async def test_other_patients_appointment_forbidden(client, doctor, patient, book, register_patient):
+    appointment = await book(patient, doctor)
+    other = await register_patient()
+    response = await client.delete(f"/api/appointments/{appointment['id']}", headers=other.headers)
+    assert response.status_code == 403
+
+
+async def test_missing_appointment_not_found(client, doctor):
+    response = await confirm(client, doctor, uuid.uuid4())
+    assert response.status_code == 404
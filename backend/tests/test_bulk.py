@@ -0,0 +1,108 @@
+import json
+import uuid
+
+import pytest
+from sqlalchemy import delete
+
+from app.crud import appointments
+from app.database import AsyncSessionLocal
+from app.models import Appointment
+
+pytestmark = pytest.mark.anyio
+
+
+async def export(client, doctor, fmt):
+    response = await client.get("/api/appointments/export", headers=doctor.headers, params={"format": fmt})
+    assert response.status_code == 200
+    return response.content
+
+
+async def upload(client, doctor, body, fmt):
+    response = await client.post("/api/appointments/import", headers=doctor.headers, params={"format": fmt}, content=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+async def remove(appointment_id):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Appointment).where(Appointment.id == appointment_id))
+        await db.commit()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+async def test_export_round_trips_multiline_text(client, doctor, patient, book, fmt):
+    problem = f'Cough {uuid.uuid4().hex}\nsince "Monday"\r\nworse at night'
+    appointment = await book(patient, doctor, problem=problem, medical_history="Asthma\n")
+    body = await export(client, doctor, fmt)
+
+    # Everything else in the export is still there and reported as a duplicate
+    await remove(uuid.UUID(appointment["id"]))
+    result = await upload(client, doctor, body, fmt)
+    assert result["imported"] == 1
+    assert all(error["error"] == "appointment_code already exists" for error in result["errors"])
+
+    lookup = await client.get(f"/api/appointments/code/{appointment['appointment_code']}", headers=patient.headers)
+    assert lookup.json()["problem"] == problem
+    assert lookup.json()["medical_history"] == "Asthma\n"
+
+
+async def test_csv_errors_report_record_start_line(client, doctor, patient):
+    body = (
+        "patient_id,doctor_id,problem\n"
+        f'{patient.id},{doctor.id},"Two\nlines"\n'
+        f"{patient.id},{doctor.id}\n"
+        f'{patient.id},{doctor.id},"Never closed\n'
+    ).encode()
+    result = await upload(client, doctor, body, "csv")
+    assert result["imported"] == 1
+    assert [(error["line"], error["error"].split(":")[0]) for error in result["errors"]] == [
+        (4, "Expected 3 columns, got 2"),
+        (5, "Invalid CSV"),
+    ]
+
+
+async def test_invalid_utf8_line_reported(client, doctor, patient):
+    body = b"\n".join([
+        json.dumps({"patient_id": str(patient.id), "doctor_id": str(doctor.id), "problem": "Fine"}).encode(),
+        b'{"problem": "\xff"}',
+    ])
+    result = await upload(client, doctor, body, "ndjson")
+    assert result["imported"] == 1
+    assert result["errors"] == [{"line": 2, "error": "Invalid UTF-8"}]
+
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+async def test_generated_code_collision_retried(client, doctor, patient, book, monkeypatch):
+    taken = (await book(patient, doctor))["appointment_code"]
+    fresh = uuid.uuid4().hex[:appointments.CODE_LENGTH].upper()
+    codes = iter([taken, fresh])
+    monkeypatch.setattr(appointments, "generate_appointment_code", lambda: next(codes))
+
+    result = await upload(client, doctor, ndjson(
+        {"patient_id": str(patient.id), "doctor_id": str(doctor.id), "problem": "Imported"}
+    ), "ndjson")
+    assert result == {"imported": 1, "failed": 0, "errors": []}
+    lookup = await client.get(f"/api/appointments/code/{fresh}", headers=patient.headers)
+    assert lookup.json()["problem"] == "Imported"
+
+
+async def test_supplied_code_collision_reported(client, doctor, patient, book):
+    taken = (await book(patient, doctor))["appointment_code"]
+    result = await upload(client, doctor, ndjson(
+        {"patient_id": str(patient.id), "doctor_id": str(doctor.id), "problem": "New", "appointment_code": taken},
+        {"patient_id": str(patient.id), "doctor_id": str(doctor.id), "problem": "Other"},
+    ), "ndjson")
+    assert result["imported"] == 1
+    assert result["errors"] == [{"line": 1, "error": "appointment_code already exists"}]
+
+
+async def test_export_leaves_out_triage_key(client, doctor, patient, book):
+    await book(patient, doctor)
+    header = (await export(client, doctor, "csv")).split(b"\r\n", 1)[0].decode()
+    assert "triage_key" not in header.split(",")
+    assert "appointment_code" in header.split(",")
+    record = json.loads((await export(client, doctor, "ndjson")).split(b"\n", 1)[0])
+    assert "triage_key" not in record
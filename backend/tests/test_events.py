@@ -0,0 +1,109 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from app.config import settings
+from app.events import EventBroker
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeConnection:
+    """Stands in for the asyncpg LISTEN connection (no Postgres needed)"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.termination_listeners = []
+        self.notified = []
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    async def execute(self, query, *args):
+        if query.startswith("SELECT pg_notify"):
+            self.notified.append(args)
+
+    def drop(self):
+        for callback in self.termination_listeners:
+            callback(self)
+
+    def terminate(self):
+        self.drop()
+
+    async def close(self):
+        self.drop()
+
+
+async def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Patch asyncpg.connect: the first attempt is refused, later ones get a FakeConnection"""
+    attempts = []
+    handed_out = []
+
+    async def connect(dsn):
+        attempts.append(dsn)
+        if len(attempts) == 1:
+            raise OSError("connection refused")
+        handed_out.append(FakeConnection())
+        return handed_out[-1]
+
+    monkeypatch.setattr(asyncpg, "connect", connect)
+    monkeypatch.setattr(settings, "events_backend", "postgres")
+    monkeypatch.setattr(settings, "events_reconnect_min", 0.01)
+    monkeypatch.setattr(settings, "events_reconnect_max", 0.02)
+    return attempts, handed_out
+
+
+async def test_reconnects_and_listens_again(connections):
+    attempts, handed_out = connections
+    broker = EventBroker()
+    await broker.start()
+    try:
+        # The first attempt fails: degraded until the retry connects
+        await wait_for(lambda: broker.metrics["connect_failures"] == 1)
+        await wait_for(lambda: not broker.degraded)
+        assert attempts[0].startswith("postgresql://")
+        assert settings.events_channel in handed_out[0].listeners
+
+        handed_out[0].drop()
+        assert broker.stats()["degraded"]
+        await wait_for(lambda: len(handed_out) == 2 and not broker.degraded)
+        assert settings.events_channel in handed_out[1].listeners
+        assert broker.stats()["disconnects"] == 1
+
+        # Events go through the new connection
+        await broker.publish(["doctor:1"], {"type": "appointment.updated"})
+        assert len(handed_out[1].notified) == 1
+    finally:
+        await broker.stop()
+
+
+async def test_degraded_broker_delivers_locally(connections):
+    attempts, handed_out = connections
+    broker = EventBroker()
+    subscription = broker.subscribe(["doctor:1"])
+    await broker.start()
+    try:
+        await wait_for(lambda: not broker.degraded)
+        handed_out[0].drop()
+        await broker.publish(["doctor:1"], {"type": "appointment.updated"})
+        assert (await subscription.get(1))["type"] == "appointment.updated"
+    finally:
+        await broker.stop()
+
+
+async def test_metrics_report_events_state(client):
+    events = (await client.get("/metrics")).json()["events"]
+    assert events["degraded"] is False
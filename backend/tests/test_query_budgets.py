@@ -0,0 +1,66 @@
+import httpx
+import pytest
+
+from app.config import settings
+from app.main import app
+from app.profiling import QueryBudgetExceeded, query_budget
+
+pytestmark = pytest.mark.anyio
+
+# Confirming is one conditional UPDATE ... RETURNING plus the reload of the
+# nested patient/doctor; a lazy load or a pre-check query would show up here
+CONFIRM_ROUTE = "POST /api/appointments/confirm"
+CONFIRM_BUDGET = 2
+
+
+async def confirm(client, doctor, appointment):
+    return await client.post("/api/appointments/confirm", headers=doctor.headers, json={
+        "appointment_id": appointment["id"]
+    })
+
+
+async def test_confirm_within_budget(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    with query_budget(CONFIRM_BUDGET):
+        response = await confirm(client, doctor, appointment)
+    assert response.status_code == 200
+    assert response.json()["status"] == "confirmed"
+
+
+async def test_query_budget_fails_block_over_budget(client, doctor, patient, book):
+    appointment = await book(patient, doctor)
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(CONFIRM_BUDGET - 1):
+            await confirm(client, doctor, appointment)
+
+
+async def test_strict_budget_raises_before_response(client, doctor, patient, book, monkeypatch):
+    monkeypatch.setattr(settings, "query_budgets", {CONFIRM_ROUTE: CONFIRM_BUDGET - 1})
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+    appointment = await book(patient, doctor)
+    with pytest.raises(QueryBudgetExceeded, match=CONFIRM_ROUTE):
+        await confirm(client, doctor, appointment)
+
+    # What a server sends: the 500, not a 200 with the error logged afterwards
+    appointment = await book(patient, doctor)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as server:
+        response = await confirm(server, doctor, appointment)
+    assert response.status_code == 500
+
+
+async def test_strict_budget_passes_within_budget(client, doctor, patient, book, monkeypatch):
+    monkeypatch.setattr(settings, "query_budgets", {CONFIRM_ROUTE: CONFIRM_BUDGET})
+    monkeypatch.setattr(settings, "query_budget_strict", True)
+    appointment = await book(patient, doctor)
+    response = await confirm(client, doctor, appointment)
+    assert response.status_code == 200
+    assert "server-timing" in response.headers
+
+
+async def test_budget_only_logged_when_not_strict(client, doctor, patient, book, monkeypatch):
+    monkeypatch.setattr(settings, "query_budgets", {CONFIRM_ROUTE: CONFIRM_BUDGET - 1})
+    monkeypatch.setattr(settings, "query_budget_strict", False)
+    appointment = await book(patient, doctor)
+    response = await confirm(client, doctor, appointment)
+    assert response.status_code == 200
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import ASYNC_DATABASE_URL, replica_set
+from app.replicas import Replica
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(monkeypatch):
+    """A replica (the test database again) in the app's replica set"""
+    replica = Replica(create_async_engine(ASYNC_DATABASE_URL))
+    monkeypatch.setattr(replica_set, "replicas", [replica])
+    yield replica
+    await replica.engine.dispose()
+
+
+async def test_directory_cache_filled_from_primary(client, patient, replica):
+    response = await client.get("/api/doctors", headers=patient.headers)
+    assert response.status_code == 200
+    assert replica.reads == 0
+
+    # Other GETs still read from the replica
+    assert (await client.get("/api/patients/me", headers=patient.headers)).status_code == 200
+    assert replica.reads == 1